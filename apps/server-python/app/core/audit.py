@@ -0,0 +1,327 @@
+"""
+Journal d'audit des opérations sur les clés API
+
+Les routes ajoutent un événement (révélation, création, modification, révocation)
+dans une file en mémoire, sans aller-retour base. La tâche de fond "audit" écrit la
+file par lots de AUDIT_BATCH_SIZE avec `COPY ... FROM STDIN` dans la table
+partitionnée `public.audit_log` (migration 0011).
+
+Contre-pression : la file contient au plus AUDIT_MAX_PENDING événements. Au-delà,
+`ensure_room()` lève AuditBufferFull et la route répond 503 *avant* d'effectuer
+l'opération : aucune opération auditée n'a lieu sans sa trace. L'événement n'est
+mis en file (`append()`) qu'une fois l'opération validée : un échec du commit ne
+laisse pas de trace d'une opération qui n'a pas eu lieu. Un lot dont l'écriture
+échoue est remis en tête de file (la limite ne s'applique qu'aux nouveaux
+événements), sauf erreur permanente sur les données (valeur trop longue,
+contrainte) : le lot est alors réécrit événement par événement et les événements
+refusés partent en lettre morte (journalisés en ERROR, compteur "dead_lettered")
+au lieu de bloquer la file. La file est vidée à l'arrêt du worker.
+
+    python -m app.core.audit partitions   # crée les partitions mensuelles à venir
+"""
+
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Optional
+import base64
+import json
+import logging
+import threading
+import uuid
+
+from sqlalchemy import exc as sa_exc, select, text, tuple_
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logging_config import request_id_var
+from app.core.metrics import registry
+
+try:
+    from psycopg import DataError as _PgDataError, IntegrityError as _PgIntegrityError
+    _PG_PERMANENT_ERRORS: tuple = (_PgDataError, _PgIntegrityError)
+except ImportError:  # pragma: no cover
+    _PG_PERMANENT_ERRORS = ()
+
+logger = logging.getLogger(__name__)
+
+AUDIT_EVENTS = registry.counter(
+    "audit_events_total", "Audit events by outcome (written, rejected, retried, dead_lettered)", ("status",)
+)
+
+# Erreurs qu'une nouvelle tentative ne corrigera pas (COPY psycopg, ou INSERT via SQLAlchemy)
+PERMANENT_ERRORS = (sa_exc.DataError, sa_exc.IntegrityError) + _PG_PERMANENT_ERRORS
+
+# Longueurs des colonnes VARCHAR de audit_log (migration 0011)
+REQUEST_ID_MAX_LENGTH = 64
+IP_MAX_LENGTH = 64
+
+KEY_CREATED = "key.created"
+KEY_REVEALED = "key.revealed"
+KEY_UPDATED = "key.updated"
+KEY_REVOKED = "key.revoked"
+KEY_IMPORTED = "key.imported"
+
+COLUMNS = ("occurred_at", "user_id", "action", "api_key_id", "request_id", "ip", "details")
+
+
+class AuditBufferFull(Exception):
+    """Raised when the audit queue is full; the audited operation must not proceed"""
+
+
+@dataclass
+class AuditEvent:
+    action: str
+    user_id: uuid.UUID
+    api_key_id: Optional[uuid.UUID] = None
+    ip: Optional[str] = None
+    details: Optional[dict[str, Any]] = None
+    request_id: Optional[str] = field(default_factory=lambda: request_id_var.get())
+    occurred_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+    def __post_init__(self):
+        # Valeurs venues du client (X-Request-ID, X-Forwarded-For) : tronquées à la taille des colonnes
+        if self.request_id is not None:
+            self.request_id = self.request_id[:REQUEST_ID_MAX_LENGTH]
+        if self.ip is not None:
+            self.ip = self.ip[:IP_MAX_LENGTH]
+
+    def row(self) -> tuple:
+        return (
+            self.occurred_at, str(self.user_id), self.action,
+            str(self.api_key_id) if self.api_key_id else None,
+            None if self.request_id == "-" else self.request_id,
+            self.ip,
+            json.dumps(self.details) if self.details is not None else None,
+        )
+
+
+class AuditLog:
+    def __init__(self, engine: Optional[Engine] = None, max_pending: int = 50_000, batch_size: int = 1000):
+        self.engine = engine
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self._queue: deque[AuditEvent] = deque()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def _check_room(self) -> None:
+        if len(self._queue) >= self.max_pending:
+            AUDIT_EVENTS.inc(("rejected",))
+            raise AuditBufferFull("Audit log queue is full")
+
+    def ensure_room(self) -> None:
+        """Raise AuditBufferFull when no new event may be queued"""
+        with self._lock:
+            self._check_room()
+
+    def record(self, event: AuditEvent) -> None:
+        """Queue an event, or raise AuditBufferFull"""
+        with self._lock:
+            self._check_room()
+            self._queue.append(event)
+
+    def append(self, event: AuditEvent) -> None:
+        """Queue the event of an operation that already took effect (never refused)"""
+        with self._lock:
+            self._queue.append(event)
+
+    def _take(self) -> list[AuditEvent]:
+        with self._lock:
+            count = min(self.batch_size, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _requeue(self, events: list[AuditEvent]) -> None:
+        with self._lock:
+            self._queue.extendleft(reversed(events))
+
+    def _write(self, events: list[AuditEvent]) -> None:
+        if self.engine is None:
+            from app.core.database import engine
+            self.engine = engine
+
+        if self.engine.dialect.name != "postgresql":
+            # Sans COPY (tests sqlite) : INSERT multi-lignes
+            from app.models.audit import AuditLogEntry
+            with self.engine.begin() as conn:
+                conn.execute(AuditLogEntry.__table__.insert(), [
+                    {column: getattr(event, column) for column in COLUMNS} for event in events
+                ])
+            return
+
+        raw = self.engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            with cursor.copy(f"COPY public.audit_log ({', '.join(COLUMNS)}) FROM STDIN") as copy:
+                for event in events:
+                    copy.write_row(event.row())
+            raw.commit()
+        except Exception:
+            raw.rollback()
+            raise
+        finally:
+            raw.close()
+
+    def flush(self, max_batches: Optional[int] = None) -> int:
+        """Write queued events batch by batch; return the number written"""
+        written = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            events = self._take()
+            if not events:
+                break
+            try:
+                self._write(events)
+            except PERMANENT_ERRORS:
+                logger.warning("Audit batch rejected, writing its events one by one", extra={"count": len(events)})
+                done, stopped = self._write_one_by_one(events)
+                written += done
+                batches += 1
+                if stopped:
+                    break
+                continue
+            except Exception:
+                self._requeue(events)
+                AUDIT_EVENTS.inc(("retried",), amount=len(events))
+                logger.warning("Audit log flush failed", extra={"count": len(events)}, exc_info=True)
+                break
+            written += len(events)
+            batches += 1
+            AUDIT_EVENTS.inc(("written",), amount=len(events))
+        return written
+
+    def _write_one_by_one(self, events: list[AuditEvent]) -> tuple[int, bool]:
+        """Isolate the events of a rejected batch; return (written, stopped on a transient error)"""
+        written = 0
+        for position, event in enumerate(events):
+            try:
+                self._write([event])
+            except PERMANENT_ERRORS as e:
+                AUDIT_EVENTS.inc(("dead_lettered",))
+                logger.error("Audit event dead-lettered", extra={
+                    "action": event.action, "user_id": str(event.user_id),
+                    "api_key_id": str(event.api_key_id) if event.api_key_id else None,
+                    "occurred_at": event.occurred_at.isoformat(), "error": str(e),
+                })
+                continue
+            except Exception:
+                remaining = events[position:]
+                self._requeue(remaining)
+                AUDIT_EVENTS.inc(("retried",), amount=len(remaining))
+                logger.warning("Audit log flush failed", extra={"count": len(remaining)}, exc_info=True)
+                return written, True
+            written += 1
+            AUDIT_EVENTS.inc(("written",))
+        return written, False
+
+    def __call__(self) -> Optional[float]:
+        """Periodic task: a few batches per run, immediately again while the queue is long"""
+        self.flush(max_batches=10)
+        return 0.0 if len(self._queue) >= self.batch_size else None
+
+
+class InvalidCursor(ValueError):
+    """Raised for a pagination cursor that was not produced by fetch_events"""
+
+
+def encode_cursor(occurred_at: datetime, event_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{occurred_at.isoformat()}|{event_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        occurred_at, event_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(occurred_at), int(event_id)
+    except ValueError as e:
+        raise InvalidCursor(f"Invalid cursor: {e}")
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Date sans fuseau = UTC
+    return value.replace(tzinfo=timezone.utc) if value is not None and value.tzinfo is None else value
+
+
+def fetch_events(
+    db: Session,
+    user_id,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> tuple[list[dict], Optional[str]]:
+    """One page of a user's events, newest first; return (events, cursor of the next page)
+
+    Pagination par clé (occurred_at, id) sur idx_audit_log_user_time : le coût d'une page
+    ne dépend pas de sa position, et les bornes de dates éliminent les autres partitions.
+    """
+    from app.models.audit import AuditLogEntry
+
+    query = select(AuditLogEntry).where(AuditLogEntry.user_id == user_id)
+    if since is not None:
+        query = query.where(AuditLogEntry.occurred_at >= _utc(since))
+    if until is not None:
+        query = query.where(AuditLogEntry.occurred_at < _utc(until))
+    if cursor:
+        occurred_at, event_id = decode_cursor(cursor)
+        query = query.where(tuple_(AuditLogEntry.occurred_at, AuditLogEntry.id) < tuple_(occurred_at, event_id))
+    rows = db.execute(
+        query.order_by(AuditLogEntry.occurred_at.desc(), AuditLogEntry.id.desc()).limit(limit + 1)
+    ).scalars().all()
+
+    events = [
+        {
+            "id": row.id,
+            "occurred_at": row.occurred_at,
+            "action": row.action,
+            "api_key_id": row.api_key_id,
+            "request_id": row.request_id,
+            "ip": row.ip,
+            "details": row.details,
+        }
+        for row in rows[:limit]
+    ]
+    next_cursor = encode_cursor(rows[limit - 1].occurred_at, rows[limit - 1].id) if len(rows) > limit else None
+    return events, next_cursor
+
+
+def ensure_partitions(engine: Optional[Engine] = None) -> int:
+    """Create the monthly audit_log partitions of the coming months"""
+    if engine is None:
+        from app.core.database import engine
+    with engine.begin() as conn:
+        created = conn.execute(
+            text("SELECT public.ensure_audit_log_partitions(:months)"),
+            {"months": settings.AUDIT_PARTITIONS_AHEAD},
+        ).scalar()
+    if created:
+        logger.info("Created audit_log partitions", extra={"count": created})
+    return created
+
+
+audit_log = AuditLog(max_pending=settings.AUDIT_MAX_PENDING, batch_size=settings.AUDIT_BATCH_SIZE)
+
+registry.gauge_callback(
+    "audit_events_pending", "Audit events queued in this worker and not yet written",
+    lambda: {(): len(audit_log)},
+)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m app.core.audit")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("partitions", help="Create the monthly partitions of the coming months")
+    parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    print(f"Created {ensure_partitions()} partition(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,187 @@
+"""
+Disjoncteur (circuit breaker) pour les appels HTTP sortants
+
+Un disjoncteur par endpoint (ex: "sign_in_with_password") :
+
+- CLOSED : les appels passent ; chaque résultat est compté dans une fenêtre
+  glissante de CIRCUIT_WINDOW_SECONDS (compteurs par seconde). Si au moins
+  CIRCUIT_MIN_CALLS appels y figurent et que le taux d'échec atteint
+  CIRCUIT_FAILURE_RATE, le circuit s'ouvre ;
+- OPEN : les appels échouent immédiatement (CircuitOpenError) sans réseau,
+  pendant CIRCUIT_OPEN_SECONDS ; l'appelant passe directement à son repli ;
+- HALF_OPEN : au plus CIRCUIT_HALF_OPEN_PROBES appels de test passent.
+  S'ils réussissent tous, le circuit se referme ; au premier échec il se rouvre.
+
+Un appel compte comme un échec s'il lève une exception (timeout, connexion), renvoie
+une erreur 5xx, ou dure plus que le seuil "appel lent" de l'appelant.
+"""
+
+from collections import deque
+from typing import Callable, Optional
+import logging
+import threading
+import time
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Valeur exposée par la jauge circuit_breaker_state
+STATE_VALUES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+CIRCUIT_TRANSITIONS = registry.counter(
+    "circuit_breaker_transitions_total", "Circuit breaker state changes", ("breaker", "state")
+)
+CIRCUIT_REJECTED = registry.counter(
+    "circuit_breaker_rejected_total", "Calls failed fast by an open circuit breaker", ("breaker",)
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open"""
+
+    def __init__(self, name: str):
+        super().__init__(f"Circuit breaker {name!r} is open")
+        self.name = name
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        min_calls: int = 5,
+        window_seconds: float = 30.0,
+        open_seconds: float = 15.0,
+        half_open_probes: int = 3,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.clock = clock
+        self.state = CLOSED
+        # Fenêtre glissante : [seconde, appels, échecs], du plus ancien au plus récent
+        self._buckets: deque[list] = deque()
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        previous, self.state = self.state, state
+        CIRCUIT_TRANSITIONS.inc((self.name, state))
+        log = logger.warning if state == OPEN else logger.info
+        log("Circuit breaker state changed", extra={"breaker": self.name, "from": previous, "to": state})
+        if state == OPEN:
+            self._opened_at = self.clock()
+        if state != CLOSED:
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        if state == CLOSED:
+            self._buckets.clear()
+
+    def _trim(self, now: float) -> None:
+        horizon = int(now - self.window_seconds)
+        while self._buckets and self._buckets[0][0] <= horizon:
+            self._buckets.popleft()
+
+    def counts(self) -> tuple[int, int]:
+        """Calls and failures in the current window"""
+        with self._lock:
+            self._trim(self.clock())
+            return sum(b[1] for b in self._buckets), sum(b[2] for b in self._buckets)
+
+    def allow(self) -> bool:
+        """Whether a call may proceed; every allowed call must be followed by record()"""
+        with self._lock:
+            if self.state == OPEN:
+                if self.clock() - self._opened_at < self.open_seconds:
+                    CIRCUIT_REJECTED.inc((self.name,))
+                    return False
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_probes:
+                    CIRCUIT_REJECTED.inc((self.name,))
+                    return False
+                self._probes_in_flight += 1
+            return True
+
+    def record(self, success: bool) -> None:
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if not success:
+                    self._transition(OPEN)
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    self._transition(CLOSED)
+                return
+            if self.state == OPEN:
+                # Appel autorisé avant l'ouverture et terminé après : déjà pris en compte
+                return
+
+            now = self.clock()
+            self._trim(now)
+            second = int(now)
+            if not self._buckets or self._buckets[-1][0] != second:
+                self._buckets.append([second, 0, 0])
+            bucket = self._buckets[-1]
+            bucket[1] += 1
+            bucket[2] += 0 if success else 1
+
+            calls = sum(b[1] for b in self._buckets)
+            failures = sum(b[2] for b in self._buckets)
+            if calls >= self.min_calls and failures / calls >= self.failure_rate:
+                self._transition(OPEN)
+
+
+class CircuitBreakerRegistry:
+    """Breakers created on first use, one per name, with shared settings"""
+
+    def __init__(self, **options):
+        self.options = options
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(name, CircuitBreaker(name, **self.options))
+        return breaker
+
+    def states(self) -> dict[tuple[str, ...], float]:
+        return {(name,): STATE_VALUES[b.state] for name, b in list(self._breakers.items())}
+
+
+def build_breakers(clock: Optional[Callable[[], float]] = None) -> CircuitBreakerRegistry:
+    options = {
+        "failure_rate": settings.CIRCUIT_FAILURE_RATE,
+        "min_calls": settings.CIRCUIT_MIN_CALLS,
+        "window_seconds": settings.CIRCUIT_WINDOW_SECONDS,
+        "open_seconds": settings.CIRCUIT_OPEN_SECONDS,
+        "half_open_probes": settings.CIRCUIT_HALF_OPEN_PROBES,
+    }
+    if clock is not None:
+        options["clock"] = clock
+    return CircuitBreakerRegistry(**options)
+
+
+supabase_breakers = build_breakers()
+
+registry.gauge_callback(
+    "circuit_breaker_state", "Circuit breaker state (0 = closed, 1 = open, 2 = half-open)",
+    supabase_breakers.states, ("breaker",),
+)
@@ -15,14 +15,30 @@ class Settings(BaseSettings):
     # Supabase service settings (server-side)
     SUPABASE_URL: str = ""
     SUPABASE_SERVICE_ROLE_KEY: str = ""
+    SUPABASE_TIMEOUT_SECONDS: float = 10  # Timeout des appels HTTP vers Supabase
+    SUPABASE_SLOW_CALL_SECONDS: float = 2  # Au-delà, l'appel compte comme un échec pour le disjoncteur
+
+    # Disjoncteur des appels Supabase (un par endpoint, voir app/core/circuit_breaker.py)
+    CIRCUIT_FAILURE_RATE: float = 0.5  # Taux d'échec (erreurs, 5xx, appels lents) qui ouvre le circuit
+    CIRCUIT_MIN_CALLS: int = 5  # Appels minimum dans la fenêtre avant d'évaluer le taux
+    CIRCUIT_WINDOW_SECONDS: float = 30
+    CIRCUIT_OPEN_SECONDS: float = 15  # Durée d'échec immédiat avant les appels de test
+    CIRCUIT_HALF_OPEN_PROBES: int = 3  # Appels de test qui doivent réussir pour refermer le circuit
 
     # Database - Production
     DATABASE_URL: str = ""  # Base de données principale (supabase - Production)
     XEN_DATABASE_URL: str = ""  # Deuxième base de données (xendb - Production)
+    DB_AUTO_MIGRATE: bool = False  # Applique les migrations en attente au démarrage (sinon: python -m app.core.migrations upgrade)
 
     # JWT
     JWT_SECRET: str
     JWT_ALGORITHM: str = "HS256"
+    JWT_BACKEND: str = "hmac"  # "hmac" (bibliothèque standard, plus rapide) ou "jose" (python-jose)
+    JWT_PRIVATE_KEYS: str = ""  # Clés PEM EdDSA/ES256 séparées par des virgules : la première signe, toutes sont publiées
+    JWT_ACCEPT_HS256: bool = True  # Avec JWT_PRIVATE_KEYS, accepte encore les jetons signés par JWT_SECRET
+    JWKS_CACHE_SECONDS: int = 3600  # Cache-Control de /.well-known/jwks.json
+    REVOCATION_REFRESH_SECONDS: float = 5  # Délai max avant qu'un logout soit vu par les autres workers
+    REVOCATION_OVERLAP_SECONDS: float = 60  # Révocations relues à chaque passage (validations tardives)
     JWT_EXPIRATION_MINUTES: int = 30 * 24 * 60  # 30 days
     JWT_RESET_TOKEN_MINUTES: int = 15  # 15 minutes for password reset
 
@@ -34,6 +50,77 @@ class Settings(BaseSettings):
     STRIPE_WEBHOOK_SECRET: str = ""
     STRIPE_PRICE_PRO: str = ""
 
+    # Logging
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # "json" ou "text"
+    LOG_QUEUE_SIZE: int = 10000  # Au-delà, les logs sont abandonnés plutôt que de bloquer la requête
+    LOG_SUCCESS_SAMPLE_RATE: float = 1.0  # Fraction conservée des logs du chemin nominal (ex: 0.1)
+
+    # Profilage par requête
+    # En-tête Server-Timing (db, jwt, argon2, aesgcm, supabase) : diagnostic, jamais envoyé sur /api/auth/*
+    SERVER_TIMING_ENABLED: bool = False
+    PROFILING_DEBUG: bool = False  # Autorise X-Debug-Profile: 1 -> détail JSON dans X-Request-Profile
+
+    # Requêtes lentes
+    SLOW_QUERY_MS: float = 200  # Seuil d'enregistrement dans le journal des requêtes lentes
+    SLOW_QUERY_BUFFER_SIZE: int = 200  # Nombre d'entrées conservées (buffer circulaire)
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE: float = 0.1  # Fraction des SELECT lents dont le plan est capturé (EXPLAIN)
+    SLOW_QUERY_EXPLAIN_ANALYZE: bool = False  # EXPLAIN ANALYZE (ré-exécution) pour les SELECT sans verrou ni fonction à effet de bord
+
+    # Outbox : appels Supabase différés, traités par un worker de fond (app/core/outbox.py)
+    OUTBOX_POLL_SECONDS: float = 2  # Intervalle entre deux lots quand la file est vide
+    OUTBOX_BATCH_SIZE: int = 50
+    OUTBOX_CONCURRENCY: int = 8  # Appels simultanés maximum par worker
+    OUTBOX_MAX_ATTEMPTS: int = 8  # Au-delà, le message passe en "failed"
+    OUTBOX_RETENTION_DAYS: int = 7  # Conservation des messages traités
+
+    # Archivage des clés révoquées (api_keys -> api_keys_archive, par lots)
+    API_KEY_ARCHIVE_DAYS: int = 30  # Ancienneté de la révocation avant archivage
+    API_KEY_ARCHIVE_BATCH_SIZE: int = 1000  # Clés déplacées par transaction
+    API_KEY_ARCHIVE_INTERVAL_SECONDS: float = 3600  # Intervalle de la tâche de fond (lot incomplet)
+
+    # Expiration des clés (balayeur de fond, réveillé à la prochaine échéance)
+    API_KEY_EXPIRY_BATCH_SIZE: int = 1000  # Clés révoquées par transaction
+    API_KEY_EXPIRY_MAX_SLEEP_SECONDS: float = 300  # Attente maximale entre deux passages
+
+    # Suivi d'utilisation des clés (compteurs en mémoire, écrits par lots)
+    USAGE_FLUSH_SECONDS: float = 10  # Intervalle d'écriture des compteurs
+    USAGE_MAX_PENDING_KEYS: int = 100000  # Clés distinctes en attente par worker (au-delà : perdues)
+    USAGE_FLUSH_BATCH_SIZE: int = 1000  # Clés par UPDATE
+
+    # Journal d'audit (file en mémoire, écrite par COPY dans public.audit_log)
+    AUDIT_FLUSH_SECONDS: float = 1  # Intervalle d'écriture de la file
+    AUDIT_BATCH_SIZE: int = 1000  # Événements par COPY
+    AUDIT_MAX_PENDING: int = 50000  # Au-delà, les opérations auditées répondent 503
+    AUDIT_PARTITIONS_AHEAD: int = 2  # Partitions mensuelles créées à l'avance
+
+    # Limitation de débit (protège le budget CPU Argon2 du login)
+    RATE_LIMIT_BACKEND: str = "memory"  # "memory" (par worker) ou "redis" (partagé, paquet redis requis)
+    REDIS_URL: str = ""  # Ex: redis://localhost:6379/0 (RATE_LIMIT_BACKEND=redis)
+    LOGIN_RATE_LIMIT_IP: int = 30  # Tentatives de login par adresse IP et par fenêtre
+    LOGIN_RATE_LIMIT_EMAIL: int = 10  # Tentatives de login par email et par fenêtre
+    LOGIN_RATE_LIMIT_WINDOW_SECONDS: int = 300
+    TRUST_FORWARDED_FOR: bool = False  # Derrière un proxy (Vercel, load balancer) : IP client lue dans X-Forwarded-For
+
+    # Quotas par plan (routes /api/keys, par utilisateur)
+    FREE_MAX_API_KEYS: int = 25  # Clés actives (non révoquées) maximum
+    PRO_MAX_API_KEYS: int = 1000
+    FREE_KEY_RATE_LIMIT: int = 60  # Requêtes par fenêtre de KEY_RATE_LIMIT_WINDOW_SECONDS
+    PRO_KEY_RATE_LIMIT: int = 600
+    KEY_RATE_LIMIT_WINDOW_SECONDS: int = 60
+
+    # Provisionnement en masse (POST /api/admin/users/bulk, scripts/provision_users.py)
+    PROVISIONING_CONCURRENCY: int = 8  # Appels simultanés à l'API Admin Supabase
+    PROVISIONING_RETRIES: int = 3  # Reprises par ligne (erreurs réseau, 429, 5xx)
+    PROVISIONING_MAX_ROWS: int = 10000  # Lignes maximum par requête HTTP (le CLI n'a pas de limite)
+
+    # Import de clés existantes (POST /api/keys/import, scripts/import_keys.py)
+    KEY_IMPORT_MAX_ROWS: int = 10000  # Lignes maximum par requête HTTP (le CLI n'a pas de limite)
+    KEY_IMPORT_WORKERS: int = 4  # Threads de chiffrement par worker pour l'API
+
+    # Admin
+    ADMIN_TOKEN: str = ""  # Jeton attendu dans X-Admin-Token ; vide = routes /api/admin désactivées
+
     # CORS
     WEB_BASE_URL: str = "http://localhost:5173"
     ALLOWED_ORIGINS: str = ""  # Vide = utilise les patterns par défaut (localhost:* et *.vercel.app)
@@ -0,0 +1,241 @@
+"""
+Métriques au format texte Prometheus
+
+Registre minimal en mémoire (par process) : compteurs, histogrammes et jauges
+calculées au moment du scrape. Le coût sur le chemin chaud est un verrou et
+une addition par événement.
+"""
+
+from bisect import bisect_left
+from typing import Callable, Iterable, Optional
+import threading
+import time
+
+LabelValues = tuple[str, ...]
+
+# Buckets par défaut (secondes), adaptés à des requêtes HTTP / appels réseau
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: LabelValues = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: LabelValues = (), amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, labels: LabelValues = ()) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {value}" for labels, value in items]
+
+
+class Histogram:
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: LabelValues = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # Par jeu de labels : [compte par bucket (non cumulé) + overflow, somme]
+        self._values: dict[LabelValues, tuple[list[int], list[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: LabelValues = ()) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = [(labels, list(counts), total[0]) for labels, (counts, total) in self._values.items()]
+
+        lines = []
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            cumulative += counts[-1]
+            le = _format_labels(self.labelnames, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class GaugeCallback:
+    """Gauge whose values are computed at scrape time"""
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], dict[LabelValues, float]],
+        labelnames: LabelValues = (),
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.callback = callback
+
+    def samples(self) -> list[str]:
+        try:
+            values = self.callback()
+        except Exception:
+            return []
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {value}" for labels, value in values.items()]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, object] = {}
+
+    def counter(self, name: str, documentation: str, labelnames: LabelValues = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: LabelValues = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge_callback(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], dict[LabelValues, float]],
+        labelnames: LabelValues = (),
+    ) -> GaugeCallback:
+        return self._register(GaugeCallback(name, documentation, callback, labelnames))
+
+    def _register(self, metric):
+        # Ré-enregistrer un nom existant renvoie la métrique déjà créée
+        return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# HTTP
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "HTTP requests by route template", ("method", "route", "status")
+)
+HTTP_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route")
+)
+
+# Primitives de sécurité
+ARGON2_OPERATIONS = registry.counter(
+    "argon2_operations_total", "Argon2 password hash/verify operations", ("operation",)
+)
+AESGCM_OPERATIONS = registry.counter(
+    "aesgcm_operations_total", "AES-GCM operations in CryptoManager", ("operation",)
+)
+
+# Supabase
+SUPABASE_REQUESTS = registry.counter(
+    "supabase_http_requests_total", "HTTP calls to Supabase by endpoint", ("endpoint", "status")
+)
+SUPABASE_LATENCY = registry.histogram(
+    "supabase_http_request_duration_seconds", "Latency of HTTP calls to Supabase", ("endpoint",)
+)
+
+
+def register_pool_stats(engine) -> None:
+    """Expose the SQLAlchemy pool counters of an engine"""
+
+    def collect() -> dict[LabelValues, float]:
+        pool = engine.pool
+        return {
+            ("size",): pool.size(),
+            ("checked_in",): pool.checkedin(),
+            ("checked_out",): pool.checkedout(),
+            ("overflow",): pool.overflow(),
+        }
+
+    registry.gauge_callback("db_pool_connections", "SQLAlchemy connection pool state", collect, ("state",))
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording count and latency per route template.
+
+    The label is the matched route path (`/api/keys/{api_key_id}`), never the
+    raw URL, so the number of series stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = route_template(scope)
+            method = scope["method"]
+            HTTP_REQUESTS.inc((method, route, str(status_code)))
+            HTTP_LATENCY.observe(time.perf_counter() - start, (method, route))
+
+
+def route_template(scope) -> str:
+    route = scope.get("route")
+    path: Optional[str] = getattr(route, "path", None)
+    return path if path else "unmatched"
@@ -0,0 +1,286 @@
+"""
+Runner de migrations SQL versionnées
+
+Les fichiers `migrations/NNNN_nom.sql` sont appliqués dans l'ordre et chaque
+version appliquée est enregistrée dans `public.schema_migrations`.
+Au démarrage, l'application ne fait qu'une seule requête pour comparer la
+version de la base à la version attendue (aucun DDL, aucune requête par table).
+
+Usage:
+    python -m app.core.migrations status
+    python -m app.core.migrations upgrade
+    python -m app.core.migrations stamp 3   # base existante : marque 0001..0003 comme appliquées
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+import hashlib
+import logging
+import re
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / "migrations"
+
+# Clé arbitraire pour pg_advisory_lock : sérialise les workers qui migrent en même temps
+MIGRATION_LOCK_KEY = 7_202_601
+
+# Une migration qui commence par cette ligne est exécutée hors transaction
+# (nécessaire pour CREATE INDEX CONCURRENTLY)
+NO_TRANSACTION_MARKER = "-- migrate:no-transaction"
+
+_FILENAME_RE = re.compile(r"^(\d{4})_([\w-]+)\.sql$")
+
+
+def _advisory(conn: Connection, function: str) -> None:
+    """Take or release the migration lock, outside the slow query log
+
+    L'attente du verrou est lente par nature : sans l'option, la requête serait
+    échantillonnée et rejouée par EXPLAIN sur une autre connexion du pool.
+    """
+    from app.core.slow_queries import SKIP_OPTION
+
+    conn.execute(
+        text(f"SELECT {function}(:key)"), {"key": MIGRATION_LOCK_KEY}, execution_options={SKIP_OPTION: True}
+    )
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    path: Path
+    checksum: str
+    transactional: bool = True
+
+    def read_sql(self) -> str:
+        return self.path.read_text(encoding="utf-8")
+
+
+@dataclass(frozen=True)
+class SchemaStatus:
+    current: int
+    expected: int
+
+    @property
+    def pending(self) -> bool:
+        return self.current < self.expected
+
+
+def discover_migrations(directory: Path = MIGRATIONS_DIR) -> list[Migration]:
+    """List the versioned SQL files of a directory, sorted by version"""
+    migrations: dict[int, Migration] = {}
+    for path in sorted(directory.glob("*.sql")):
+        match = _FILENAME_RE.match(path.name)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise ValueError(f"Duplicate migration version {version}: {path.name}")
+        sql = path.read_text(encoding="utf-8")
+        migrations[version] = Migration(
+            version=version,
+            name=match.group(2),
+            path=path,
+            checksum=hashlib.sha256(sql.encode("utf-8")).hexdigest(),
+            transactional=not sql.lstrip().startswith(NO_TRANSACTION_MARKER),
+        )
+    return [migrations[v] for v in sorted(migrations)]
+
+
+@lru_cache(maxsize=None)
+def expected_schema_version(directory: Path = MIGRATIONS_DIR) -> int:
+    """Highest version shipped with the code (read from disk once per process)"""
+    migrations = discover_migrations(directory)
+    return migrations[-1].version if migrations else 0
+
+
+def ensure_migrations_table(conn: Connection) -> None:
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS public.schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR NOT NULL,
+            checksum VARCHAR(64) NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    """))
+
+
+def current_schema_version(conn: Connection) -> int:
+    """Return the highest applied version, 0 if the table does not exist yet"""
+    try:
+        result = conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM public.schema_migrations"))
+        return int(result.scalar())
+    except Exception:
+        # Table absente : base jamais migrée
+        conn.rollback()
+        return 0
+
+
+_schema_status: Optional[SchemaStatus] = None
+
+
+def check_schema_version(engine: Engine, refresh: bool = False) -> SchemaStatus:
+    """Compare the database version to the expected one (one query, cached per process)"""
+    global _schema_status
+    if _schema_status is None or refresh:
+        with engine.connect() as conn:
+            current = current_schema_version(conn)
+        _schema_status = SchemaStatus(current=current, expected=expected_schema_version())
+    return _schema_status
+
+
+def upgrade(engine: Engine, target: Optional[int] = None, directory: Path = MIGRATIONS_DIR) -> list[Migration]:
+    """Apply pending migrations up to `target` and return the applied ones.
+
+    An advisory lock is held for the whole run, so concurrent workers wait
+    for the first one and then find nothing left to apply.
+    """
+    migrations = discover_migrations(directory)
+    applied: list[Migration] = []
+
+    with engine.connect() as conn:
+        _advisory(conn, "pg_advisory_lock")
+        conn.commit()
+        try:
+            ensure_migrations_table(conn)
+            conn.commit()
+            done = {
+                row.version: row.checksum
+                for row in conn.execute(text("SELECT version, checksum FROM public.schema_migrations"))
+            }
+            conn.commit()
+
+            for migration in migrations:
+                if target is not None and migration.version > target:
+                    break
+                if migration.version in done:
+                    if done[migration.version] != migration.checksum:
+                        logger.warning(
+                            "Migration %04d_%s was modified after being applied",
+                            migration.version, migration.name,
+                        )
+                    continue
+
+                logger.info("Applying migration %04d_%s", migration.version, migration.name)
+                _apply(conn, migration)
+                applied.append(migration)
+        finally:
+            _advisory(conn, "pg_advisory_unlock")
+            conn.commit()
+
+    if applied:
+        check_schema_version(engine, refresh=True)
+    return applied
+
+
+def stamp(engine: Engine, version: int, directory: Path = MIGRATIONS_DIR) -> list[Migration]:
+    """Record migrations up to `version` as applied without running them.
+
+    For databases whose schema was created by hand (supabase_tables.sql and the
+    old ALTERs): upgrade then starts after `version`. Already recorded versions
+    are left untouched; return the newly recorded ones.
+    """
+    migrations = [m for m in discover_migrations(directory) if m.version <= version]
+    if not any(m.version == version for m in migrations):
+        raise ValueError(f"Unknown migration version {version}")
+
+    stamped: list[Migration] = []
+    with engine.connect() as conn:
+        _advisory(conn, "pg_advisory_lock")
+        conn.commit()
+        try:
+            ensure_migrations_table(conn)
+            for migration in migrations:
+                inserted = conn.execute(text("""
+                    INSERT INTO public.schema_migrations (version, name, checksum)
+                    VALUES (:version, :name, :checksum)
+                    ON CONFLICT (version) DO NOTHING
+                """), {"version": migration.version, "name": migration.name, "checksum": migration.checksum})
+                if inserted.rowcount:
+                    stamped.append(migration)
+            conn.commit()
+        finally:
+            _advisory(conn, "pg_advisory_unlock")
+            conn.commit()
+
+    check_schema_version(engine, refresh=True)
+    return stamped
+
+
+def _apply(conn: Connection, migration: Migration) -> None:
+    record = text("""
+        INSERT INTO public.schema_migrations (version, name, checksum)
+        VALUES (:version, :name, :checksum)
+    """)
+    params = {"version": migration.version, "name": migration.name, "checksum": migration.checksum}
+
+    if migration.transactional:
+        try:
+            # no_parameters : script envoyé tel quel (plusieurs instructions, pas d'interprétation des %)
+            conn.exec_driver_sql(migration.read_sql(), execution_options={"no_parameters": True})
+            conn.execute(record, params)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    else:
+        # Hors transaction : instructions envoyées une par une, sinon Postgres
+        # les regroupe dans une transaction implicite
+        conn.execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            for statement in _split_statements(migration.read_sql()):
+                conn.exec_driver_sql(statement, execution_options={"no_parameters": True})
+            conn.execute(record, params)
+        finally:
+            conn.execution_options(isolation_level=conn.default_isolation_level)
+
+
+def _split_statements(sql: str) -> list[str]:
+    """Naive split on `;` at end of line (no-transaction migrations must not use $$ bodies)"""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    statements = re.split(r";\s*$", "\n".join(lines), flags=re.MULTILINE)
+    return [s.strip() for s in statements if s.strip()]
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    import argparse
+    from app.core.database import engine
+
+    parser = argparse.ArgumentParser(prog="python -m app.core.migrations")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="Show current and expected schema versions")
+    up = sub.add_parser("upgrade", help="Apply pending migrations")
+    up.add_argument("--target", type=int, default=None, help="Stop at this version")
+    st = sub.add_parser("stamp", help="Mark migrations up to VERSION as applied without running them")
+    st.add_argument("version", type=int)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.command == "status":
+        status = check_schema_version(engine)
+        print(f"current={status.current} expected={status.expected} pending={status.pending}")
+        return 1 if status.pending else 0
+
+    if args.command == "stamp":
+        stamped = stamp(engine, args.version)
+        print(f"Stamped {len(stamped)} migration(s)")
+        for migration in stamped:
+            print(f"  - {migration.version:04d}_{migration.name}")
+        return 0
+
+    applied = upgrade(engine, target=args.target)
+    print(f"Applied {len(applied)} migration(s)")
+    for migration in applied:
+        print(f"  - {migration.version:04d}_{migration.name}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
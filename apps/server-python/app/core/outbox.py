@@ -0,0 +1,282 @@
+"""
+Outbox transactionnelle pour les effets de bord distants
+
+Une requête qui doit déclencher un appel Supabase (email de récupération,
+suppression d'un compte...) insère un message dans `public.outbox` dans sa
+propre transaction, puis répond dès le commit. Le worker de chaque process
+(tâche périodique, voir app/core/tasks.py) :
+
+1. réserve un lot de messages échus (`FOR UPDATE SKIP LOCKED` : plusieurs workers
+   ne prennent jamais le même message) en repoussant leur échéance d'un bail,
+   puis valide tout de suite pour ne garder aucun verrou pendant les appels ;
+2. exécute les handlers en parallèle, au plus OUTBOX_CONCURRENCY à la fois ;
+3. marque chaque message traité, ou le replanifie avec un backoff exponentiel
+   (abandon après OUTBOX_MAX_ATTEMPTS tentatives, statut "failed").
+
+Si un worker s'arrête en cours de traitement, le bail expire et le message est
+repris : un handler doit donc être idempotent. `dedup_key` évite de mettre deux
+fois en file le même effet tant qu'il n'a pas été traité.
+
+Là où les tâches de fond ne tournent pas (Vercel), vider la file depuis un cron :
+
+    python -m app.core.outbox drain
+    python -m app.core.outbox status
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Optional
+import asyncio
+import logging
+import random
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.models.outbox import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_MESSAGES = registry.counter(
+    "outbox_messages_total", "Outbox message processing outcomes", ("kind", "status")
+)
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+# Un message réservé n'est repris par un autre worker qu'après ce délai
+CLAIM_LEASE = timedelta(minutes=5)
+
+
+class OutboxError(Exception):
+    """Raised by a handler whose side effect did not happen (the message is retried)"""
+
+
+Handler = Callable[[dict], None]
+
+
+def _send_recovery_email(payload: dict) -> None:
+    from app.core.supabase import send_recovery_email
+
+    if not send_recovery_email(payload["email"]):
+        raise OutboxError("Supabase did not accept the recovery email")
+
+
+def _admin_delete_user(payload: dict) -> None:
+    from app.core.supabase import admin_delete_user
+
+    if not admin_delete_user(payload["user_id"]):
+        raise OutboxError("Supabase admin_delete_user failed")
+
+
+HANDLERS: dict[str, Handler] = {
+    "supabase.send_recovery_email": _send_recovery_email,
+    "supabase.admin_delete_user": _admin_delete_user,
+}
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def enqueue(db: Session, kind: str, payload: dict[str, Any], dedup_key: Optional[str] = None) -> bool:
+    """Add a message to the caller's transaction; return False if an identical one is already pending
+
+    Le message n'est visible du worker qu'après le commit de l'appelant.
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown outbox message kind {kind!r}")
+    now = _now()
+    message = OutboxMessage(
+        kind=kind, payload=payload, dedup_key=dedup_key, status=PENDING,
+        attempts=0, next_attempt_at=now, created_at=now,
+    )
+    if dedup_key is None:
+        db.add(message)
+        return True
+    # SAVEPOINT : un doublon n'annule pas le reste de la transaction de l'appelant
+    try:
+        with db.begin_nested():
+            db.add(message)
+    except IntegrityError:
+        return False
+    return True
+
+
+def backoff_delay(attempts: int, base: float = 5.0, cap: float = 3600.0) -> float:
+    """Exponential backoff with jitter after `attempts` failed attempts"""
+    return min(cap, base * 2 ** (attempts - 1)) * random.uniform(0.5, 1.5)
+
+
+@dataclass
+class ClaimedMessage:
+    id: int
+    kind: str
+    payload: dict
+    attempts: int
+
+
+class OutboxWorker:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        handlers: Optional[dict[str, Handler]] = None,
+        batch_size: int = 50,
+        concurrency: int = 8,
+        max_attempts: int = 8,
+    ):
+        self.session_factory = session_factory
+        self.handlers = HANDLERS if handlers is None else handlers
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+
+    def claim(self) -> list[ClaimedMessage]:
+        """Reserve a batch of due messages and commit right away"""
+        now = _now()
+        with self.session_factory() as db:
+            ids = select(OutboxMessage.id).where(
+                OutboxMessage.status == PENDING, OutboxMessage.next_attempt_at <= now
+            ).order_by(OutboxMessage.next_attempt_at).limit(self.batch_size).with_for_update(skip_locked=True)
+            rows = db.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id.in_(ids.scalar_subquery()))
+                .values(attempts=OutboxMessage.attempts + 1, next_attempt_at=now + CLAIM_LEASE)
+                .returning(OutboxMessage.id, OutboxMessage.kind, OutboxMessage.payload, OutboxMessage.attempts)
+                .execution_options(synchronize_session=False)
+            ).all()
+            db.commit()
+        return [ClaimedMessage(*row) for row in rows]
+
+    def _run(self, message: ClaimedMessage) -> Optional[str]:
+        """Run one handler; return the error message, None on success"""
+        handler = self.handlers.get(message.kind)
+        if handler is None:
+            return f"No handler for {message.kind!r}"
+        try:
+            handler(message.payload)
+        except Exception as e:
+            logger.warning(
+                "Outbox message failed",
+                extra={"outbox_id": message.id, "kind": message.kind, "attempts": message.attempts},
+                exc_info=True,
+            )
+            return f"{type(e).__name__}: {e}"[:1000]
+        return None
+
+    def complete(self, results: list[tuple[ClaimedMessage, Optional[str]]]) -> None:
+        """Mark messages done, or schedule their retry"""
+        now = _now()
+        with self.session_factory() as db:
+            done = [message.id for message, error in results if error is None]
+            if done:
+                db.execute(
+                    update(OutboxMessage).where(OutboxMessage.id.in_(done))
+                    .values(status=DONE, processed_at=now, last_error=None)
+                    .execution_options(synchronize_session=False)
+                )
+            for message, error in results:
+                if error is None:
+                    OUTBOX_MESSAGES.inc((message.kind, DONE))
+                    continue
+                if message.attempts >= self.max_attempts:
+                    values = {"status": FAILED, "processed_at": now, "last_error": error}
+                    OUTBOX_MESSAGES.inc((message.kind, FAILED))
+                    logger.error("Outbox message abandoned", extra={"outbox_id": message.id, "kind": message.kind})
+                else:
+                    values = {"next_attempt_at": now + timedelta(seconds=backoff_delay(message.attempts)), "last_error": error}
+                    OUTBOX_MESSAGES.inc((message.kind, "retry"))
+                db.execute(
+                    update(OutboxMessage).where(OutboxMessage.id == message.id).values(**values)
+                    .execution_options(synchronize_session=False)
+                )
+            db.commit()
+
+    async def drain_once(self) -> int:
+        """Claim and process one batch; return the number of messages processed"""
+        messages = await asyncio.to_thread(self.claim)
+        if not messages:
+            return 0
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(message: ClaimedMessage) -> tuple[ClaimedMessage, Optional[str]]:
+            async with semaphore:
+                return message, await asyncio.to_thread(self._run, message)
+
+        results = await asyncio.gather(*(run(message) for message in messages))
+        await asyncio.to_thread(self.complete, list(results))
+        return len(messages)
+
+    async def __call__(self) -> Optional[float]:
+        """Periodic task: a full batch asks to run again immediately"""
+        processed = await self.drain_once()
+        return 0.0 if processed >= self.batch_size else None
+
+    def purge(self, older_than: timedelta) -> int:
+        """Delete processed messages older than `older_than`"""
+        with self.session_factory() as db:
+            result = db.execute(
+                delete(OutboxMessage).where(
+                    OutboxMessage.status != PENDING, OutboxMessage.processed_at < _now() - older_than
+                )
+            )
+            db.commit()
+        return result.rowcount
+
+    def stats(self) -> dict[str, int]:
+        with self.session_factory() as db:
+            rows = db.execute(select(OutboxMessage.status, func.count()).group_by(OutboxMessage.status)).all()
+        return {status: count for status, count in rows}
+
+
+def build_outbox_worker() -> OutboxWorker:
+    from app.core.database import SessionLocal
+
+    return OutboxWorker(
+        SessionLocal,
+        batch_size=settings.OUTBOX_BATCH_SIZE,
+        concurrency=settings.OUTBOX_CONCURRENCY,
+        max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+    )
+
+
+def purge_outbox() -> None:
+    """Periodic task: drop processed messages past the retention period"""
+    purged = build_outbox_worker().purge(timedelta(days=settings.OUTBOX_RETENTION_DAYS))
+    if purged:
+        logger.info("Purged processed outbox messages", extra={"count": purged})
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m app.core.outbox")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("drain", help="Process due messages until none is left")
+    sub.add_parser("status", help="Count messages by status")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    worker = build_outbox_worker()
+
+    if args.command == "status":
+        for status, count in sorted(worker.stats().items()):
+            print(f"{status:<8} {count}")
+        return 0
+
+    total = 0
+    while True:
+        processed = asyncio.run(worker.drain_once())
+        total += processed
+        if processed < worker.batch_size:
+            break
+    print(f"Processed {total} message(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,49 @@
+"""
+Limites par plan (FREE / PRO)
+
+Deux limites par utilisateur sur les routes /api/keys :
+- débit : requêtes par fenêtre glissante (app.core.rate_limit), en-têtes RateLimit-* ;
+- nombre de clés actives : compteur user_profiles.active_key_count, incrémenté
+  et décrémenté dans la transaction qui crée / révoque la clé (pas de COUNT(*)).
+"""
+
+from dataclasses import dataclass
+
+from app.core.config import settings
+from app.core.rate_limit import SlidingWindowLimiter, rate_limit_backend
+from app.models.user import PlanType
+
+
+@dataclass(frozen=True)
+class PlanLimits:
+    max_api_keys: int
+    key_requests: int  # par fenêtre de KEY_RATE_LIMIT_WINDOW_SECONDS
+
+
+PLAN_LIMITS = {
+    PlanType.FREE: PlanLimits(settings.FREE_MAX_API_KEYS, settings.FREE_KEY_RATE_LIMIT),
+    PlanType.PRO: PlanLimits(settings.PRO_MAX_API_KEYS, settings.PRO_KEY_RATE_LIMIT),
+}
+
+# Un limiteur par plan : un passage en PRO prend effet immédiatement
+KEY_LIMITERS = {
+    plan: SlidingWindowLimiter(
+        f"keys_{plan.value.lower()}", rate_limit_backend, limits.key_requests, settings.KEY_RATE_LIMIT_WINDOW_SECONDS
+    )
+    for plan, limits in PLAN_LIMITS.items()
+}
+
+
+def limits_for(plan) -> PlanLimits:
+    """Limits of a plan; unknown or missing plans get the FREE limits"""
+    try:
+        return PLAN_LIMITS[PlanType(plan)]
+    except ValueError:
+        return PLAN_LIMITS[PlanType.FREE]
+
+
+def key_limiter_for(plan) -> SlidingWindowLimiter:
+    try:
+        return KEY_LIMITERS[PlanType(plan)]
+    except ValueError:
+        return KEY_LIMITERS[PlanType.FREE]
@@ -0,0 +1,161 @@
+"""
+Profilage par requête
+
+Un RequestProfile est attaché au contexte de la requête ; les points instrumentés
+(requêtes SQL, JWT, Argon2, AES-GCM, Supabase) y ajoutent leur durée via `span()`.
+Le middleware renvoie le résultat dans l'en-tête `Server-Timing` (SERVER_TIMING_ENABLED,
+désactivé par défaut), et en JSON dans `X-Request-Profile` si PROFILING_DEBUG est actif et
+que le client envoie `X-Debug-Profile: 1`.
+
+Jamais sur les routes d'authentification : la présence ou la durée du span argon2 (ou le
+nombre de requêtes) indiquerait à un client anonyme si un email a un compte.
+
+Hors requête profilée, `span()` ne fait qu'une lecture de ContextVar.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+import json
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+
+class RequestProfile:
+    __slots__ = ("started", "spans", "queries")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        # nom -> [durée cumulée (s), nombre d'appels]
+        self.spans: dict[str, list] = {}
+        self.queries: list[str] = []
+
+    def add(self, name: str, duration: float) -> None:
+        entry = self.spans.get(name)
+        if entry is None:
+            self.spans[name] = [duration, 1]
+        else:
+            entry[0] += duration
+            entry[1] += 1
+
+    @property
+    def query_count(self) -> int:
+        return len(self.queries)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        parts = [
+            f'{name};dur={duration * 1000:.2f};desc="{count}x"'
+            for name, (duration, count) in self.spans.items()
+        ]
+        parts.append(f"total;dur={self.elapsed() * 1000:.2f}")
+        return ", ".join(parts)
+
+    def to_dict(self) -> dict:
+        return {
+            "total_ms": round(self.elapsed() * 1000, 2),
+            "spans": {
+                name: {"ms": round(duration * 1000, 2), "count": count}
+                for name, (duration, count) in self.spans.items()
+            },
+            "queries": self.queries,
+        }
+
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+
+def current_profile() -> Optional[RequestProfile]:
+    return _current_profile.get()
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time a block and add it to the current request profile, if any"""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, time.perf_counter() - start)
+
+
+@contextmanager
+def profile_scope(reuse: bool = False) -> Iterator[RequestProfile]:
+    """Activate a fresh profile for the enclosed block (used by the middleware and tests).
+
+    With `reuse=True`, an already active profile is kept, so a test wrapping an
+    ASGI call sees the queries recorded inside the middleware.
+    """
+    existing = _current_profile.get()
+    if reuse and existing is not None:
+        yield existing
+        return
+    profile = RequestProfile()
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _current_profile.reset(token)
+
+
+# Hooks SQLAlchemy, enregistrés sur la classe Engine : couvrent tous les engines
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None:
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    if profile is None:
+        return
+    starts = conn.info.get("profile_query_start")
+    if starts:
+        profile.add("db", time.perf_counter() - starts.pop())
+    profile.queries.append(statement)
+
+
+# Préfixes de chemin sans Server-Timing ni profil de débogage
+UNTIMED_PATH_PREFIXES = ("/api/auth/",)
+
+
+class ServerTimingMiddleware:
+    """Pure ASGI middleware profiling each request and emitting `Server-Timing`"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not settings.SERVER_TIMING_ENABLED
+            or scope["path"].startswith(UNTIMED_PATH_PREFIXES)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        debug = settings.PROFILING_DEBUG and (b"x-debug-profile", b"1") in scope["headers"]
+
+        with profile_scope(reuse=True) as profile:
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", profile.server_timing().encode("latin-1")))
+                    if debug:
+                        headers.append((b"x-request-profile", json.dumps(profile.to_dict()).encode("utf-8")))
+                    message["headers"] = headers
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,219 @@
+"""
+Limitation de débit
+
+Fenêtre glissante approximée par deux compteurs fixes : le compteur de la
+fenêtre courante plus celui de la précédente, pondéré par la part de la
+précédente qui chevauche encore la fenêtre glissante. Deux entiers par clé,
+quel que soit le nombre de requêtes, et seulement MGET / SET NX EX / INCR côté
+stockage partagé.
+
+Backends :
+- "memory" : dict du process (défaut) ; chaque worker a ses propres compteurs,
+  la limite effective est donc multipliée par le nombre de workers ;
+- "redis" : compteurs partagés entre workers et instances (REDIS_URL, paquet
+  `redis` requis).
+
+Une requête refusée n'incrémente pas les compteurs, et une erreur du stockage
+partagé laisse passer la requête (journalisée) plutôt que de bloquer les connexions.
+"""
+
+from dataclasses import dataclass
+from typing import Optional, Protocol, Sequence
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+try:
+    import redis
+except ImportError:  # dépendance optionnelle, seulement pour RATE_LIMIT_BACKEND=redis
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED = registry.counter(
+    "rate_limit_rejections_total", "Requests rejected by a rate limiter", ("limiter",)
+)
+RATE_LIMIT_ERRORS = registry.counter(
+    "rate_limit_backend_errors_total", "Rate limiter backend failures (request allowed)", ("limiter",)
+)
+
+
+class RateLimitBackend(Protocol):
+    def get_many(self, keys: Sequence[str]) -> list[int]:
+        """Current value of each counter (0 when missing or expired)"""
+
+    def incr(self, key: str, ttl: float) -> int:
+        """Increment a counter that expires `ttl` seconds after its creation"""
+
+
+class InMemoryBackend:
+    """Counters local to this process"""
+
+    def __init__(self, max_keys: int = 100_000):
+        self._counters: dict[str, tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        # Au-delà, les compteurs expirés sont purgés (bornage de la mémoire sous attaque)
+        self.max_keys = max_keys
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+    def get_many(self, keys: Sequence[str]) -> list[int]:
+        now = time.monotonic()
+        values = []
+        for key in keys:
+            entry = self._counters.get(key)
+            values.append(entry[0] if entry is not None and entry[1] > now else 0)
+        return values
+
+    def incr(self, key: str, ttl: float) -> int:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._counters.get(key)
+            if entry is None or entry[1] <= now:
+                if len(self._counters) >= self.max_keys:
+                    self._evict(now)
+                entry = (0, now + ttl)
+            value = entry[0] + 1
+            self._counters[key] = (value, entry[1])
+            return value
+
+    def _evict(self, now: float) -> None:
+        expired = [key for key, (_, expires) in self._counters.items() if expires <= now]
+        for key in expired:
+            del self._counters[key]
+        if len(self._counters) >= self.max_keys:
+            # Que des compteurs vivants : on abandonne les plus proches de l'expiration
+            oldest = sorted(self._counters, key=lambda k: self._counters[k][1])
+            for key in oldest[: len(oldest) // 10 + 1]:
+                del self._counters[key]
+
+
+class RedisBackend:
+    """Counters shared by every worker through Redis"""
+
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisBackend":
+        if redis is None:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package (pip install redis)")
+        return cls(redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2))
+
+    def get_many(self, keys: Sequence[str]) -> list[int]:
+        return [int(value) if value is not None else 0 for value in self.client.mget(list(keys))]
+
+    def incr(self, key: str, ttl: float) -> int:
+        pipe = self.client.pipeline()
+        # SET NX : l'expiration est fixée à la création du compteur, pas repoussée à chaque hit
+        pipe.set(key, 0, ex=math.ceil(ttl), nx=True)
+        pipe.incr(key)
+        _, value = pipe.execute()
+        return int(value)
+
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    # Secondes avant qu'une nouvelle requête soit acceptée (0 si acceptée)
+    retry_after: int
+    # Secondes avant que le quota soit reconstitué (en-tête RateLimit-Reset)
+    reset: int = 0
+
+    def headers(self) -> dict[str, str]:
+        """RateLimit-* headers (IETF draft), plus Retry-After when rejected"""
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(self.reset),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(self.retry_after)
+        return headers
+
+
+class SlidingWindowLimiter:
+    def __init__(self, name: str, backend: RateLimitBackend, limit: int, window: float):
+        self.name = name
+        self.backend = backend
+        self.limit = limit
+        self.window = window
+
+    def _keys(self, identifier: str, now: float) -> tuple[str, str, float]:
+        index = int(now // self.window)
+        elapsed = now - index * self.window
+        return f"rl:{self.name}:{identifier}:{index}", f"rl:{self.name}:{identifier}:{index - 1}", elapsed
+
+    def _estimate(self, current: int, previous: int, elapsed: float) -> float:
+        return previous * (1 - elapsed / self.window) + current
+
+    def _retry_after(self, current: int, previous: int, elapsed: float) -> int:
+        if current >= self.limit or previous == 0:
+            # La fenêtre courante seule suffit à bloquer : attendre qu'elle devienne la précédente
+            wait = self.window - elapsed
+        else:
+            # Instant où la part pondérée de la fenêtre précédente repasse sous la limite
+            wait = self.window * (1 - (self.limit - current) / previous) - elapsed
+        return max(1, math.ceil(wait))
+
+    def hit(self, identifier: str, now: Optional[float] = None) -> RateLimitResult:
+        """Count one request for `identifier` unless it exceeds the limit"""
+        now = time.time() if now is None else now
+        current_key, previous_key, elapsed = self._keys(identifier, now)
+        try:
+            current, previous = self.backend.get_many((current_key, previous_key))
+            if self._estimate(current, previous, elapsed) >= self.limit:
+                RATE_LIMITED.inc((self.name,))
+                retry_after = self._retry_after(current, previous, elapsed)
+                return RateLimitResult(False, self.limit, 0, retry_after, retry_after)
+            # Le compteur vit deux fenêtres : il sert encore de fenêtre précédente
+            current = self.backend.incr(current_key, 2 * self.window)
+        except Exception:
+            RATE_LIMIT_ERRORS.inc((self.name,))
+            logger.warning("Rate limiter backend failed, request allowed", extra={"limiter": self.name}, exc_info=True)
+            return RateLimitResult(True, self.limit, self.limit, 0)
+        remaining = max(0, math.floor(self.limit - self._estimate(current, previous, elapsed)))
+        return RateLimitResult(True, self.limit, remaining, 0, max(1, math.ceil(self.window - elapsed)))
+
+
+RATE_LIMIT_BACKENDS = {"memory": lambda: InMemoryBackend(), "redis": lambda: RedisBackend.from_url(settings.REDIS_URL)}
+
+
+def build_rate_limit_backend(backend: Optional[str] = None) -> RateLimitBackend:
+    backend = (backend or settings.RATE_LIMIT_BACKEND).lower()
+    if backend not in RATE_LIMIT_BACKENDS:
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND {backend!r} (expected one of {sorted(RATE_LIMIT_BACKENDS)})")
+    return RATE_LIMIT_BACKENDS[backend]()
+
+
+def email_key(email: str) -> str:
+    """Stable key for an email without storing the address itself"""
+    return hashlib.sha256(email.strip().lower().encode("utf-8")).hexdigest()[:32]
+
+
+def client_ip(request) -> str:
+    """Client address, from X-Forwarded-For when behind a trusted proxy"""
+    if settings.TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            # Dernière adresse = celle vue par le proxy de confiance (les précédentes sont fournies par le client)
+            return forwarded.rsplit(",", 1)[-1].strip()
+    return request.client.host if request.client else "unknown"
+
+
+rate_limit_backend = build_rate_limit_backend()
+
+login_ip_limiter = SlidingWindowLimiter(
+    "login_ip", rate_limit_backend, settings.LOGIN_RATE_LIMIT_IP, settings.LOGIN_RATE_LIMIT_WINDOW_SECONDS
+)
+login_email_limiter = SlidingWindowLimiter(
+    "login_email", rate_limit_backend, settings.LOGIN_RATE_LIMIT_EMAIL, settings.LOGIN_RATE_LIMIT_WINDOW_SECONDS
+)
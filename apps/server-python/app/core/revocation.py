@@ -0,0 +1,177 @@
+"""
+Liste de révocation des JWT
+
+Chaque jeton porte un `jti`. Un logout insère ce jti dans `public.revoked_tokens`
+avec la date d'expiration du jeton ; chaque worker en garde une copie en mémoire :
+
+- un dict jti -> expiration, consulté par get_current_user (lecture O(1), sans requête SQL) ;
+- un tas trié par expiration, qui permet d'évincer les entrées expirées sans
+  parcourir tout le dict : la mémoire est bornée par le nombre de jetons révoqués
+  encore valides.
+
+La copie est rafraîchie de façon incrémentale (seules les lignes révoquées depuis
+le dernier passage) par une tâche de fond. `revoked_at` et le repère du dernier
+passage viennent tous deux de l'horloge de la base, jamais de celle d'un serveur :
+un décalage d'horloge entre machines ne fait pas manquer de révocation. Le
+recouvrement (REVOCATION_OVERLAP_SECONDS) couvre les transactions validées après
+le passage suivant. Là où les tâches ne tournent pas
+(Vercel, lifespan désactivé), le rafraîchissement est fait à la demande quand la
+copie est trop ancienne, au plus une fois par intervalle.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Union
+import heapq
+import logging
+import threading
+import time
+import uuid
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.models.revoked_token import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+
+def _timestamp(value: Union[datetime, int, float]) -> float:
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return float(value)
+
+
+class RevocationList:
+    def __init__(self, refresh_interval: float, overlap_seconds: float = 60.0):
+        self.refresh_interval = refresh_interval
+        # Les lignes révoquées peu avant le dernier passage sont relues : NOW() est l'heure de
+        # début de la transaction, qui peut être validée après notre lecture
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self._expiry: dict[str, float] = {}
+        self._heap: list[tuple[float, str]] = []
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.RLock()
+        self._watermark: Optional[datetime] = None
+        self._refreshed_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def is_revoked(self, jti: str) -> bool:
+        return jti in self._expiry
+
+    def add(self, jti: str, expires_at: Union[datetime, int, float]) -> None:
+        expiry = _timestamp(expires_at)
+        if expiry <= time.time():
+            return
+        with self._lock:
+            if jti not in self._expiry:
+                self._expiry[jti] = expiry
+                heapq.heappush(self._heap, (expiry, jti))
+
+    def evict_expired(self, now: Optional[float] = None) -> int:
+        """Drop entries whose token has expired anyway; return how many were dropped"""
+        now = time.time() if now is None else now
+        evicted = 0
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, jti = heapq.heappop(self._heap)
+                self._expiry.pop(jti, None)
+                evicted += 1
+        return evicted
+
+    def refresh(self, db: Session) -> int:
+        """Load revocations newer than the last refresh; return the number of rows read"""
+        with self._refresh_lock:
+            # Repère pris avant la lecture, sur l'horloge de la base
+            db_now = db.execute(select(func.now())).scalar()
+            if isinstance(db_now, datetime) and db_now.tzinfo is None:
+                db_now = db_now.replace(tzinfo=timezone.utc)
+
+            query = select(RevokedToken.jti, RevokedToken.expires_at).where(
+                RevokedToken.expires_at > datetime.now(timezone.utc)
+            )
+            if self._watermark is not None:
+                query = query.where(RevokedToken.revoked_at > self._watermark - self.overlap)
+            rows = db.execute(query).all()
+
+            for jti, expires_at in rows:
+                self.add(jti, expires_at)
+            self._watermark = db_now
+
+            self.evict_expired()
+            self._refreshed_at = time.monotonic()
+            return len(rows)
+
+    def ensure_fresh(self, db: Session) -> None:
+        """Refresh synchronously if the background task has not done it recently"""
+        if self._refreshed_at is not None and time.monotonic() - self._refreshed_at < 3 * self.refresh_interval:
+            return
+        # Une seule requête à la fois fait le rafraîchissement, les autres continuent
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self.refresh(db)
+        except Exception:
+            db.rollback()
+            # Pas de nouvel essai à chaque requête : on réessaiera après le même délai
+            self._refreshed_at = time.monotonic()
+            logger.warning("Revocation list refresh failed", exc_info=True)
+        finally:
+            self._refresh_lock.release()
+
+    def revoke(self, db: Session, jti: str, user_id: Optional[str], expires_at: Union[datetime, int, float]) -> None:
+        """Persist a revocation and apply it to this worker immediately"""
+        expiry = datetime.fromtimestamp(_timestamp(expires_at), tz=timezone.utc)
+        try:
+            owner = uuid.UUID(str(user_id)) if user_id else None
+        except ValueError:
+            owner = None
+        self.add(jti, expiry)
+        try:
+            # revoked_at : DEFAULT NOW() de la base
+            db.add(RevokedToken(jti=jti, user_id=owner, expires_at=expiry))
+            db.commit()
+        except IntegrityError:
+            # Déjà révoqué (double logout)
+            db.rollback()
+
+    def purge(self, db: Session) -> int:
+        """Delete rows of expired tokens"""
+        result = db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= datetime.now(timezone.utc)))
+        db.commit()
+        return result.rowcount
+
+
+revocation_list = RevocationList(
+    refresh_interval=settings.REVOCATION_REFRESH_SECONDS,
+    overlap_seconds=settings.REVOCATION_OVERLAP_SECONDS,
+)
+
+registry.gauge_callback(
+    "revoked_tokens_cached", "Revoked JWTs held in this worker's revocation list",
+    lambda: {(): len(revocation_list)},
+)
+
+
+def refresh_revocation_list() -> None:
+    """Periodic task: incremental refresh of the in-memory list"""
+    from app.core.database import SessionLocal
+
+    with SessionLocal() as db:
+        revocation_list.refresh(db)
+
+
+def purge_revoked_tokens() -> None:
+    """Periodic task: drop revocations of tokens that have expired"""
+    from app.core.database import SessionLocal
+
+    with SessionLocal() as db:
+        purged = revocation_list.purge(db)
+    if purged:
+        logger.info("Purged expired revoked tokens", extra={"count": purged})
@@ -1,43 +1,387 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature, encode_dss_signature
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.backends import default_backend
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
 import base64
+import binascii
+import calendar
+import hashlib
+import hmac
+import json
 import os
+import time
+import uuid
 from app.core.config import settings
+from app.core.metrics import ARGON2_OPERATIONS, AESGCM_OPERATIONS
+from app.core.profiling import span
 
 # Password hashing
 pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    ARGON2_OPERATIONS.inc(("verify",))
+    with span("argon2"):
+        return pwd_context.verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    ARGON2_OPERATIONS.inc(("hash",))
+    with span("argon2"):
+        return pwd_context.hash(password)
+
+
+class TokenError(Exception):
+    """Invalid, tampered or expired token"""
+
+
+class TokenCodec:
+    """Encode and decode signed JWTs.
+
+    Every backend produces and accepts the same compact HS* tokens, with the
+    same claim checks as python-jose: `exp`/`nbf` (no leeway), `iat` integer,
+    `sub`/`jti` strings, `aud` rejected since no audience is configured.
+    """
+
+    algorithm: str
+
+    def encode(self, claims: dict) -> str:
+        raise NotImplementedError
+
+    def decode(self, token: str) -> dict:
+        """Return the verified claims or raise TokenError"""
+        raise NotImplementedError
+
+
+class JoseTokenCodec(TokenCodec):
+    """python-jose backend, kept for compatibility"""
+
+    def __init__(self, secret: str, algorithm: str = "HS256"):
+        self.secret = secret
+        self.algorithm = algorithm
+
+    def encode(self, claims: dict) -> str:
+        return jwt.encode(claims, self.secret, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> dict:
+        try:
+            return jwt.decode(token, self.secret, algorithms=[self.algorithm])
+        except JWTError as e:
+            raise TokenError(str(e)) from e
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _numeric_date(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return calendar.timegm(value.utctimetuple())
+    return value
+
+
+_HMAC_DIGESTS = {"HS256": "sha256", "HS384": "sha384", "HS512": "sha512"}
+
+
+class HMACTokenCodec(TokenCodec):
+    """Standard-library HS256/384/512 backend (default).
+
+    The header segment is computed once and signatures use the one-shot
+    `hmac.digest`, which avoids python-jose's key objects and per-call
+    header handling.
+    """
+
+    def __init__(self, secret: str, algorithm: str = "HS256"):
+        if algorithm not in _HMAC_DIGESTS:
+            raise ValueError(f"Unsupported HMAC algorithm: {algorithm}")
+        self.algorithm = algorithm
+        self._key = secret.encode("utf-8")
+        self._digest = _HMAC_DIGESTS[algorithm]
+        header = json.dumps({"alg": algorithm, "typ": "JWT"}, separators=(",", ":"), sort_keys=True)
+        self._header = _b64encode(header.encode("utf-8"))
+        self._header_str = self._header.decode("ascii")
+
+    def encode(self, claims: dict) -> str:
+        payload = dict(claims)
+        for key in ("exp", "iat", "nbf"):
+            if key in payload:
+                payload[key] = _numeric_date(payload[key])
+        signing_input = self._header + b"." + _b64encode(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+        signature = _b64encode(hmac.digest(self._key, signing_input, self._digest))
+        return (signing_input + b"." + signature).decode("ascii")
+
+    def decode(self, token: str) -> dict:
+        try:
+            header_segment, payload_segment, signature_segment = token.split(".")
+        except (AttributeError, ValueError):
+            raise TokenError("Not enough segments")
+
+        if header_segment != self._header_str:
+            # En-tête différent du nôtre (ordre des clés, kid...) : vérifier l'algorithme
+            try:
+                header = json.loads(_b64decode(header_segment))
+            except (binascii.Error, ValueError):
+                raise TokenError("Invalid header")
+            if not isinstance(header, dict) or header.get("alg") != self.algorithm:
+                raise TokenError("The specified alg value is not allowed")
+
+        signing_input = f"{header_segment}.{payload_segment}".encode("ascii", "replace")
+        try:
+            signature = _b64decode(signature_segment)
+        except (binascii.Error, ValueError):
+            raise TokenError("Invalid signature padding")
+        if not hmac.compare_digest(signature, hmac.digest(self._key, signing_input, self._digest)):
+            raise TokenError("Signature verification failed")
+
+        try:
+            claims = json.loads(_b64decode(payload_segment))
+        except (binascii.Error, ValueError):
+            raise TokenError("Invalid payload")
+        if not isinstance(claims, dict):
+            raise TokenError("Invalid payload")
+        _validate_claims(claims)
+        return claims
+
+
+def _validate_claims(claims: dict) -> None:
+    now = int(time.time())
+    try:
+        if "iat" in claims:
+            int(claims["iat"])
+        if "nbf" in claims and int(claims["nbf"]) > now:
+            raise TokenError("The token is not yet valid (nbf)")
+        if "exp" in claims and int(claims["exp"]) < now:
+            raise TokenError("Signature has expired")
+    except (TypeError, ValueError):
+        raise TokenError("Time claims must be integers")
+    if "aud" in claims:
+        raise TokenError("Invalid audience")
+    if "sub" in claims and not isinstance(claims["sub"], str):
+        raise TokenError("Subject must be a string")
+    if "jti" in claims and not isinstance(claims["jti"], str):
+        raise TokenError("JWT ID must be a string")
+
+
+@dataclass
+class SigningKey:
+    """Private key used for EdDSA (Ed25519) or ES256 (P-256) signatures"""
+
+    private_key: Any
+    public_key: Any = field(init=False)
+    alg: str = field(init=False)
+    kid: str = field(init=False)
+    jwk: dict = field(init=False)
+
+    def __post_init__(self):
+        public_key = self.public_key = self.private_key.public_key()
+        if isinstance(self.private_key, ed25519.Ed25519PrivateKey):
+            self.alg = "EdDSA"
+            raw = public_key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+            members = {"crv": "Ed25519", "kty": "OKP", "x": _b64encode(raw).decode("ascii")}
+        elif isinstance(self.private_key, ec.EllipticCurvePrivateKey) and isinstance(self.private_key.curve, ec.SECP256R1):
+            self.alg = "ES256"
+            numbers = public_key.public_numbers()
+            members = {
+                "crv": "P-256",
+                "kty": "EC",
+                "x": _b64encode(numbers.x.to_bytes(32, "big")).decode("ascii"),
+                "y": _b64encode(numbers.y.to_bytes(32, "big")).decode("ascii"),
+            }
+        else:
+            raise ValueError("JWT signing keys must be Ed25519 or EC P-256")
+        # kid = empreinte JWK (RFC 7638) : membres requis, triés, sans espaces
+        thumbprint = hashlib.sha256(json.dumps(members, separators=(",", ":"), sort_keys=True).encode("utf-8"))
+        self.kid = _b64encode(thumbprint.digest()).decode("ascii")
+        self.jwk = {**members, "alg": self.alg, "kid": self.kid, "use": "sig"}
+
+    @classmethod
+    def from_pem(cls, pem: bytes) -> "SigningKey":
+        return cls(serialization.load_pem_private_key(pem, password=None))
+
+    def sign(self, data: bytes) -> bytes:
+        if self.alg == "EdDSA":
+            return self.private_key.sign(data)
+        r, s = decode_dss_signature(self.private_key.sign(data, ec.ECDSA(hashes.SHA256())))
+        return r.to_bytes(32, "big") + s.to_bytes(32, "big")
+
+    def verify(self, signature: bytes, data: bytes) -> bool:
+        try:
+            if self.alg == "EdDSA":
+                self.public_key.verify(signature, data)
+            else:
+                if len(signature) != 64:
+                    return False
+                der = encode_dss_signature(int.from_bytes(signature[:32], "big"), int.from_bytes(signature[32:], "big"))
+                self.public_key.verify(der, data, ec.ECDSA(hashes.SHA256()))
+            return True
+        except InvalidSignature:
+            return False
+
+
+class AsymmetricTokenCodec(TokenCodec):
+    """EdDSA/ES256 backend with key ids, verifiable offline through the JWKS.
+
+    The first key signs; every key verifies, so a new key can be published
+    before it becomes active and an old one kept until its tokens expire.
+    HS* tokens are delegated to `fallback` (tokens issued before the switch).
+    """
+
+    def __init__(self, keys: list[SigningKey], fallback: Optional[TokenCodec] = None):
+        if not keys:
+            raise ValueError("At least one signing key is required")
+        self.keys = {key.kid: key for key in keys}
+        self.active = keys[0]
+        self.algorithm = self.active.alg
+        self.fallback = fallback
+        # Segment d'en-tête exact -> clé, pour éviter de parser l'en-tête de nos propres jetons
+        self._headers = {self._header_segment(key): key for key in keys}
+        self._active_header = self._header_segment(self.active).encode("ascii")
+
+    @staticmethod
+    def _header_segment(key: SigningKey) -> str:
+        header = json.dumps({"alg": key.alg, "kid": key.kid, "typ": "JWT"}, separators=(",", ":"), sort_keys=True)
+        return _b64encode(header.encode("utf-8")).decode("ascii")
+
+    def jwks(self) -> dict:
+        return {"keys": [key.jwk for key in self.keys.values()]}
+
+    def encode(self, claims: dict) -> str:
+        payload = dict(claims)
+        for key in ("exp", "iat", "nbf"):
+            if key in payload:
+                payload[key] = _numeric_date(payload[key])
+        signing_input = self._active_header + b"." + _b64encode(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+        return (signing_input + b"." + _b64encode(self.active.sign(signing_input))).decode("ascii")
+
+    def decode(self, token: str) -> dict:
+        try:
+            header_segment, payload_segment, signature_segment = token.split(".")
+        except (AttributeError, ValueError):
+            raise TokenError("Not enough segments")
+
+        key = self._headers.get(header_segment)
+        if key is None:
+            try:
+                header = json.loads(_b64decode(header_segment))
+            except (binascii.Error, ValueError):
+                raise TokenError("Invalid header")
+            if not isinstance(header, dict):
+                raise TokenError("Invalid header")
+            if header.get("alg") in _HMAC_DIGESTS and self.fallback is not None:
+                return self.fallback.decode(token)
+            key = self.keys.get(header.get("kid"))
+            if key is None or header.get("alg") != key.alg:
+                raise TokenError("Unknown signing key")
+
+        try:
+            signature = _b64decode(signature_segment)
+        except (binascii.Error, ValueError):
+            raise TokenError("Invalid signature padding")
+        if not key.verify(signature, f"{header_segment}.{payload_segment}".encode("ascii", "replace")):
+            raise TokenError("Signature verification failed")
+
+        try:
+            claims = json.loads(_b64decode(payload_segment))
+        except (binascii.Error, ValueError):
+            raise TokenError("Invalid payload")
+        if not isinstance(claims, dict):
+            raise TokenError("Invalid payload")
+        _validate_claims(claims)
+        return claims
+
+
+TOKEN_BACKENDS = {"hmac": HMACTokenCodec, "jose": JoseTokenCodec}
+
+
+def load_signing_keys(paths: str) -> list[SigningKey]:
+    """Load comma-separated PEM private key paths, in order (first = active)"""
+    return [SigningKey.from_pem(Path(path.strip()).read_bytes()) for path in paths.split(",") if path.strip()]
+
+
+def build_token_codec(backend: Optional[str] = None) -> TokenCodec:
+    backend = (backend or settings.JWT_BACKEND).lower()
+    if backend not in TOKEN_BACKENDS:
+        raise ValueError(f"Unknown JWT_BACKEND {backend!r} (expected one of {sorted(TOKEN_BACKENDS)})")
+    shared = TOKEN_BACKENDS[backend](settings.JWT_SECRET, settings.JWT_ALGORITHM)
+    if settings.JWT_PRIVATE_KEYS:
+        fallback = shared if settings.JWT_ACCEPT_HS256 else None
+        return AsymmetricTokenCodec(load_signing_keys(settings.JWT_PRIVATE_KEYS), fallback=fallback)
+    return shared
+
+
+def jwks() -> dict:
+    """Public keys of the asymmetric codec (empty when tokens are HMAC-signed)"""
+    if isinstance(token_codec, AsymmetricTokenCodec):
+        return token_codec.jwks()
+    return {"keys": []}
+
+
+@lru_cache(maxsize=1)
+def jwks_document() -> tuple[bytes, str]:
+    """Serialized JWKS and its ETag, computed once per process"""
+    body = json.dumps(jwks(), separators=(",", ":"), sort_keys=True).encode("utf-8")
+    return body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+token_codec = build_token_codec()
+
+
+# Claim `type` : seuls les jetons d'accès authentifient une requête (pas les jetons de réinitialisation)
+ACCESS_TOKEN_TYPE = "access"
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
+    to_encode.setdefault("type", ACCESS_TOKEN_TYPE)
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.JWT_EXPIRATION_MINUTES)
 
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
+    # Identifiant unique : permet de révoquer ce jeton précisément (logout)
+    to_encode.setdefault("jti", uuid.uuid4().hex)
+    with span("jwt"):
+        encoded_jwt = token_codec.encode(to_encode)
     return encoded_jwt
 
 
 def decode_access_token(token: str) -> Optional[dict]:
     try:
-        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+        with span("jwt"):
+            payload = token_codec.decode(token)
         return payload
-    except JWTError:
+    except TokenError:
+        return None
+
+
+def create_password_reset_token(email: str) -> str:
+    """Short-lived token carrying the email, for the password reset flow"""
+    return create_access_token(
+        {"sub": email, "type": "password_reset"},
+        timedelta(minutes=settings.JWT_RESET_TOKEN_MINUTES),
+    )
+
+
+def verify_password_reset_token(token: str) -> Optional[str]:
+    """Return the email of a valid reset token, None otherwise"""
+    payload = decode_access_token(token)
+    if payload is None or payload.get("type") != "password_reset":
         return None
+    return payload.get("sub")
 
 
 # AES-256-GCM encryption for API keys
@@ -52,14 +396,18 @@ class CryptoManager:
 
     def encrypt(self, plaintext: str) -> tuple[bytes, bytes]:
         """Encrypt plaintext and return (ciphertext, nonce)"""
+        AESGCM_OPERATIONS.inc(("encrypt",))
         nonce = os.urandom(12)  # 96-bit nonce for AES-GCM
         data = plaintext.encode('utf-8')
-        ciphertext = self.aesgcm.encrypt(nonce, data, None)
+        with span("aesgcm"):
+            ciphertext = self.aesgcm.encrypt(nonce, data, None)
         return ciphertext, nonce
 
     def decrypt(self, ciphertext: bytes, nonce: bytes) -> str:
         """Decrypt ciphertext using nonce"""
-        data = self.aesgcm.decrypt(nonce, ciphertext, None)
+        AESGCM_OPERATIONS.inc(("decrypt",))
+        with span("aesgcm"):
+            data = self.aesgcm.decrypt(nonce, ciphertext, None)
         return data.decode('utf-8')
 
 
@@ -0,0 +1,176 @@
+"""
+Journal des requêtes lentes
+
+Toute requête SQL plus longue que SLOW_QUERY_MS est enregistrée dans un buffer
+circulaire en mémoire (SQL normalisé, forme des paramètres, durée). Pour une
+fraction SLOW_QUERY_EXPLAIN_SAMPLE_RATE des SELECT lents, un `EXPLAIN` est exécuté
+en arrière-plan sur une autre connexion, dans une transaction annulée, et son plan
+est joint à l'entrée.
+
+`EXPLAIN` seul par défaut : ANALYZE ré-exécute réellement la requête, et l'annulation
+de la transaction ne défait pas ses effets de session (verrou consultatif pris par
+pg_advisory_lock, séquence avancée par nextval...). Avec SLOW_QUERY_EXPLAIN_ANALYZE,
+`EXPLAIN (ANALYZE, BUFFERS)` n'est utilisé que pour les SELECT sans verrou ni appel
+de fonction à effet de bord connu (voir `safe_to_analyze`).
+
+Consultable via GET /api/admin/slow-queries.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Optional
+import logging
+import random
+import re
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Option d'exécution qui exclut une requête du journal (utilisée pour les EXPLAIN eux-mêmes)
+SKIP_OPTION = "skip_slow_query_log"
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Verrous, fonctions volatiles et appels de fonctions du schéma (ex. public.ensure_audit_log_partitions)
+_UNSAFE_TO_ANALYZE_RE = re.compile(
+    r"\bpg_advisory|\bpg_sleep|\bnextval\s*\(|\bsetval\s*\("
+    r"|\bFOR\s+(?:NO\s+KEY\s+)?UPDATE\b|\bFOR\s+(?:KEY\s+)?SHARE\b"
+    r"|\b\w+\.\w+\s*\(",
+    re.IGNORECASE,
+)
+
+
+def normalize_sql(statement: str) -> str:
+    """Replace literals with `?` and collapse whitespace, so similar queries group together"""
+    sql = _STRING_RE.sub("?", statement)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _IN_LIST_RE.sub("IN (...)", sql)
+    return _WHITESPACE_RE.sub(" ", sql).strip()
+
+
+def parameter_shape(parameters: Any, executemany: bool = False) -> Any:
+    """Describe parameters by type only (values may be secrets)"""
+    if executemany and isinstance(parameters, (list, tuple)):
+        first = parameter_shape(parameters[0]) if parameters else None
+        return {"executemany": len(parameters), "row": first}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return None
+
+
+def safe_to_analyze(statement: str) -> bool:
+    """Whether re-running the statement under EXPLAIN ANALYZE has no lasting side effect"""
+    return statement.lstrip()[:6].upper() == "SELECT" and not _UNSAFE_TO_ANALYZE_RE.search(statement)
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms: float, buffer_size: int, explain_sample_rate: float, explain_analyze: bool = False):
+        self.threshold = threshold_ms / 1000
+        self.explain_sample_rate = explain_sample_rate
+        self.explain_analyze = explain_analyze
+        self._entries: deque = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self._explain_executor: Optional[ThreadPoolExecutor] = None
+        self._engine: Optional[Engine] = None
+
+    def install(self, engine: Engine) -> None:
+        """Register the cursor hooks on one engine"""
+        self._engine = engine
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._slow_query_start = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_slow_query_start", None)
+        if start is None:
+            return
+        duration = time.perf_counter() - start
+        if duration < self.threshold or context.execution_options.get(SKIP_OPTION):
+            return
+        self.record(statement, parameters, duration, executemany)
+
+    def record(self, statement: str, parameters: Any, duration: float, executemany: bool = False) -> dict:
+        entry = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round(duration * 1000, 2),
+            "sql": normalize_sql(statement),
+            "params": parameter_shape(parameters, executemany),
+            "explain": None,
+        }
+        with self._lock:
+            self._entries.append(entry)
+
+        if (
+            not executemany
+            and self._engine is not None
+            and self._engine.dialect.name == "postgresql"
+            and statement.lstrip()[:6].upper() == "SELECT"
+            and random.random() < self.explain_sample_rate
+        ):
+            self._submit_explain(entry, statement, parameters)
+        return entry
+
+    def _submit_explain(self, entry: dict, statement: str, parameters: Any) -> None:
+        if self._explain_executor is None:
+            # Un seul thread : les EXPLAIN ANALYZE éventuels ré-exécutent la requête, on limite la charge
+            self._explain_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explain")
+        entry["explain"] = "pending"
+        self._explain_executor.submit(self._explain, entry, statement, parameters)
+
+    def _explain(self, entry: dict, statement: str, parameters: Any) -> None:
+        try:
+            with self._engine.connect() as conn:
+                conn = conn.execution_options(**{SKIP_OPTION: True})
+                with conn.begin() as transaction:
+                    analyze = self.explain_analyze and safe_to_analyze(statement)
+                    rows = conn.exec_driver_sql(
+                        ("EXPLAIN (ANALYZE, BUFFERS) " if analyze else "EXPLAIN ") + statement, parameters
+                    ).fetchall()
+                    transaction.rollback()
+            entry["explain"] = "\n".join(row[0] for row in rows)
+        except Exception as e:
+            logger.debug("EXPLAIN capture failed", exc_info=True)
+            entry["explain"] = f"error: {e}"
+
+    def entries(self, limit: Optional[int] = None) -> list[dict]:
+        with self._lock:
+            entries = list(self._entries)
+        entries.reverse()  # Plus récentes d'abord
+        return entries[:limit] if limit else entries
+
+    def summary(self) -> list[dict]:
+        """Group buffered entries by normalized SQL, slowest total first"""
+        groups: dict[str, dict] = {}
+        for entry in self.entries():
+            group = groups.setdefault(entry["sql"], {"sql": entry["sql"], "count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            group["count"] += 1
+            group["total_ms"] = round(group["total_ms"] + entry["duration_ms"], 2)
+            group["max_ms"] = max(group["max_ms"], entry["duration_ms"])
+        return sorted(groups.values(), key=lambda g: g["total_ms"], reverse=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+slow_query_log = SlowQueryLog(
+    threshold_ms=settings.SLOW_QUERY_MS,
+    buffer_size=settings.SLOW_QUERY_BUFFER_SIZE,
+    explain_sample_rate=settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+    explain_analyze=settings.SLOW_QUERY_EXPLAIN_ANALYZE,
+)
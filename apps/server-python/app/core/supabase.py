@@ -1,13 +1,17 @@
 from typing import Optional, Dict, Any
 import os
 import logging
+import time
 
 try:
     import requests
 except Exception:
     requests = None
 
+from app.core.circuit_breaker import CircuitOpenError, supabase_breakers
 from app.core.config import settings
+from app.core.metrics import SUPABASE_REQUESTS, SUPABASE_LATENCY
+from app.core.profiling import span
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +28,33 @@ def _headers():
     }
 
 
+def _request(endpoint: str, method: str, url: str, **kwargs):
+    """Perform an HTTP call to Supabase, recording count and latency under `endpoint`.
+
+    Raises CircuitOpenError without any network call while the endpoint's breaker is open.
+    """
+    breaker = supabase_breakers.get(endpoint)
+    if not breaker.allow():
+        SUPABASE_REQUESTS.inc((endpoint, "circuit_open"))
+        raise CircuitOpenError(endpoint)
+
+    kwargs.setdefault("timeout", settings.SUPABASE_TIMEOUT_SECONDS)
+    start = time.perf_counter()
+    status = "error"
+    success = False
+    try:
+        with span("supabase"):
+            resp = requests.request(method, url, **kwargs)
+        status = str(resp.status_code)
+        # Un 4xx est une réponse normale (mauvais mot de passe...) ; 5xx et lenteur sont des pannes
+        success = resp.status_code < 500 and time.perf_counter() - start < settings.SUPABASE_SLOW_CALL_SECONDS
+        return resp
+    finally:
+        breaker.record(success)
+        SUPABASE_REQUESTS.inc((endpoint, status))
+        SUPABASE_LATENCY.observe(time.perf_counter() - start, (endpoint,))
+
+
 def admin_create_user(email: str, password: str, user_metadata: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
     """Create a new user via Supabase Admin API. Requires SUPABASE_URL and SERVICE_KEY.
 
@@ -36,6 +67,24 @@ def admin_create_user(email: str, password: str, user_metadata: Optional[Dict[st
     if requests is None:
         raise RuntimeError("`requests` package required for Supabase admin calls")
 
+    resp = admin_create_user_response(email, password, user_metadata)
+    if resp.status_code not in (200, 201):
+        logger.error("Supabase admin_create_user failed: %s %s", resp.status_code, resp.text)
+        return None
+
+    return resp.json()
+
+
+def admin_create_user_response(
+    email: str,
+    password: str,
+    user_metadata: Optional[Dict[str, Any]] = None,
+    email_confirm: Optional[bool] = None,
+):
+    """Call the Admin API user creation and return the raw response (caller checks the status)."""
+    if requests is None:
+        raise RuntimeError("`requests` package required for Supabase admin calls")
+
     url = settings.SUPABASE_URL.rstrip('/') + '/auth/v1/admin/users'
     payload = {
         "email": email,
@@ -43,13 +92,10 @@ def admin_create_user(email: str, password: str, user_metadata: Optional[Dict[st
     }
     if user_metadata:
         payload["user_metadata"] = user_metadata
+    if email_confirm is not None:
+        payload["email_confirm"] = email_confirm
 
-    resp = requests.post(url, json=payload, headers=_headers(), timeout=10)
-    if resp.status_code not in (200, 201):
-        logger.error("Supabase admin_create_user failed: %s %s", resp.status_code, resp.text)
-        return None
-
-    return resp.json()
+    return _request("admin_create_user", "POST", url, json=payload, headers=_headers())
 
 
 def sign_in_with_password(email: str, password: str) -> Optional[Dict[str, Any]]:
@@ -65,7 +111,7 @@ def sign_in_with_password(email: str, password: str) -> Optional[Dict[str, Any]]
         "email": email,
         "password": password,
     }
-    resp = requests.post(url, data=data, headers={"Content-Type": "application/x-www-form-urlencoded"}, timeout=10)
+    resp = _request("sign_in_with_password", "POST", url, data=data, headers={"Content-Type": "application/x-www-form-urlencoded"})
     if resp.status_code != 200:
         logger.debug("Supabase sign_in failed: %s %s", resp.status_code, resp.text)
         return None
@@ -81,7 +127,7 @@ def get_user_from_token(access_token: str) -> Optional[Dict[str, Any]]:
 
     url = settings.SUPABASE_URL.rstrip('/') + '/auth/v1/user'
     headers = {"Authorization": f"Bearer {access_token}"}
-    resp = requests.get(url, headers=headers, timeout=10)
+    resp = _request("get_user_from_token", "GET", url, headers=headers)
     if resp.status_code != 200:
         logger.debug("Supabase get_user_from_token failed: %s %s", resp.status_code, resp.text)
         return None
@@ -98,7 +144,7 @@ def send_recovery_email(email: str) -> bool:
 
     url = settings.SUPABASE_URL.rstrip('/') + '/auth/v1/recover'
     payload = {"email": email}
-    resp = requests.post(url, json=payload, headers=_headers(), timeout=10)
+    resp = _request("send_recovery_email", "POST", url, json=payload, headers=_headers())
     return resp.status_code in (200, 204)
 
 
@@ -112,7 +158,7 @@ def admin_update_user_password(user_id: str, new_password: str) -> bool:
 
     url = settings.SUPABASE_URL.rstrip('/') + f'/auth/v1/admin/users/{user_id}'
     payload = {"password": new_password}
-    resp = requests.put(url, json=payload, headers=_headers(), timeout=10)
+    resp = _request("admin_update_user_password", "PUT", url, json=payload, headers=_headers())
     if resp.status_code not in (200, 204):
         logger.error("Supabase admin_update_user_password failed: %s %s", resp.status_code, resp.text)
         return False
@@ -128,7 +174,7 @@ def admin_delete_user(user_id: str) -> bool:
         raise RuntimeError("`requests` package required for Supabase auth calls")
 
     url = settings.SUPABASE_URL.rstrip('/') + f'/auth/v1/admin/users/{user_id}'
-    resp = requests.delete(url, headers=_headers(), timeout=10)
+    resp = _request("admin_delete_user", "DELETE", url, headers=_headers())
     if resp.status_code not in (200, 204):
         logger.error("Supabase admin_delete_user failed: %s %s", resp.status_code, resp.text)
         return False
@@ -0,0 +1,123 @@
+"""
+Tâches de fond périodiques
+
+Chaque worker exécute ses propres tâches dans sa boucle asyncio, démarrées et
+arrêtées avec l'application (événements startup / shutdown de main.py).
+Une fonction synchrone est exécutée dans un thread pour ne pas bloquer la
+boucle ; une exception est journalisée et comptée, la tâche continue.
+
+Si la fonction renvoie un nombre plus petit que l'intervalle, il le remplace pour le
+prochain passage (ex: un balayeur qui se réveille à la prochaine échéance connue).
+
+    scheduler.add(PeriodicTask("revocation_refresh", refresh, interval=5))
+"""
+
+from typing import Awaitable, Callable, Optional, Union
+import asyncio
+import inspect
+import logging
+import random
+import time
+
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+TASK_RUNS = registry.counter(
+    "background_task_runs_total", "Background task executions", ("task", "status")
+)
+TASK_DURATION = registry.histogram(
+    "background_task_duration_seconds", "Background task execution time", ("task",)
+)
+
+TaskFunc = Callable[[], Union[Optional[float], Awaitable[Optional[float]]]]
+
+
+def _is_async(func) -> bool:
+    # Fonction async, ou objet dont __call__ est async (ex: OutboxWorker)
+    return inspect.iscoroutinefunction(func) or inspect.iscoroutinefunction(getattr(func, "__call__", None))
+
+
+class PeriodicTask:
+    def __init__(
+        self,
+        name: str,
+        func: TaskFunc,
+        interval: float,
+        initial_delay: float = 0.0,
+        jitter: float = 0.1,
+    ):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.initial_delay = initial_delay
+        # Fraction aléatoire ajoutée à l'intervalle : les workers ne tombent pas tous ensemble
+        self.jitter = jitter
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def run_once(self) -> Optional[float]:
+        """Run the function once; return the delay it asked for, if any"""
+        start = time.perf_counter()
+        try:
+            if _is_async(self.func):
+                result = await self.func()
+            else:
+                result = await asyncio.to_thread(self.func)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            TASK_RUNS.inc((self.name, "error"))
+            logger.exception("Background task failed", extra={"task": self.name})
+            return None
+        finally:
+            TASK_DURATION.observe(time.perf_counter() - start, (self.name,))
+        TASK_RUNS.inc((self.name, "ok"))
+        return result if isinstance(result, (int, float)) and not isinstance(result, bool) else None
+
+    async def _loop(self) -> None:
+        if self.initial_delay > 0:
+            await asyncio.sleep(self.initial_delay)
+        while True:
+            requested = await self.run_once()
+            delay = self.interval if requested is None else max(0.0, min(requested, self.interval))
+            await asyncio.sleep(delay * (1 + random.uniform(0, self.jitter)))
+
+    def start(self) -> None:
+        if not self.running:
+            self._task = asyncio.get_running_loop().create_task(self._loop(), name=f"periodic:{self.name}")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+class TaskScheduler:
+    """Set of periodic tasks started and stopped together"""
+
+    def __init__(self):
+        self.tasks: dict[str, PeriodicTask] = {}
+
+    def add(self, task: PeriodicTask) -> PeriodicTask:
+        # Ré-ajouter un nom existant renvoie la tâche déjà enregistrée
+        return self.tasks.setdefault(task.name, task)
+
+    def start(self) -> None:
+        for task in self.tasks.values():
+            task.start()
+
+    async def stop(self) -> None:
+        for task in self.tasks.values():
+            await task.stop()
+
+
+scheduler = TaskScheduler()
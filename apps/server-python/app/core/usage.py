@@ -0,0 +1,160 @@
+"""
+Suivi d'utilisation des clés API (écriture différée)
+
+Chaque révélation d'une clé incrémente un compteur en mémoire au lieu de mettre à
+jour sa ligne : la tâche de fond "api_key_usage" (toutes les USAGE_FLUSH_SECONDS)
+échange le tampon contre un tampon vide puis applique les compteurs cumulés en
+une requête par lot :
+
+    UPDATE api_keys SET usage_count = usage_count + v.uses, last_used_at = GREATEST(...)
+    FROM (VALUES (...), (...)) AS v (id, uses, last_used_at) WHERE api_keys.id = v.id
+
+Mémoire bornée : au plus USAGE_MAX_PENDING_KEYS clés distinctes en attente. Au-delà,
+les utilisations de nouvelles clés sont perdues (comptées dans
+api_key_usage_dropped_total) et un vidage anticipé est demandé. Si l'écriture échoue,
+les compteurs sont remis dans le tampon pour le passage suivant. Le tampon est vidé à
+l'arrêt du worker (événement shutdown de main.py) ; un arrêt brutal perd au plus un
+intervalle d'utilisations.
+"""
+
+from datetime import datetime
+from typing import Callable, Optional
+import logging
+import threading
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+USAGE_FLUSHED = registry.counter(
+    "api_key_usage_flushed_total", "API key usage events written to the database"
+)
+USAGE_DROPPED = registry.counter(
+    "api_key_usage_dropped_total", "API key usage events dropped because the buffer was full"
+)
+
+
+class UsageAggregator:
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        max_keys: int = 100_000,
+        batch_size: int = 1000,
+    ):
+        self.session_factory = session_factory
+        self.max_keys = max_keys
+        self.batch_size = batch_size
+        # id de clé -> [utilisations, dernière utilisation]
+        self._pending: dict[str, list] = {}
+        self._flush_requested = False
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def record(self, key_id, when: Optional[datetime] = None) -> bool:
+        """Count one use of a key; return False if the buffer is full"""
+        key_id = str(key_id)
+        when = when or datetime.utcnow()
+        with self._lock:
+            entry = self._pending.get(key_id)
+            if entry is None:
+                if len(self._pending) >= self.max_keys:
+                    self._flush_requested = True
+                    USAGE_DROPPED.inc()
+                    return False
+                self._pending[key_id] = [1, when]
+            else:
+                entry[0] += 1
+                if when > entry[1]:
+                    entry[1] = when
+        return True
+
+    def pending(self, key_id) -> tuple[int, Optional[datetime]]:
+        """Uses recorded by this worker and not yet written"""
+        with self._lock:
+            entry = self._pending.get(str(key_id))
+            return (entry[0], entry[1]) if entry else (0, None)
+
+    def take(self) -> dict[str, list]:
+        """Swap the buffer for an empty one and return its content"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flush_requested = False
+        return pending
+
+    def restore(self, pending: dict[str, list]) -> None:
+        """Put back counters whose write failed (within the memory bound)"""
+        with self._lock:
+            for key_id, (uses, last_used_at) in pending.items():
+                entry = self._pending.get(key_id)
+                if entry is not None:
+                    entry[0] += uses
+                    entry[1] = max(entry[1], last_used_at)
+                elif len(self._pending) < self.max_keys:
+                    self._pending[key_id] = [uses, last_used_at]
+                else:
+                    USAGE_DROPPED.inc(amount=uses)
+
+    @staticmethod
+    def update_statement(size: int):
+        """`UPDATE ... FROM (VALUES ...)` for `size` rows, parameters id_i / uses_i / at_i"""
+        values = ", ".join(
+            f"(CAST(:id_{i} AS uuid), CAST(:uses_{i} AS bigint), CAST(:at_{i} AS timestamp))" for i in range(size)
+        )
+        return text(f"""
+            UPDATE public.api_keys AS k
+            SET usage_count = k.usage_count + v.uses,
+                last_used_at = GREATEST(k.last_used_at, v.last_used_at)
+            FROM (VALUES {values}) AS v (id, uses, last_used_at)
+            WHERE k.id = v.id
+        """)
+
+    def flush(self) -> int:
+        """Write the buffered counters; return the number of keys updated"""
+        pending = self.take()
+        if not pending:
+            return 0
+        if self.session_factory is None:
+            from app.core.database import SessionLocal
+            self.session_factory = SessionLocal
+
+        items = sorted(pending.items())  # Ordre stable : pas d'interblocage entre workers
+        written = 0
+        with self.session_factory() as db:
+            for start in range(0, len(items), self.batch_size):
+                batch = items[start:start + self.batch_size]
+                params = {}
+                for i, (key_id, (uses, last_used_at)) in enumerate(batch):
+                    params.update({f"id_{i}": key_id, f"uses_{i}": uses, f"at_{i}": last_used_at})
+                try:
+                    db.execute(self.update_statement(len(batch)), params)
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    logger.warning("API key usage flush failed", extra={"count": len(batch)}, exc_info=True)
+                    self.restore(dict(items[start:]))
+                    break
+                written += len(batch)
+                USAGE_FLUSHED.inc(amount=sum(uses for _, (uses, _) in batch))
+        return written
+
+    def __call__(self) -> Optional[float]:
+        """Periodic task: flush, and run again right away if the buffer filled up meanwhile"""
+        self.flush()
+        return 0.0 if self._flush_requested else None
+
+
+usage_tracker = UsageAggregator(
+    max_keys=settings.USAGE_MAX_PENDING_KEYS,
+    batch_size=settings.USAGE_FLUSH_BATCH_SIZE,
+)
+
+registry.gauge_callback(
+    "api_key_usage_pending_keys", "API keys with usage not yet written by this worker",
+    lambda: {(): len(usage_tracker)},
+)
@@ -1,12 +1,24 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
 from app.core.config import settings
-from app.core.database import engine, Base
-from app.routes import auth, apikeys, billing
+from app.core.database import engine
+from app.core.migrations import check_schema_version, upgrade
+from app.core.metrics import MetricsMiddleware, registry as metrics_registry, register_pool_stats
+from app.core.logging_config import RequestIdMiddleware, setup_logging, shutdown_logging
+from app.core.profiling import ServerTimingMiddleware
+from app.core.slow_queries import slow_query_log
+from app.core.security import jwks, jwks_document
+from app.core.revocation import purge_revoked_tokens, refresh_revocation_list
+from app.core.outbox import build_outbox_worker, purge_outbox
+from app.maintenance.jobs import archive_revoked_keys, sweep_expired_keys
+from app.core.usage import usage_tracker
+from app.core.audit import audit_log, ensure_partitions
+from app.core.tasks import PeriodicTask, scheduler
+from app.routes import auth, apikeys, audit, billing, admin
 from pathlib import Path
 import fnmatch
 
@@ -80,24 +92,75 @@ app.add_middleware(
     allow_origins=allowed_origins,
 )
 
+# Profilage par requête (en-tête Server-Timing)
+app.add_middleware(ServerTimingMiddleware)
+
+# Métriques par route
+app.add_middleware(MetricsMiddleware)
+register_pool_stats(engine)
+slow_query_log.install(engine)
+
+# Identifiant de corrélation (ajouté en dernier = middleware le plus externe)
+app.add_middleware(RequestIdMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix="/api")
 app.include_router(apikeys.router, prefix="/api")
+app.include_router(audit.router, prefix="/api")
 app.include_router(billing.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
 
 
 @app.on_event("startup")
 async def startup_event():
-    """Create database tables on startup"""
-    # In production, use Alembic migrations instead
+    """Check the database schema version on startup (single query, no DDL)"""
+    import logging
+    setup_logging()
     try:
-        Base.metadata.create_all(bind=engine)
+        schema = check_schema_version(engine)
+        if schema.pending and settings.DB_AUTO_MIGRATE:
+            upgrade(engine)
+        elif schema.pending:
+            logging.warning(
+                f"Database schema is at version {schema.current}, expected {schema.expected}. "
+                "Run: python -m app.core.migrations upgrade"
+            )
     except Exception as e:
         # Log error but don't prevent startup
-        import logging
         logging.error(f"Warning: Could not connect to database on startup: {e}")
         logging.warning("Application will start, but database operations may fail")
 
+    # Tâches de fond de ce worker
+    scheduler.add(PeriodicTask("revocation_refresh", refresh_revocation_list, settings.REVOCATION_REFRESH_SECONDS))
+    scheduler.add(PeriodicTask("revoked_tokens_purge", purge_revoked_tokens, 3600, initial_delay=60))
+    scheduler.add(PeriodicTask("outbox", build_outbox_worker(), settings.OUTBOX_POLL_SECONDS, initial_delay=1))
+    scheduler.add(PeriodicTask("outbox_purge", purge_outbox, 3600, initial_delay=120))
+    scheduler.add(PeriodicTask(
+        "api_key_archiver", archive_revoked_keys, settings.API_KEY_ARCHIVE_INTERVAL_SECONDS, initial_delay=300
+    ))
+    scheduler.add(PeriodicTask(
+        "api_key_expiry", sweep_expired_keys, settings.API_KEY_EXPIRY_MAX_SLEEP_SECONDS, initial_delay=5
+    ))
+    scheduler.add(PeriodicTask("api_key_usage", usage_tracker, settings.USAGE_FLUSH_SECONDS))
+    scheduler.add(PeriodicTask("audit", audit_log, settings.AUDIT_FLUSH_SECONDS))
+    scheduler.add(PeriodicTask("audit_partitions", ensure_partitions, 86400))
+    scheduler.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background tasks, write pending key usage and audit events, then flush queued log records"""
+    import asyncio
+    import logging
+    await scheduler.stop()
+    try:
+        await asyncio.to_thread(usage_tracker.flush)
+    except Exception:
+        logging.exception("Could not write pending API key usage on shutdown")
+    # Événements d'audit encore en file (un échec est journalisé par flush, sans lever)
+    await asyncio.to_thread(audit_log.flush)
+    shutdown_logging()
+
 
 @app.get("/")
 async def root():
@@ -111,6 +174,8 @@ async def root():
         "status": "running",
         "endpoints": {
             "health": "/health",
+            "metrics": "/metrics",
+            "jwks": "/.well-known/jwks.json",
             "test_db": "/test-db",
             "auth": "/api/auth",
             "apiKeys": "/api/apikeys",
@@ -125,6 +190,24 @@ async def health_check():
     return {"status": "ok"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics for this worker process"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/.well-known/jwks.json", include_in_schema=False)
+async def jwks_endpoint(request: Request):
+    """Public JWT signing keys, so other services verify our tokens without calling /api/auth/me"""
+    if not jwks()["keys"]:
+        return JSONResponse(status_code=404, content={"detail": "Asymmetric JWT signing is not enabled"})
+    body, etag = jwks_document()
+    headers = {"Cache-Control": f"public, max-age={settings.JWKS_CACHE_SECONDS}", "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @app.get("/test-db")
 async def test_database():
     """
@@ -0,0 +1,116 @@
+"""
+Tâches de maintenance de la base, exécutées par lots
+
+Chaque tâche traite au plus `batch_size` lignes par transaction, puis valide :
+les verrous restent courts, une interruption ne perd que le lot en cours, et
+relancer la tâche reprend là où elle s'était arrêtée (les lignes déjà traitées
+ne correspondent plus au critère, ou le curseur `--start-after` est repris).
+
+Le mode `--dry-run` n'écrit rien : il estime le nombre de lignes concernées et
+en affiche un échantillon.
+
+Usage:
+    python -m app.maintenance list
+    python -m app.maintenance duplicate-keys --dry-run
+    python -m app.maintenance purge-archived-keys --older-than-days 730 --batch-size 5000
+"""
+
+from dataclasses import dataclass, field
+from typing import Optional
+import argparse
+import logging
+import time
+
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+
+class MaintenanceJob:
+    """Base class: a job is estimated, sampled, then run batch by batch"""
+
+    name = ""
+    description = ""
+
+    def add_arguments(self, parser: argparse.ArgumentParser) -> None:
+        """Job-specific command line options"""
+
+    def configure(self, args: argparse.Namespace) -> None:
+        """Read the options added by add_arguments"""
+
+    def estimate(self, conn: Connection) -> int:
+        """Number of rows the job would change"""
+        raise NotImplementedError
+
+    def sample(self, conn: Connection, limit: int) -> list[dict]:
+        """A few of the rows the job would change"""
+        raise NotImplementedError
+
+    def run_batch(self, conn: Connection, batch_size: int, cursor: Optional[str]) -> tuple[int, Optional[str], bool]:
+        """Process one batch; return (rows changed, cursor to resume after, finished)"""
+        raise NotImplementedError
+
+
+@dataclass
+class JobReport:
+    job: str
+    dry_run: bool
+    estimated: Optional[int] = None
+    processed: int = 0
+    batches: int = 0
+    cursor: Optional[str] = None
+    finished: bool = False
+    elapsed_seconds: float = 0.0
+    sample: list[dict] = field(default_factory=list)
+
+
+JOBS: dict[str, MaintenanceJob] = {}
+
+
+def register(job: MaintenanceJob) -> MaintenanceJob:
+    JOBS[job.name] = job
+    return job
+
+
+def run_job(
+    job: MaintenanceJob,
+    engine: Engine,
+    batch_size: int = 1000,
+    dry_run: bool = False,
+    max_batches: Optional[int] = None,
+    pause: float = 0.0,
+    start_after: Optional[str] = None,
+    sample_size: int = 20,
+) -> JobReport:
+    """Run a job in batches of one transaction each (or only report with dry_run)"""
+    started = time.perf_counter()
+    report = JobReport(job=job.name, dry_run=dry_run, cursor=start_after)
+
+    if dry_run:
+        with engine.connect() as conn:
+            report.estimated = job.estimate(conn)
+            report.sample = job.sample(conn, sample_size)
+        report.elapsed_seconds = time.perf_counter() - started
+        return report
+
+    while max_batches is None or report.batches < max_batches:
+        with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                # Ne pas rester bloqué derrière le trafic applicatif : le lot échoue et on peut relancer
+                conn.exec_driver_sql("SET LOCAL lock_timeout = '5s'")
+            processed, cursor, finished = job.run_batch(conn, batch_size, report.cursor)
+        report.batches += 1
+        report.processed += processed
+        report.cursor = cursor
+        logger.info(
+            "Maintenance batch done",
+            extra={"job": job.name, "batch": report.batches, "rows": processed, "cursor": cursor},
+        )
+        if finished:
+            report.finished = True
+            break
+        if pause > 0:
+            time.sleep(pause)
+
+    report.elapsed_seconds = time.perf_counter() - started
+    return report
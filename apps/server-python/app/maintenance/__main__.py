@@ -0,0 +1,69 @@
+"""
+Point d'entrée : python -m app.maintenance <tâche> [options]
+
+Utilise le moteur SQLAlchemy de l'application (DATABASE_URL).
+"""
+
+from typing import Optional
+import argparse
+import json
+import logging
+
+from app.maintenance import JOBS, run_job
+import app.maintenance.jobs  # noqa: F401  (enregistre les tâches)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.maintenance", description="Batched database maintenance")
+    sub = parser.add_subparsers(dest="job", required=True)
+    sub.add_parser("list", help="List the available jobs")
+    for job in JOBS.values():
+        job_parser = sub.add_parser(job.name, help=job.description, description=job.description)
+        job_parser.add_argument("--dry-run", action="store_true", help="Only estimate and show a sample, change nothing")
+        job_parser.add_argument("--batch-size", type=int, default=1000, help="Rows per transaction (default 1000)")
+        job_parser.add_argument("--max-batches", type=int, default=None, help="Stop after this many batches")
+        job_parser.add_argument("--sleep", type=float, default=0.0, help="Pause between batches, in seconds")
+        job_parser.add_argument("--start-after", default=None, help="Resume cursor printed by a previous run")
+        job_parser.add_argument("--sample", type=int, default=20, help="Sample size for --dry-run")
+        job.add_arguments(job_parser)
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.job == "list":
+        for job in JOBS.values():
+            print(f"{job.name:<22} {job.description}")
+        return 0
+
+    from app.core.database import engine
+
+    job = JOBS[args.job]
+    job.configure(args)
+    report = run_job(
+        job, engine,
+        batch_size=args.batch_size,
+        dry_run=args.dry_run,
+        max_batches=args.max_batches,
+        pause=args.sleep,
+        start_after=args.start_after,
+        sample_size=args.sample,
+    )
+
+    if report.dry_run:
+        print(f"[dry-run] {job.name}: {report.estimated} row(s) would be changed")
+        for row in report.sample:
+            print("  " + json.dumps(row, default=str))
+        return 0
+
+    print(f"{job.name}: {report.processed} row(s) changed in {report.batches} batch(es), {report.elapsed_seconds:.1f}s")
+    if not report.finished:
+        resume = f" --start-after {report.cursor}" if report.cursor else ""
+        print(f"Stopped before the end; resume with: python -m app.maintenance {job.name}{resume}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,338 @@
+"""
+Tâches de maintenance (PostgreSQL)
+
+Chaque lot est une seule requête ensembliste (CTE + DELETE/UPDATE ... RETURNING) :
+aucun aller-retour par ligne. Les suppressions de clés actives décrémentent
+user_profiles.active_key_count dans la même requête.
+"""
+
+from typing import Optional
+import argparse
+import json
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.core.audit import KEY_REVOKED
+from app.core.config import settings
+from app.maintenance import MaintenanceJob, register, run_job
+
+logger = logging.getLogger(__name__)
+
+
+def _rows(conn: Connection, sql: str, **params) -> list[dict]:
+    return [dict(row._mapping) for row in conn.execute(text(sql), params)]
+
+
+# Décrémente le compteur de clés actives des propriétaires des clés supprimées
+# (à combiner avec une CTE "deleted" qui renvoie user_id et revoked)
+_RELEASE_KEY_SLOTS = """
+    released AS (
+        SELECT user_id, COUNT(*) AS total FROM deleted WHERE NOT revoked GROUP BY user_id
+    ),
+    adjusted AS (
+        UPDATE public.user_profiles p
+        SET active_key_count = GREATEST(p.active_key_count - r.total, 0)
+        FROM released r
+        WHERE p.id = r.user_id
+    )
+"""
+
+
+class DuplicateKeysJob(MaintenanceJob):
+    name = "duplicate-keys"
+    description = "Delete API keys sharing a hash, keeping one per hash (active first, then oldest)"
+
+    # Rang de chaque clé parmi celles qui partagent son hash ; rang 1 = clé conservée
+    RANKED = """
+        ranked AS (
+            SELECT id, hash, name, user_id, revoked, created_at,
+                   ROW_NUMBER() OVER (PARTITION BY hash ORDER BY revoked, created_at, id) AS position
+            FROM public.api_keys
+            WHERE hash IN (SELECT hash FROM public.api_keys GROUP BY hash HAVING COUNT(*) > 1)
+        )
+    """
+
+    def estimate(self, conn: Connection) -> int:
+        return conn.execute(text(f"WITH {self.RANKED} SELECT COUNT(*) FROM ranked WHERE position > 1")).scalar()
+
+    def sample(self, conn: Connection, limit: int) -> list[dict]:
+        return _rows(conn, f"""
+            WITH {self.RANKED}
+            SELECT left(hash, 16) AS hash, id, name, user_id, revoked, created_at, position > 1 AS delete
+            FROM ranked ORDER BY hash, position LIMIT :limit
+        """, limit=limit)
+
+    def run_batch(self, conn: Connection, batch_size: int, cursor: Optional[str]) -> tuple[int, Optional[str], bool]:
+        deleted = conn.execute(text(f"""
+            WITH {self.RANKED},
+            doomed AS (SELECT id FROM ranked WHERE position > 1 LIMIT :batch_size),
+            deleted AS (
+                DELETE FROM public.api_keys k USING doomed d WHERE k.id = d.id
+                RETURNING k.user_id, k.revoked
+            ),
+            {_RELEASE_KEY_SLOTS}
+            SELECT COUNT(*) FROM deleted
+        """), {"batch_size": batch_size}).scalar()
+        return deleted, None, deleted < batch_size
+
+
+class OrphanProfilesJob(MaintenanceJob):
+    name = "orphan-profiles"
+    description = "Delete user_profiles without a matching auth.users row (their keys and invoices cascade)"
+
+    ORPHANS = """
+        SELECT p.id, p.plan, p.active_key_count, p.created_at
+        FROM public.user_profiles p
+        WHERE NOT EXISTS (SELECT 1 FROM auth.users u WHERE u.id = p.id)
+    """
+
+    def estimate(self, conn: Connection) -> int:
+        return conn.execute(text(f"SELECT COUNT(*) FROM ({self.ORPHANS}) o")).scalar()
+
+    def sample(self, conn: Connection, limit: int) -> list[dict]:
+        return _rows(conn, f"{self.ORPHANS} ORDER BY p.created_at LIMIT :limit", limit=limit)
+
+    def run_batch(self, conn: Connection, batch_size: int, cursor: Optional[str]) -> tuple[int, Optional[str], bool]:
+        deleted = conn.execute(text(f"""
+            WITH doomed AS ({self.ORPHANS} LIMIT :batch_size),
+            deleted AS (DELETE FROM public.user_profiles p USING doomed d WHERE p.id = d.id RETURNING p.id)
+            SELECT COUNT(*) FROM deleted
+        """), {"batch_size": batch_size}).scalar()
+        return deleted, None, deleted < batch_size
+
+
+class PurgeArchivedKeysJob(MaintenanceJob):
+    name = "purge-archived-keys"
+    description = "Delete keys archived more than --older-than-days days ago from api_keys_archive"
+
+    def __init__(self):
+        self.older_than_days = 365
+
+    def add_arguments(self, parser: argparse.ArgumentParser) -> None:
+        parser.add_argument("--older-than-days", type=int, default=365, help="Archive age (based on archived_at)")
+
+    def configure(self, args: argparse.Namespace) -> None:
+        self.older_than_days = args.older_than_days
+
+    # Lecture par idx_api_keys_archive_archived_at (migration 0007) ; api_keys n'est jamais touchée
+    PURGEABLE = """
+        SELECT id, user_id, name, archived_at
+        FROM public.api_keys_archive
+        WHERE archived_at < NOW() - make_interval(days => :days)
+    """
+
+    def estimate(self, conn: Connection) -> int:
+        return conn.execute(text(f"SELECT COUNT(*) FROM ({self.PURGEABLE}) p"), {"days": self.older_than_days}).scalar()
+
+    def sample(self, conn: Connection, limit: int) -> list[dict]:
+        return _rows(conn, f"{self.PURGEABLE} ORDER BY archived_at LIMIT :limit", days=self.older_than_days, limit=limit)
+
+    def run_batch(self, conn: Connection, batch_size: int, cursor: Optional[str]) -> tuple[int, Optional[str], bool]:
+        deleted = conn.execute(text(f"""
+            WITH doomed AS ({self.PURGEABLE} ORDER BY archived_at LIMIT :batch_size),
+            deleted AS (DELETE FROM public.api_keys_archive a USING doomed d WHERE a.id = d.id RETURNING a.id)
+            SELECT COUNT(*) FROM deleted
+        """), {"days": self.older_than_days, "batch_size": batch_size}).scalar()
+        return deleted, None, deleted < batch_size
+
+
+# Colonnes copiées de api_keys vers api_keys_archive (migration 0007)
+ARCHIVED_COLUMNS = (
+    "id", "user_id", "name", "provider", "provider_config", "prefix", "last4",
+    "enc_ciphertext", "enc_nonce", "hash", "revoked", "expires_at", "last_used_at", "usage_count",
+    "created_at", "updated_at",
+)
+
+
+class ArchiveRevokedKeysJob(MaintenanceJob):
+    name = "archive-revoked-keys"
+    description = "Move API keys revoked more than --older-than-days days ago to api_keys_archive"
+
+    def __init__(self, older_than_days: Optional[int] = None):
+        self.older_than_days = older_than_days
+
+    def add_arguments(self, parser: argparse.ArgumentParser) -> None:
+        parser.add_argument("--older-than-days", type=int, default=None, help="Default: API_KEY_ARCHIVE_DAYS")
+
+    def configure(self, args: argparse.Namespace) -> None:
+        self.older_than_days = args.older_than_days
+
+    @property
+    def days(self) -> int:
+        return settings.API_KEY_ARCHIVE_DAYS if self.older_than_days is None else self.older_than_days
+
+    # Lecture par idx_api_keys_revoked_updated_at ; SKIP LOCKED : pas d'attente sur une clé en cours de modification
+    ARCHIVABLE = """
+        SELECT id, user_id, name, updated_at
+        FROM public.api_keys
+        WHERE revoked AND updated_at < (NOW() AT TIME ZONE 'UTC') - make_interval(days => :days)
+    """
+
+    def estimate(self, conn: Connection) -> int:
+        return conn.execute(text(f"SELECT COUNT(*) FROM ({self.ARCHIVABLE}) a"), {"days": self.days}).scalar()
+
+    def sample(self, conn: Connection, limit: int) -> list[dict]:
+        return _rows(conn, f"{self.ARCHIVABLE} ORDER BY updated_at LIMIT :limit", days=self.days, limit=limit)
+
+    def run_batch(self, conn: Connection, batch_size: int, cursor: Optional[str]) -> tuple[int, Optional[str], bool]:
+        columns = ", ".join(ARCHIVED_COLUMNS)
+        moved = conn.execute(text(f"""
+            WITH doomed AS (
+                {self.ARCHIVABLE}
+                ORDER BY updated_at LIMIT :batch_size
+                FOR UPDATE SKIP LOCKED
+            ),
+            moved AS (
+                DELETE FROM public.api_keys k USING doomed d WHERE k.id = d.id
+                RETURNING {", ".join(f"k.{column}" for column in ARCHIVED_COLUMNS)}
+            ),
+            archived AS (
+                INSERT INTO public.api_keys_archive ({columns}, archived_at)
+                SELECT {columns}, NOW() FROM moved
+                RETURNING id
+            )
+            SELECT COUNT(*) FROM archived
+        """), {"days": self.days, "batch_size": batch_size}).scalar()
+        return moved, None, moved < batch_size
+
+
+def archive_revoked_keys() -> Optional[float]:
+    """Periodic task: archive one batch; a full batch asks to run again right away"""
+    from app.core.database import engine
+
+    report = run_job(ArchiveRevokedKeysJob(), engine, batch_size=settings.API_KEY_ARCHIVE_BATCH_SIZE, max_batches=1)
+    if report.processed:
+        logger.info("Archived revoked API keys", extra={"count": report.processed})
+    return None if report.finished else 1.0
+
+
+class ExpireKeysJob(MaintenanceJob):
+    name = "expire-keys"
+    description = "Revoke API keys whose expires_at has passed (releases their quota slot, writes key.revoked)"
+
+    # Lecture par idx_api_keys_expires_at, dans l'ordre des échéances
+    EXPIRED = """
+        SELECT id, user_id, name, expires_at
+        FROM public.api_keys
+        WHERE NOT revoked AND expires_at IS NOT NULL AND expires_at <= (NOW() AT TIME ZONE 'UTC')
+    """
+
+    def estimate(self, conn: Connection) -> int:
+        return conn.execute(text(f"SELECT COUNT(*) FROM ({self.EXPIRED}) e")).scalar()
+
+    def sample(self, conn: Connection, limit: int) -> list[dict]:
+        return _rows(conn, f"{self.EXPIRED} ORDER BY expires_at LIMIT :limit", limit=limit)
+
+    def run_batch(self, conn: Connection, batch_size: int, cursor: Optional[str]) -> tuple[int, Optional[str], bool]:
+        revoked = conn.execute(text(f"""
+            WITH doomed AS (
+                {self.EXPIRED}
+                ORDER BY expires_at LIMIT :batch_size
+                FOR UPDATE SKIP LOCKED
+            ),
+            deleted AS (
+                UPDATE public.api_keys k
+                SET revoked = true, updated_at = NOW() AT TIME ZONE 'UTC'
+                FROM doomed d
+                WHERE k.id = d.id AND NOT k.revoked
+                RETURNING k.id, k.user_id, false AS revoked
+            ),
+            -- Trace écrite dans la même transaction que la révocation
+            audited AS (
+                INSERT INTO public.audit_log (occurred_at, user_id, action, api_key_id, details)
+                SELECT NOW(), user_id, :action, id, CAST(:details AS jsonb) FROM deleted
+            ),
+            {_RELEASE_KEY_SLOTS}
+            SELECT COUNT(*) FROM deleted
+        """), {"batch_size": batch_size, "action": KEY_REVOKED, "details": json.dumps({"reason": "expired"})}).scalar()
+        return revoked, None, revoked < batch_size
+
+    def seconds_until_next_expiry(self, conn: Connection) -> Optional[float]:
+        """Time until the soonest pending expiry (first entry of the partial index)"""
+        return conn.execute(text("""
+            SELECT EXTRACT(EPOCH FROM expires_at - (NOW() AT TIME ZONE 'UTC'))
+            FROM public.api_keys
+            WHERE NOT revoked AND expires_at IS NOT NULL
+            ORDER BY expires_at LIMIT 1
+        """)).scalar()
+
+
+# Délai minimal quand un lot n'a rien révoqué alors qu'une échéance est passée
+EXPIRY_LOCKED_RETRY_SECONDS = 1.0
+
+
+def sweep_expired_keys() -> Optional[float]:
+    """Periodic task: revoke one batch of expired keys, then sleep until the next expiry
+
+    Le délai renvoyé remplace API_KEY_EXPIRY_MAX_SLEEP_SECONDS quand une échéance est plus
+    proche : pas de scrutation tant qu'aucune clé n'expire.
+    """
+    from app.core.database import engine
+
+    job = ExpireKeysJob()
+    report = run_job(job, engine, batch_size=settings.API_KEY_EXPIRY_BATCH_SIZE, max_batches=1)
+    if report.processed:
+        logger.info("Revoked expired API keys", extra={"count": report.processed})
+    if not report.finished:
+        return 0.0
+    with engine.connect() as conn:
+        remaining = job.seconds_until_next_expiry(conn)
+    if remaining is None:
+        return None
+    # Échéance passée mais rien traité : les clés sont verrouillées par un autre worker (SKIP LOCKED)
+    floor = 0.0 if report.processed else EXPIRY_LOCKED_RETRY_SECONDS
+    return max(float(remaining), floor)
+
+
+class RecountActiveKeysJob(MaintenanceJob):
+    name = "recount-active-keys"
+    description = "Recompute user_profiles.active_key_count from api_keys (walks profiles by id)"
+
+    MISMATCHES = """
+        SELECT p.id, p.active_key_count, COUNT(k.id) AS actual
+        FROM public.user_profiles p
+        LEFT JOIN public.api_keys k ON k.user_id = p.id AND NOT k.revoked
+        GROUP BY p.id
+        HAVING p.active_key_count <> COUNT(k.id)
+    """
+
+    def estimate(self, conn: Connection) -> int:
+        return conn.execute(text(f"SELECT COUNT(*) FROM ({self.MISMATCHES}) m")).scalar()
+
+    def sample(self, conn: Connection, limit: int) -> list[dict]:
+        return _rows(conn, f"{self.MISMATCHES} LIMIT :limit", limit=limit)
+
+    def run_batch(self, conn: Connection, batch_size: int, cursor: Optional[str]) -> tuple[int, Optional[str], bool]:
+        # Parcours par clé (id > curseur) : chaque lot lit batch_size profils via l'index primaire
+        row = conn.execute(text("""
+            WITH batch AS (
+                SELECT id FROM public.user_profiles
+                WHERE CAST(:after AS uuid) IS NULL OR id > CAST(:after AS uuid)
+                ORDER BY id LIMIT :batch_size
+            ),
+            counts AS (
+                SELECT b.id, COUNT(k.id) AS actual
+                FROM batch b LEFT JOIN public.api_keys k ON k.user_id = b.id AND NOT k.revoked
+                GROUP BY b.id
+            ),
+            fixed AS (
+                UPDATE public.user_profiles p SET active_key_count = c.actual
+                FROM counts c
+                WHERE p.id = c.id AND p.active_key_count <> c.actual
+                RETURNING p.id
+            )
+            SELECT (SELECT id FROM batch ORDER BY id DESC LIMIT 1) AS last_id,
+                   (SELECT COUNT(*) FROM batch) AS scanned,
+                   (SELECT COUNT(*) FROM fixed) AS fixed
+        """), {"after": cursor, "batch_size": batch_size}).one()
+        last_id = str(row.last_id) if row.last_id is not None else cursor
+        return row.fixed, last_id, row.scanned < batch_size
+
+
+for _job in (
+    DuplicateKeysJob(), OrphanProfilesJob(), ArchiveRevokedKeysJob(), PurgeArchivedKeysJob(), ExpireKeysJob(),
+    RecountActiveKeysJob(),
+):
+    register(_job)
@@ -1,12 +1,19 @@
 from app.models.user import User, PlanType
-from app.models.apikey import ApiKey, ProviderType
+from app.models.apikey import ApiKey, ApiKeyArchive, ProviderType
 from app.models.invoice import Invoice, InvoiceStatus
+from app.models.revoked_token import RevokedToken
+from app.models.outbox import OutboxMessage
+from app.models.audit import AuditLogEntry
 
 __all__ = [
     "User",
     "PlanType",
     "ApiKey",
+    "ApiKeyArchive",
     "ProviderType",
     "Invoice",
     "InvoiceStatus",
+    "RevokedToken",
+    "OutboxMessage",
+    "AuditLogEntry",
 ]
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Boolean, LargeBinary, Enum as SQLEnum, Text
+from sqlalchemy import Column, String, DateTime, ForeignKey, Boolean, LargeBinary, Enum as SQLEnum, Index, BigInteger, JSON, text
 from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import UUID, BYTEA
+from sqlalchemy.dialects.postgresql import UUID, BYTEA, JSONB
 from datetime import datetime
+from typing import Optional
 import uuid
 import enum
 from app.core.database import Base
@@ -13,20 +14,40 @@ class ProviderType(str, enum.Enum):
     IA = "IA"
 
 
+# JSONB en production (migration 0012), JSON sur sqlite (tests)
+ProviderConfig = JSON().with_variant(JSONB(), "postgresql")
+
+
 class ApiKey(Base):
     __tablename__ = "api_keys"
+    __table_args__ = (
+        # Index partiels (migration 0008) : les requêtes chaudes ne lisent que les clés actives
+        Index("idx_api_keys_user_active", "user_id", postgresql_where=text("NOT revoked")),
+        Index("idx_api_keys_revoked_updated_at", "updated_at", postgresql_where=text("revoked")),
+        Index("idx_api_keys_expires_at", "expires_at", postgresql_where=text("NOT revoked AND expires_at IS NOT NULL")),
+        # Filtre par configuration (migration 0013)
+        Index(
+            "idx_api_keys_provider_config", "provider_config",
+            postgresql_using="gin", postgresql_ops={"provider_config": "jsonb_path_ops"},
+            postgresql_where=text("NOT revoked"),
+        ),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("user_profiles.id", ondelete="CASCADE"), nullable=False)
     name = Column(String, nullable=False)
     provider = Column(SQLEnum(ProviderType), default=ProviderType.CUSTOM, nullable=False)
-    provider_config = Column(Text, nullable=True)  # JSON string for Supabase config
+    provider_config = Column(ProviderConfig, nullable=True)  # Supabase config (url, anonKey, serviceRoleKey)
     prefix = Column(String, nullable=False)
     last4 = Column(String, nullable=False)
     enc_ciphertext = Column(BYTEA, nullable=False)  # Encrypted API key
     enc_nonce = Column(BYTEA, nullable=False)  # Nonce for decryption
     hash = Column(String, unique=True, nullable=False, index=True)
     revoked = Column(Boolean, default=False, nullable=False)
+    expires_at = Column(DateTime, nullable=True)  # UTC ; NULL = pas d'expiration
+    # Écrits par lots par app/core/usage.py
+    last_used_at = Column(DateTime, nullable=True)
+    usage_count = Column(BigInteger, default=0, server_default="0", nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
@@ -35,3 +56,29 @@ class ApiKey(Base):
 
     def __repr__(self):
         return f"<ApiKey {self.prefix}***{self.last4}>"
+
+    def is_expired(self, now: Optional[datetime] = None) -> bool:
+        return self.expires_at is not None and self.expires_at <= (now or datetime.utcnow())
+
+
+class ApiKeyArchive(Base):
+    """Revoked keys moved out of api_keys by the archiver (migration 0007)"""
+    __tablename__ = "api_keys_archive"
+
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("user_profiles.id", ondelete="CASCADE"), nullable=False)
+    name = Column(String, nullable=False)
+    provider = Column(SQLEnum(ProviderType), nullable=False)
+    provider_config = Column(ProviderConfig, nullable=True)
+    prefix = Column(String, nullable=False)
+    last4 = Column(String, nullable=False)
+    enc_ciphertext = Column(BYTEA, nullable=False)
+    enc_nonce = Column(BYTEA, nullable=False)
+    hash = Column(String, nullable=False)
+    revoked = Column(Boolean, nullable=False)
+    expires_at = Column(DateTime, nullable=True)
+    last_used_at = Column(DateTime, nullable=True)
+    usage_count = Column(BigInteger, default=0, server_default="0", nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+    archived_at = Column(DateTime(timezone=True), nullable=False)
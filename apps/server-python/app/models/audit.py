@@ -0,0 +1,28 @@
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, JSON, Index
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+from app.core.database import Base
+
+
+class AuditLogEntry(Base):
+    """
+    Événement d'audit dans public.audit_log (ajout seul)
+    Table partitionnée par mois sur occurred_at ; clé primaire réelle (occurred_at, id), voir migration 0011.
+    Écrit par lots par app.core.audit, jamais par l'ORM.
+    """
+    __tablename__ = "audit_log"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    occurred_at = Column(DateTime(timezone=True), nullable=False)
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+    action = Column(String(32), nullable=False)
+    api_key_id = Column(UUID(as_uuid=True), nullable=True)
+    request_id = Column(String(64), nullable=True)
+    ip = Column(String(64), nullable=True)
+    details = Column(JSON().with_variant(JSONB, "postgresql"), nullable=True)
+
+    __table_args__ = (
+        Index("idx_audit_log_user_time", "user_id", occurred_at.desc(), id.desc()),
+    )
+
+    def __repr__(self):
+        return f"<AuditLogEntry {self.id} {self.action}>"
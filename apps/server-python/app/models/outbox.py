@@ -0,0 +1,34 @@
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, Text, JSON, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
+from app.core.database import Base
+
+
+class OutboxMessage(Base):
+    """
+    Effet de bord différé dans public.outbox
+    Inséré dans la transaction de la requête, traité après le commit par app.core.outbox
+    """
+    __tablename__ = "outbox"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    kind = Column(String(64), nullable=False)
+    payload = Column(JSON().with_variant(JSONB, "postgresql"), nullable=False, default=dict)
+    dedup_key = Column(String(255), nullable=True)
+    status = Column(String(16), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("idx_outbox_pending", "next_attempt_at", postgresql_where=text("status = 'pending'")),
+        Index(
+            "idx_outbox_pending_dedup_key", "dedup_key", unique=True,
+            postgresql_where=text("status = 'pending' AND dedup_key IS NOT NULL"),
+            sqlite_where=text("status = 'pending' AND dedup_key IS NOT NULL"),
+        ),
+    )
+
+    def __repr__(self):
+        return f"<OutboxMessage {self.id} {self.kind} {self.status}>"
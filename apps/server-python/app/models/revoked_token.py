@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, DateTime, func
+from sqlalchemy.dialects.postgresql import UUID
+from app.core.database import Base
+
+
+class RevokedToken(Base):
+    """
+    JWT révoqué (logout) dans public.revoked_tokens
+    Conservé jusqu'à expires_at, date d'expiration du jeton lui-même
+    """
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String(64), primary_key=True)
+    user_id = Column(UUID(as_uuid=True), nullable=True)
+    # Horloge de la base (DEFAULT NOW()) : sert de repère aux rafraîchissements incrémentaux
+    revoked_at = Column(DateTime(timezone=True), nullable=False, index=True, server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<RevokedToken {self.jti}>"
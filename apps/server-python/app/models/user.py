@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Enum as SQLEnum, Text
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Enum as SQLEnum, Text
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.hybrid import hybrid_property
@@ -23,6 +23,8 @@ class UserProfile(Base):
     id = Column(UUID(as_uuid=True), primary_key=True)  # Référence auth.users.id
     plan = Column(SQLEnum(PlanType), default=PlanType.FREE, nullable=False)
     stripe_id = Column(String, unique=True, nullable=True)
+    # Clés non révoquées, maintenu à la création / révocation (quota par plan sans COUNT(*))
+    active_key_count = Column(Integer, default=0, server_default="0", nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
@@ -0,0 +1,122 @@
+from datetime import datetime
+from uuid import UUID
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from app.core.audit import InvalidCursor, decode_cursor, fetch_events
+from app.core.config import settings
+from app.core.database import SessionLocal, get_db
+from app.core.slow_queries import slow_query_log
+from app.services.provisioning import ProvisioningError, parse_users, provision_users
+import json
+import secrets
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+def require_admin(x_admin_token: str | None = Header(default=None)) -> None:
+    """Check the X-Admin-Token header against ADMIN_TOKEN"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Not found"
+        )
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid admin token"
+        )
+
+
+@router.get("/slow-queries", dependencies=[Depends(require_admin)])
+def list_slow_queries(limit: int = Query(default=50, ge=1, le=1000)):
+    """Slowest recent queries of this worker, with sampled EXPLAIN plans"""
+    return {
+        "threshold_ms": slow_query_log.threshold * 1000,
+        "summary": slow_query_log.summary(),
+        "entries": slow_query_log.entries(limit),
+    }
+
+
+@router.delete("/slow-queries", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(require_admin)])
+def clear_slow_queries():
+    """Empty the slow query buffer"""
+    slow_query_log.clear()
+    return None
+
+
+@router.post("/users/bulk", dependencies=[Depends(require_admin)])
+async def bulk_create_users(
+    request: Request,
+    format: str | None = Query(default=None, pattern="^(csv|ndjson)$"),
+    concurrency: int = Query(default=settings.PROVISIONING_CONCURRENCY, ge=1, le=64),
+):
+    """
+    Create users in bulk from a CSV or NDJSON body
+    Format déduit du Content-Type (text/csv, application/x-ndjson) si `format` est absent
+    Renvoie un résultat par ligne (created, exists, invalid, error)
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "ndjson" if "ndjson" in content_type or "jsonl" in content_type else "csv"
+    try:
+        rows = parse_users((await request.body()).decode("utf-8-sig"), format)
+    except (ProvisioningError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if len(rows) > settings.PROVISIONING_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.PROVISIONING_MAX_ROWS} users per request (use scripts/provision_users.py)"
+        )
+    try:
+        report = await run_in_threadpool(
+            provision_users, rows, SessionLocal,
+            concurrency=concurrency, retries=settings.PROVISIONING_RETRIES,
+        )
+    except ProvisioningError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    return report.to_dict()
+
+
+@router.get("/audit", dependencies=[Depends(require_admin)])
+def query_audit_log(
+    user_id: UUID,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    cursor: str | None = None,
+    stream: bool = False,
+    db: Session = Depends(get_db),
+):
+    """
+    Audit events of a user, newest first
+    Paginé (next_cursor) ou, avec stream=true, tout l'intervalle en NDJSON : les pages sont
+    lues une à une au fil de l'envoi, la mémoire reste bornée quel que soit le volume
+    """
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if not stream:
+        events, next_cursor = fetch_events(db, user_id, since, until, limit, cursor)
+        return {"events": events, "next_cursor": next_cursor}
+
+    def lines():
+        page_cursor = cursor
+        try:
+            while True:
+                events, page_cursor = fetch_events(db, user_id, since, until, limit, page_cursor)
+                db.rollback()  # Pas de transaction ouverte entre deux pages
+                for event in events:
+                    yield json.dumps(jsonable_encoder(event)) + "\n"
+                if page_cursor is None:
+                    break
+        finally:
+            # get_db peut refermer la session avant la fin de l'envoi : elle est rendue ici aussi
+            db.close()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
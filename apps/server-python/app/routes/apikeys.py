@@ -1,18 +1,82 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, type_coerce, update
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Session
+from app.core.audit import (
+    KEY_CREATED, KEY_IMPORTED, KEY_REVEALED, KEY_REVOKED, KEY_UPDATED, AuditBufferFull, AuditEvent, audit_log,
+)
+from app.core.config import settings
 from app.core.database import get_db
+from app.core.plans import key_limiter_for, limits_for
+from app.core.rate_limit import client_ip
 from app.core.security import crypto_manager
+from app.core.usage import usage_tracker
 from app.models.user import UserProfile
-from app.models.apikey import ApiKey
-from app.schemas.apikey import ApiKeyCreate, ApiKeyResponse, ApiKeyDetailResponse, ApiKeysList
+from app.models.apikey import ApiKey, ProviderType
+from app.schemas.apikey import (
+    ApiKeyCreate, ApiKeyResponse, ApiKeyDetailResponse, ApiKeysList, ApiKeyUsage,
+    parse_provider_config, provider_config_json,
+)
+from app.services import key_import
 from app.routes.auth import get_current_user
+from datetime import datetime
+from typing import Optional
+import csv
 import secrets
 import hashlib
-import json
+import uuid
 
 router = APIRouter(prefix="/keys", tags=["apikeys"])
 
 
+def rate_limited_user(
+    response: Response,
+    current_user: UserProfile = Depends(get_current_user)
+) -> UserProfile:
+    """Current user, counted against their plan's request rate (RateLimit-* headers)"""
+    result = key_limiter_for(current_user.plan).hit(str(current_user.id))
+    if not result.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded for your plan, try again later",
+            headers=result.headers()
+        )
+    response.headers.update(result.headers())
+    return current_user
+
+
+def reserve_key_slot(db: Session, user: UserProfile) -> None:
+    """Increment active_key_count unless the plan's maximum is reached
+
+    UPDATE conditionnel : deux créations simultanées ne peuvent pas dépasser le quota.
+    Le verrou de ligne est tenu jusqu'au commit de la création.
+    """
+    max_keys = limits_for(user.plan).max_api_keys
+    reserved = db.execute(
+        update(UserProfile)
+        .where(UserProfile.id == user.id, UserProfile.active_key_count < max_keys)
+        .values(active_key_count=UserProfile.active_key_count + 1)
+        .returning(UserProfile.active_key_count)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if reserved is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"API key limit reached for your plan ({max_keys} active keys)"
+        )
+
+
+def release_key_slot(db: Session, user_id) -> None:
+    """Decrement active_key_count after a key has been revoked"""
+    db.execute(
+        update(UserProfile)
+        .where(UserProfile.id == user_id, UserProfile.active_key_count > 0)
+        .values(active_key_count=UserProfile.active_key_count - 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
 def generate_api_key() -> str:
     """Generate a random API key"""
     return f"vk_{secrets.token_urlsafe(32)}"
@@ -46,11 +110,49 @@ def get_api_key_parts(api_key: str) -> tuple[str, str]:
     return prefix, last4
 
 
+def provider_config_contains(config: dict):
+    """`provider_config @> config` (JSONB containment, served by the GIN index)"""
+    return ApiKey.provider_config.op("@>")(type_coerce(config, JSONB))
+
+
+def check_expiry(expires_at: Optional[datetime], now: Optional[datetime] = None) -> None:
+    """Reject an expiry date that is already past"""
+    if expires_at is not None and expires_at <= (now or datetime.utcnow()):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="expires_at must be in the future"
+        )
+
+
+def require_audit_room() -> None:
+    """Refuse an audited operation before it takes effect when the audit queue is full (503)"""
+    try:
+        audit_log.ensure_room()
+    except AuditBufferFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Audit log is saturated, try again later",
+            headers={"Retry-After": "1"}
+        )
+
+
+def audit(action: str, user: UserProfile, api_key_id, request: Optional[Request], **details) -> None:
+    """Queue the audit event of an operation once it has been committed"""
+    audit_log.append(AuditEvent(
+        action=action,
+        user_id=user.id,
+        api_key_id=api_key_id,
+        ip=client_ip(request) if request is not None else None,
+        details=details or None,
+    ))
+
+
 @router.post("", response_model=ApiKeyDetailResponse, status_code=status.HTTP_201_CREATED)
 def create_api_key(
     api_key_data: ApiKeyCreate,
-    current_user: UserProfile = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserProfile = Depends(rate_limited_user),
+    db: Session = Depends(get_db),
+    request: Request = None
 ):
     """Create a new API key"""
     # Determine if we should use user's key or generate a new one
@@ -71,25 +173,20 @@ def create_api_key(
     # Create hash for lookup
     api_key_hash = hashlib.sha256(api_key_plain.encode()).hexdigest()
 
-    # Handle provider config
+    # Provider config (already validated by ApiKeyCreate), only kept for SUPABASE
     provider_config = None
     if api_key_data.provider == "SUPABASE" and api_key_data.provider_config:
-        # If it's a dict, convert to JSON string
-        if isinstance(api_key_data.provider_config, dict):
-            provider_config = json.dumps(api_key_data.provider_config)
-        # If it's already a string, validate JSON
-        elif isinstance(api_key_data.provider_config, str):
-            try:
-                json.loads(api_key_data.provider_config)
-                provider_config = api_key_data.provider_config
-            except json.JSONDecodeError:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Invalid provider_config JSON"
-                )
+        provider_config = api_key_data.provider_config
+
+    check_expiry(api_key_data.expires_at)
+    require_audit_room()
+
+    # Quota du plan, vérifié au plus près de l'insertion (verrou court)
+    reserve_key_slot(db, current_user)
 
     # Create API key record
     new_api_key = ApiKey(
+        id=uuid.uuid4(),
         user_id=current_user.id,
         name=api_key_data.name,
         provider=api_key_data.provider,
@@ -98,11 +195,13 @@ def create_api_key(
         last4=last4,
         enc_ciphertext=enc_ciphertext,
         enc_nonce=enc_nonce,
-        hash=api_key_hash
+        hash=api_key_hash,
+        expires_at=api_key_data.expires_at
     )
 
     db.add(new_api_key)
     db.commit()
+    audit(KEY_CREATED, current_user, new_api_key.id, request, provider=api_key_data.provider.value)
     db.refresh(new_api_key)
 
     # Return with plain API key (only shown once)
@@ -110,26 +209,78 @@ def create_api_key(
         "id": str(new_api_key.id),
         "name": new_api_key.name,
         "provider": new_api_key.provider,
-        "provider_config": new_api_key.provider_config,
+        "provider_config": provider_config_json(new_api_key.provider_config),
         "prefix": new_api_key.prefix,
         "last4": new_api_key.last4,
         "revoked": new_api_key.revoked,
+        "expires_at": new_api_key.expires_at.isoformat() if new_api_key.expires_at else None,
         "created_at": new_api_key.created_at.isoformat(),
         "updated_at": new_api_key.updated_at.isoformat(),
         "api_key": api_key_plain
     }
 
 
+@router.post("/import")
+async def import_api_keys(
+    request: Request,
+    current_user: UserProfile = Depends(rate_limited_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Import existing API keys from a CSV body (name, value[, provider, expires_at])
+    Le corps est lu au fil de l'envoi ; une seule transaction, refusée en entier si le
+    quota du plan serait dépassé. Renvoie un résultat par ligne (imported, duplicate, invalid)
+    """
+    try:
+        lines = await key_import.read_upload_lines(request.stream(), settings.KEY_IMPORT_MAX_ROWS + 1)
+        rows = list(key_import.read_rows(lines))
+    except key_import.UploadTooLarge:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.KEY_IMPORT_MAX_ROWS} keys per request (use scripts/import_keys.py)"
+        )
+    except (key_import.KeyImportError, UnicodeDecodeError, csv.Error) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    require_audit_room()
+
+    try:
+        report = await run_in_threadpool(
+            key_import.import_keys, db, current_user.id, rows,
+            executor=key_import.thread_executor(),
+            max_active_keys=limits_for(current_user.plan).max_api_keys,
+        )
+    except key_import.KeyQuotaExceeded as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+    audit(KEY_IMPORTED, current_user, None, request, rows=len(rows), imported=report.counts()[key_import.IMPORTED])
+    return report.to_dict()
+
+
 @router.get("", response_model=ApiKeysList)
 def list_api_keys(
-    current_user: UserProfile = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserProfile = Depends(rate_limited_user),
+    db: Session = Depends(get_db),
+    provider: Optional[ProviderType] = None,
+    provider_config: Optional[str] = None
 ):
-    """List all API keys for current user"""
-    api_keys = db.query(ApiKey).filter(
+    """
+    List all API keys for current user
+    `provider_config` : objet JSON que la configuration doit contenir, évalué par la base
+    (`@>`, index idx_api_keys_provider_config), ex. {"url": "https://xyz.supabase.co"}
+    """
+    query = db.query(ApiKey).filter(
         ApiKey.user_id == current_user.id,
         ApiKey.revoked == False
-    ).all()
+    )
+    if provider is not None:
+        query = query.filter(ApiKey.provider == provider)
+    if provider_config:
+        try:
+            config = parse_provider_config(provider_config)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        query = query.filter(provider_config_contains(config))
+    api_keys = query.all()
 
     return {"apiKeys": api_keys}
 
@@ -138,8 +289,9 @@ def list_api_keys(
 def update_api_key(
     api_key_id: str,
     api_key_data: ApiKeyCreate,
-    current_user: UserProfile = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserProfile = Depends(rate_limited_user),
+    db: Session = Depends(get_db),
+    request: Request = None
 ):
     """Update an API key (name, provider, or provider config)"""
     api_key = db.query(ApiKey).filter(
@@ -179,20 +331,15 @@ def update_api_key(
         api_key.prefix = prefix
         api_key.last4 = last4
 
-    # Handle provider config update (only for SUPABASE)
+    # Handle provider config update (only for SUPABASE, already validated by ApiKeyCreate)
     provider_config = api_key.provider_config  # Keep existing by default
     if api_key_data.provider == "SUPABASE" and api_key_data.provider_config:
-        if isinstance(api_key_data.provider_config, dict):
-            provider_config = json.dumps(api_key_data.provider_config)
-        elif isinstance(api_key_data.provider_config, str):
-            try:
-                json.loads(api_key_data.provider_config)
-                provider_config = api_key_data.provider_config
-            except json.JSONDecodeError:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Invalid provider_config JSON"
-                )
+        provider_config = api_key_data.provider_config
+
+    # Expiration : modifiée seulement si le champ est envoyé (null = supprime l'échéance)
+    if "expires_at" in api_key_data.model_fields_set:
+        check_expiry(api_key_data.expires_at)
+        api_key.expires_at = api_key_data.expires_at
 
     # Only update provider_config if it's being explicitly set for SUPABASE
     if api_key_data.provider == "SUPABASE":
@@ -201,17 +348,23 @@ def update_api_key(
         # Clear provider_config for CUSTOM and IA
         api_key.provider_config = None
 
+    # Champs modifiés seulement : jamais de valeur de clé dans le journal
+    changed = sorted(name for name in api_key_data.model_fields_set if name != "value")
+    require_audit_room()
+
     db.commit()
+    audit(KEY_UPDATED, current_user, api_key.id, request, fields=changed, value_changed=bool(api_key_data.value))
     db.refresh(api_key)
 
     return {
         "id": str(api_key.id),
         "name": api_key.name,
         "provider": api_key.provider,
-        "provider_config": api_key.provider_config,
+        "provider_config": provider_config_json(api_key.provider_config),
         "prefix": api_key.prefix,
         "last4": api_key.last4,
         "revoked": api_key.revoked,
+        "expires_at": api_key.expires_at.isoformat() if api_key.expires_at else None,
         "created_at": api_key.created_at.isoformat(),
         "updated_at": api_key.updated_at.isoformat()
     }
@@ -220,8 +373,9 @@ def update_api_key(
 @router.get("/{api_key_id}/decrypt")
 def reveal_api_key(
     api_key_id: str,
-    current_user: UserProfile = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserProfile = Depends(rate_limited_user),
+    db: Session = Depends(get_db),
+    request: Request = None
 ):
     """Reveal the decrypted API key (one-time operation)"""
     api_key = db.query(ApiKey).filter(
@@ -235,19 +389,61 @@ def reveal_api_key(
             detail="API key not found"
         )
 
+    # Échéance vérifiée sur la ligne déjà chargée : la clé est refusée dès son expiration,
+    # sans attendre le passage du balayeur
+    if api_key.is_expired():
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="API key expired"
+        )
+
+    require_audit_room()
+
     # Decrypt the API key
     decrypted_key = crypto_manager.decrypt(api_key.enc_ciphertext, api_key.enc_nonce)
+    audit(KEY_REVEALED, current_user, api_key.id, request)
+    # Compté en mémoire, écrit par lots par la tâche de fond (pas d'UPDATE par requête)
+    usage_tracker.record(api_key.id)
 
     return {
         "api_key": decrypted_key
     }
 
 
+@router.get("/{api_key_id}/usage", response_model=ApiKeyUsage)
+def get_api_key_usage(
+    api_key_id: str,
+    current_user: UserProfile = Depends(rate_limited_user),
+    db: Session = Depends(get_db)
+):
+    """Usage count and last use of an API key (including uses not yet written by this worker)"""
+    row = db.execute(
+        select(ApiKey.id, ApiKey.usage_count, ApiKey.last_used_at)
+        .where(ApiKey.id == api_key_id, ApiKey.user_id == current_user.id)
+    ).first()
+
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="API key not found"
+        )
+
+    pending_uses, pending_last_used = usage_tracker.pending(row.id)
+    last_used_at = max(filter(None, (row.last_used_at, pending_last_used)), default=None)
+
+    return {
+        "id": row.id,
+        "usage_count": row.usage_count + pending_uses,
+        "last_used_at": last_used_at
+    }
+
+
 @router.delete("/{api_key_id}", status_code=status.HTTP_204_NO_CONTENT)
 def revoke_api_key(
     api_key_id: str,
-    current_user: UserProfile = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserProfile = Depends(rate_limited_user),
+    db: Session = Depends(get_db),
+    request: Request = None
 ):
     """Revoke an API key"""
     api_key = db.query(ApiKey).filter(
@@ -261,7 +457,19 @@ def revoke_api_key(
             detail="API key not found"
         )
 
-    api_key.revoked = True
-    db.commit()
+    require_audit_room()
+
+    # UPDATE conditionnel : une double révocation ne décrémente le compteur qu'une fois
+    revoked = db.execute(
+        update(ApiKey)
+        .where(ApiKey.id == api_key_id, ApiKey.user_id == current_user.id, ApiKey.revoked == False)
+        .values(revoked=True, updated_at=datetime.utcnow())
+        .returning(ApiKey.id)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if revoked is not None:
+        release_key_slot(db, current_user.id)
+        db.commit()
+        audit(KEY_REVOKED, current_user, revoked.id, request)
 
     return None
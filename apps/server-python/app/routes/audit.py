@@ -0,0 +1,33 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from app.core.audit import InvalidCursor, fetch_events
+from app.core.database import get_db
+from app.models.user import UserProfile
+from app.routes.auth import get_current_user
+
+router = APIRouter(prefix="/audit", tags=["audit"])
+
+
+@router.get("")
+def list_audit_events(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(default=100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    current_user: UserProfile = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Audit trail of the current user's API keys, newest first (pass next_cursor to get the next page)"""
+    try:
+        events, next_cursor = fetch_events(db, current_user.id, since, until, limit, cursor)
+    except InvalidCursor as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    return {"events": events, "next_cursor": next_cursor}
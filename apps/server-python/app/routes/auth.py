@@ -1,14 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from app.core.database import get_db
-from app.core.security import create_access_token, decode_access_token, get_password_hash, verify_password
+from app.core.security import (
+    ACCESS_TOKEN_TYPE, create_access_token, decode_access_token, get_password_hash, verify_password,
+)
 from app.models.user import UserProfile
 from app.schemas.user import UserCreate, UserLogin, UserResponse, Token, TokenWithUser
 from app.core.config import settings
+from app.core.logging_config import mask_email
+from app.core.revocation import revocation_list
+from app.core.rate_limit import client_ip, email_key, login_email_limiter, login_ip_limiter
+import logging
 import uuid
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/auth", tags=["auth"])
 security = HTTPBearer(auto_error=False)
 
@@ -27,19 +35,31 @@ def get_current_user(
     token = credentials.credentials
     payload = decode_access_token(token)
 
-    if payload is None:
+    # Un jeton de réinitialisation (sub = email) n'est pas un jeton d'accès
+    if payload is None or payload.get("type") != ACCESS_TOKEN_TYPE:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials"
         )
 
-    user_id: str = payload.get("sub")
-    if user_id is None:
+    try:
+        user_id = uuid.UUID(str(payload.get("sub")))
+    except ValueError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials"
         )
 
+    # Jeton révoqué par un logout (lecture en mémoire, pas de requête SQL)
+    jti = payload.get("jti")
+    if jti is not None:
+        revocation_list.ensure_fresh(db)
+        if revocation_list.is_revoked(jti):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token has been revoked"
+            )
+
     # Récupérer le profil utilisateur depuis user_profiles
     user_profile = db.query(UserProfile).filter(UserProfile.id == user_id).first()
     if user_profile is None:
@@ -133,14 +153,28 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         )
 
 
+def check_login_rate_limit(request: Request, email: str) -> None:
+    """Reject brute-force attempts before any database lookup or Argon2 verification"""
+    for limiter, identifier in ((login_ip_limiter, client_ip(request)), (login_email_limiter, email_key(email))):
+        result = limiter.hit(identifier)
+        if not result.allowed:
+            logger.info("Login throttled", extra={"limiter": limiter.name, "email": mask_email(email)})
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many login attempts, try again later",
+                headers=result.headers()
+            )
+
+
 @router.post("/login", response_model=TokenWithUser)
-async def login(user_data: UserLogin, db: Session = Depends(get_db)):
+async def login(user_data: UserLogin, request: Request, db: Session = Depends(get_db)):
     """
     Login user
     Vérifie les identifiants directement dans auth.users
     """
+    check_login_rate_limit(request, user_data.email)
     try:
-        print(f"🔐 Login attempt for: {user_data.email}")
+        logger.info("Login attempt", extra={"email": mask_email(user_data.email), "sample": True})
 
         # Chercher l'utilisateur dans auth.users
         result = db.execute(
@@ -151,21 +185,21 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
 
         # Vérifier si l'utilisateur existe
         if not user:
-            print(f"❌ User not found: {user_data.email}")
+            logger.info("Login failed: unknown email", extra={"email": mask_email(user_data.email)})
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password"
             )
 
         user_id, email, encrypted_password = user
-        print(f"✅ User found: {email}, ID: {user_id}")
+        logger.debug("Login user found", extra={"user_id": str(user_id)})
 
         # Vérifier le mot de passe
         try:
             is_valid = verify_password(user_data.password, encrypted_password)
-            print(f"🔑 Password verification: {is_valid}")
 
             if not is_valid:
+                logger.info("Login failed: wrong password", extra={"user_id": str(user_id)})
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="Incorrect email or password"
@@ -173,7 +207,7 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
         except HTTPException:
             raise
         except Exception as e:
-            print(f"❌ Password verification error: {str(e)}")
+            logger.warning("Password verification error", extra={"user_id": str(user_id)}, exc_info=True)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password"
@@ -182,7 +216,7 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
         # Vérifier que le profil existe dans user_profiles
         user_profile = db.query(UserProfile).filter(UserProfile.id == user_id).first()
         if not user_profile:
-            print(f"⚠️ Profile not found, creating new profile for user {user_id}")
+            logger.warning("Profile not found, creating new profile", extra={"user_id": str(user_id)})
             # Créer le profil s'il n'existe pas
             user_profile = UserProfile(id=user_id, plan="FREE")
             db.add(user_profile)
@@ -191,7 +225,7 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
 
         # Générer notre propre JWT token
         access_token = create_access_token(data={"sub": str(user_id)})
-        print(f"🎉 Login successful for: {email}")
+        logger.info("Login successful", extra={"user_id": str(user_id), "sample": True})
 
         # Créer la réponse avec l'email
         from app.schemas.user import UserResponse
@@ -214,9 +248,7 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"💥 Unexpected error during login: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Unexpected error during login")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An error occurred during login"
@@ -224,12 +256,24 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
 
 
 @router.post("/logout")
-async def logout():
+def logout(
+    credentials: HTTPAuthorizationCredentials | None = Depends(security),
+    db: Session = Depends(get_db)
+):
     """
     Logout user
-    Avec des JWT stateless, on retourne simplement un succès
-    Le frontend va nettoyer le localStorage
+    Révoque le jeton (claim jti) jusqu'à son expiration
+    Le frontend va nettoyer le localStorage ; un jeton absent ou invalide renvoie aussi un succès
     """
+    payload = decode_access_token(credentials.credentials) if credentials else None
+    if payload and payload.get("jti") and payload.get("exp"):
+        try:
+            revocation_list.revoke(db, payload["jti"], payload.get("sub"), payload["exp"])
+            logger.info("Token revoked", extra={"user_id": payload.get("sub")})
+        except Exception:
+            # Le frontend supprime le jeton quoi qu'il arrive ; on ne bloque pas la déconnexion
+            db.rollback()
+            logger.exception("Token revocation failed", extra={"user_id": payload.get("sub")})
     return {"message": "Successfully logged out"}
 
 
@@ -1,18 +1,55 @@
-from pydantic import BaseModel
-from datetime import datetime
+from pydantic import BaseModel, field_validator
+from datetime import datetime, timezone
 from uuid import UUID
 from typing import Optional, Any
+import json
 from app.models.apikey import ProviderType
 
 
+def parse_provider_config(value: Any) -> Optional[dict]:
+    """Accept a JSON object or its string form; raise ValueError otherwise"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            raise ValueError("Invalid provider_config JSON")
+    if not isinstance(value, dict):
+        raise ValueError("provider_config must be a JSON object")
+    return value
+
+
+def provider_config_json(value: Any) -> Optional[str]:
+    """Stored config (JSONB) as the JSON string returned by the API"""
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value)
+
+
 class ApiKeyBase(BaseModel):
     name: str
 
 
 class ApiKeyCreate(ApiKeyBase):
     provider: ProviderType = ProviderType.CUSTOM
-    provider_config: Optional[Any] = None  # Accept any type, will be processed in route
+    provider_config: Optional[dict[str, Any]] = None  # Objet JSON, ou sa forme texte
     value: Optional[str] = None  # For custom API keys
+    expires_at: Optional[datetime] = None  # None = never expires
+
+    @field_validator("expires_at")
+    @classmethod
+    def to_naive_utc(cls, value: Optional[datetime]) -> Optional[datetime]:
+        # Les dates sont stockées en UTC sans fuseau (comme created_at)
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+    @field_validator("provider_config", mode="before")
+    @classmethod
+    def to_object(cls, value: Any) -> Optional[dict]:
+        # Validé une fois ici : les routes stockent l'objet tel quel (JSONB)
+        return parse_provider_config(value)
 
 
 class ApiKeyResponse(BaseModel):
@@ -23,9 +60,18 @@ class ApiKeyResponse(BaseModel):
     prefix: str
     last4: str
     revoked: bool
+    expires_at: Optional[datetime] = None
+    last_used_at: Optional[datetime] = None
+    usage_count: int = 0
     created_at: datetime
     updated_at: datetime
 
+    @field_validator("provider_config", mode="before")
+    @classmethod
+    def to_json_string(cls, value: Any) -> Optional[str]:
+        # Le client attend toujours une chaîne JSON
+        return provider_config_json(value)
+
     class Config:
         from_attributes = True
 
@@ -34,6 +80,12 @@ class ApiKeyDetailResponse(ApiKeyResponse):
     api_key: str  # Only shown on creation
 
 
+class ApiKeyUsage(BaseModel):
+    id: UUID
+    usage_count: int
+    last_used_at: Optional[datetime] = None
+
+
 class ApiKeyReveal(BaseModel):
     api_key: str
 
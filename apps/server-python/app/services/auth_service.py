@@ -14,9 +14,15 @@ from app.core.security import (
     verify_password_reset_token
 )
 from app.core.config import settings
+from app.core.circuit_breaker import CircuitOpenError
+from app.core.outbox import enqueue
 from app.models.user import User
+from app.core.logging_config import mask_email
+import logging
 import uuid
 
+logger = logging.getLogger(__name__)
+
 
 class AuthService:
     """Service pour la logique d'authentification"""
@@ -68,22 +74,19 @@ class AuthService:
 
         # Fallback: comportement local existant (DB + hash)
         if self.user_repo.email_exists(db, email):
-            print(f"[DEBUG] email {email} already exists in DB; attempting to delete")
+            logger.debug("Email already exists in DB; attempting to delete", extra={"email": mask_email(email)})
             # Si l'email existe déjà, supprimer et continuer (utile pour tests locaux)
             user = self.user_repo.get_by_email(db, email)
             if user:
                 try:
+                    # Suppression côté Supabase via l'outbox, validée avec la suppression locale
+                    if settings.SUPABASE_URL and settings.SUPABASE_SERVICE_ROLE_KEY:
+                        enqueue(db, "supabase.admin_delete_user", {"user_id": str(user.id)},
+                                dedup_key=f"admin_delete_user:{user.id}")
                     self.user_repo.delete(db, user.id)
-                    print(f"[DEBUG] deleted local user {user.id}")
-                except Exception as e:
-                    print(f"[DEBUG] failed to delete local user: {e}")
-                # si Supabase est configuré, demander suppression côté Supabase aussi
-                try:
-                    from app.core.supabase import admin_delete_user
-                    ok = admin_delete_user(user.id)
-                    print(f"[DEBUG] admin_delete_user returned {ok}")
-                except Exception as e:
-                    print(f"[DEBUG] admin_delete_user failed: {e}")
+                    logger.debug("Deleted local user", extra={"user_id": str(user.id)})
+                except Exception:
+                    logger.warning("Failed to delete local user", extra={"user_id": str(user.id)}, exc_info=True)
             # continuer la création après suppression
 
         # Créer le nouvel utilisateur localement
@@ -143,8 +146,11 @@ class AuthService:
                     # On émet un JWT local compatible avec le reste de l'API
                     access_token = create_access_token(data={"sub": str(user.id)})
                     return access_token, user
+            except CircuitOpenError:
+                # Supabase en panne ou lent : repli local immédiat, sans attendre le timeout
+                logger.debug("Supabase circuit open; using local sign-in", extra={"email": mask_email(email)})
             except Exception:
-                pass
+                logger.debug("Supabase sign-in failed; using local sign-in", extra={"email": mask_email(email)}, exc_info=True)
 
         # Fallback: validation locale par mot de passe
         user = self.user_repo.get_by_email(db, email)
@@ -164,29 +170,32 @@ class AuthService:
         """
         user = self.user_repo.get_by_email(db, email)
 
+        # Si Supabase est configuré, l'email de récupération est envoyé par le worker de
+        # l'outbox : la requête n'attend pas Supabase. Dans les deux cas (utilisateur connu
+        # ou non) pour ne pas révéler quels emails sont inscrits.
+        self._queue_recovery_email(db, email)
+
         # Même si l'utilisateur n'existe pas, on retourne success
         # pour ne pas révéler quels emails sont inscrits
         if not user:
-            # On pourrait logger ceci pour monitoring
             # Nous retournons None pour signaler que rien n'a été généré localement
-            # mais appelons Supabase pour qu'il envoie un email si configuré
-            try:
-                from app.core.supabase import send_recovery_email
-                send_recovery_email(email)
-            except Exception:
-                pass
             return None
 
-        # Si Supabase est configuré, demander l'envoi d'e-mail via Supabase (mais on génère quand même un token local pour les tests)
-        try:
-            from app.core.supabase import send_recovery_email
-            send_recovery_email(email)
-        except Exception:
-            pass
-
         # Générer et retourner un token local (utile pour tests)
         return create_password_reset_token(email)
 
+    def _queue_recovery_email(self, db: Session, email: str) -> None:
+        """Queue the Supabase recovery email (one pending message per address)"""
+        if not settings.SUPABASE_URL or not settings.SUPABASE_SERVICE_ROLE_KEY:
+            return
+        try:
+            enqueue(db, "supabase.send_recovery_email", {"email": email},
+                    dedup_key=f"recovery_email:{email.strip().lower()}")
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.warning("Failed to queue recovery email", extra={"email": mask_email(email)}, exc_info=True)
+
     def reset_password(
         self,
         db: Session,
@@ -0,0 +1,325 @@
+"""
+Import en masse de clés API existantes (CSV) - migration d'une équipe vers le vault
+
+CSV avec en-tête : name, value (obligatoires), et optionnellement provider
+(CUSTOM ou IA, CUSTOM par défaut) et expires_at (ISO 8601).
+
+1. les lignes sont lues au fil de l'envoi et validées ;
+2. prefix / last4 / hash sont calculés comme pour POST /api/keys, et les valeurs
+   chiffrées avec CryptoManager par lots, en parallèle (threads pour l'API,
+   processus pour scripts/import_keys.py) ;
+3. les lignes sont chargées par COPY dans une table temporaire, puis fusionnées dans
+   api_keys en une seule requête (`INSERT ... SELECT ... ON CONFLICT (hash) DO NOTHING`),
+   qui met aussi à jour active_key_count ;
+4. un résultat est renvoyé par ligne : imported, duplicate (même hash plus haut dans le
+   fichier ou déjà dans le vault) ou invalid. Un doublon du vault n'en dit pas plus :
+   la clé peut appartenir à un autre compte, dont l'existence ne doit pas transparaître.
+
+Tout l'import est une seule transaction : si le quota de clés actives du plan est
+dépassé, rien n'est importé.
+"""
+
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import AsyncIterator, Iterable, Iterator, Optional
+import codecs
+import csv
+import hashlib
+import logging
+import time
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.apikey import ProviderType
+
+logger = logging.getLogger(__name__)
+
+IMPORTED = "imported"
+DUPLICATE = "duplicate"
+INVALID = "invalid"
+
+# SUPABASE génère ses propres clés et exige un provider_config : pas d'import
+IMPORTABLE_PROVIDERS = {ProviderType.CUSTOM.value, ProviderType.IA.value}
+
+STAGING_COLUMNS = ("line", "id", "name", "provider", "prefix", "last4", "enc_ciphertext", "enc_nonce", "hash", "expires_at")
+
+CREATE_STAGING = text("""
+    CREATE TEMP TABLE key_import_staging (
+        line INTEGER NOT NULL,
+        id UUID NOT NULL,
+        name VARCHAR NOT NULL,
+        provider providertype NOT NULL,
+        prefix VARCHAR NOT NULL,
+        last4 VARCHAR NOT NULL,
+        enc_ciphertext BYTEA NOT NULL,
+        enc_nonce BYTEA NOT NULL,
+        hash VARCHAR NOT NULL,
+        expires_at TIMESTAMP WITHOUT TIME ZONE
+    ) ON COMMIT DROP
+""")
+
+# Une seule requête : dédoublonnage dans le fichier, insertion, compteur du profil, rapport
+MERGE = text("""
+    WITH ranked AS (
+        SELECT s.*, ROW_NUMBER() OVER (PARTITION BY hash ORDER BY line) AS position
+        FROM key_import_staging s
+    ),
+    inserted AS (
+        INSERT INTO public.api_keys (
+            id, user_id, name, provider, prefix, last4, enc_ciphertext, enc_nonce, hash,
+            revoked, expires_at, created_at, updated_at
+        )
+        SELECT id, CAST(:user_id AS uuid), name, provider, prefix, last4, enc_ciphertext, enc_nonce, hash,
+               false, expires_at, :now, :now
+        FROM ranked
+        WHERE position = 1
+        ON CONFLICT (hash) DO NOTHING
+        RETURNING id
+    ),
+    counted AS (
+        UPDATE public.user_profiles
+        SET active_key_count = active_key_count + (SELECT COUNT(*) FROM inserted)
+        WHERE id = CAST(:user_id AS uuid)
+        RETURNING active_key_count
+    )
+    SELECT r.line, r.id, r.position, i.id IS NOT NULL AS inserted,
+           (SELECT active_key_count FROM counted) AS active_key_count
+    FROM ranked r
+    LEFT JOIN inserted i ON i.id = r.id
+    ORDER BY r.line
+""")
+
+
+class KeyImportError(ValueError):
+    """Raised when the input cannot be parsed at all"""
+
+
+class KeyQuotaExceeded(Exception):
+    """Raised when the import would exceed the plan's active key cap (nothing is imported)"""
+
+
+@dataclass
+class ImportRow:
+    line: int
+    name: str
+    value: str
+    provider: str = ProviderType.CUSTOM.value
+    expires_at: Optional[datetime] = None
+
+
+@dataclass
+class PreparedRow:
+    line: int
+    id: uuid.UUID
+    name: str
+    provider: str
+    prefix: str
+    last4: str
+    hash: str
+    value: str
+    expires_at: Optional[datetime]
+
+
+@dataclass
+class ImportResult:
+    line: int
+    name: str
+    status: str
+    id: Optional[str] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class ImportReport:
+    results: list[ImportResult] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+
+    def counts(self) -> dict[str, int]:
+        counts = {IMPORTED: 0, DUPLICATE: 0, INVALID: 0}
+        for result in self.results:
+            counts[result.status] += 1
+        return counts
+
+    def to_dict(self) -> dict:
+        return {
+            "total": len(self.results),
+            **self.counts(),
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "results": [asdict(result) for result in sorted(self.results, key=lambda r: r.line)],
+        }
+
+
+class UploadTooLarge(Exception):
+    """Raised while reading an upload that has more lines than allowed"""
+
+
+async def read_upload_lines(chunks: AsyncIterator[bytes], max_lines: int) -> list[str]:
+    """Decode an uploaded body chunk by chunk into lines, stopping past max_lines"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    lines: list[str] = []
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        parts = pending.splitlines(keepends=True)
+        # La dernière ligne peut être incomplète : gardée pour le morceau suivant
+        pending = parts.pop() if parts and not parts[-1].endswith(("\n", "\r")) else ""
+        lines.extend(parts)
+        if len(lines) > max_lines:
+            raise UploadTooLarge(f"At most {max_lines} lines per upload")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        lines.append(pending)
+    if len(lines) > max_lines:
+        raise UploadTooLarge(f"At most {max_lines} lines per upload")
+    return lines
+
+
+def read_rows(lines: Iterable[str]) -> Iterator[ImportRow]:
+    """Parse CSV lines lazily (the upload does not need to be in memory)"""
+    reader = csv.DictReader(lines)
+    fields = {name.strip().lower() for name in reader.fieldnames or []}
+    missing = {"name", "value"} - fields
+    if missing:
+        raise KeyImportError(f"CSV header must contain {', '.join(sorted(missing))}")
+    for record in reader:
+        record = {(k or "").strip().lower(): (v or "").strip() for k, v in record.items()}
+        expires_at = None
+        if record.get("expires_at"):
+            try:
+                expires_at = datetime.fromisoformat(record["expires_at"].replace("Z", "+00:00"))
+            except ValueError:
+                expires_at = record["expires_at"]  # Signalé par prepare()
+        yield ImportRow(
+            line=reader.line_num,
+            name=record.get("name", ""),
+            value=record.get("value", ""),
+            provider=(record.get("provider") or ProviderType.CUSTOM.value).upper(),
+            expires_at=expires_at,
+        )
+
+
+def prepare(rows: Iterable[ImportRow], now: Optional[datetime] = None) -> tuple[list[PreparedRow], list[ImportResult]]:
+    """Validate rows and compute prefix / last4 / hash; return (valid rows, invalid results)"""
+    from app.routes.apikeys import get_api_key_parts
+
+    now = now or datetime.utcnow()
+    prepared, invalid = [], []
+    for row in rows:
+        expires_at = row.expires_at
+        if isinstance(expires_at, datetime) and expires_at.tzinfo is not None:
+            expires_at = expires_at.astimezone(timezone.utc).replace(tzinfo=None)
+
+        error = None
+        if not row.name:
+            error = "Missing name"
+        elif not row.value:
+            error = "Missing value"
+        elif row.provider not in IMPORTABLE_PROVIDERS:
+            error = f"Invalid provider {row.provider!r} (expected CUSTOM or IA)"
+        elif expires_at is not None and not isinstance(expires_at, datetime):
+            error = f"Invalid expires_at {expires_at!r}"
+        elif expires_at is not None and expires_at <= now:
+            error = "expires_at must be in the future"
+        if error:
+            invalid.append(ImportResult(row.line, row.name, INVALID, error=error))
+            continue
+
+        prefix, last4 = get_api_key_parts(row.value)
+        prepared.append(PreparedRow(
+            line=row.line, id=uuid.uuid4(), name=row.name, provider=row.provider,
+            prefix=prefix, last4=last4, hash=hashlib.sha256(row.value.encode()).hexdigest(),
+            value=row.value, expires_at=expires_at,
+        ))
+    return prepared, invalid
+
+
+_crypto = None
+
+
+def _encrypt_batch(plaintexts: list[str]) -> list[tuple[bytes, bytes]]:
+    # Un CryptoManager par thread / processus de travail, créé au premier lot
+    global _crypto
+    if _crypto is None:
+        from app.core.security import CryptoManager
+        _crypto = CryptoManager()
+    return [_crypto.encrypt(p) for p in plaintexts]
+
+
+@lru_cache(maxsize=1)
+def thread_executor() -> ThreadPoolExecutor:
+    """Encryption pool shared by the import requests of this worker"""
+    return ThreadPoolExecutor(max_workers=settings.KEY_IMPORT_WORKERS, thread_name_prefix="key-import")
+
+
+def encrypt_rows(rows: list[PreparedRow], executor: Optional[Executor] = None, chunk_size: int = 500) -> list[tuple[bytes, bytes]]:
+    """Encrypt the values in chunks, in parallel when an executor is given (order is kept)"""
+    chunks = [[row.value for row in rows[i:i + chunk_size]] for i in range(0, len(rows), chunk_size)]
+    if executor is None:
+        results = map(_encrypt_batch, chunks)
+    else:
+        results = executor.map(_encrypt_batch, chunks)
+    return [item for chunk in results for item in chunk]
+
+
+def merge_rows(
+    db: Session,
+    user_id,
+    rows: list[PreparedRow],
+    encrypted: list[tuple[bytes, bytes]],
+    max_active_keys: Optional[int] = None,
+) -> list[ImportResult]:
+    """COPY the rows into a staging table and merge them into api_keys (caller commits)"""
+    now = datetime.utcnow()
+    db.execute(CREATE_STAGING)
+    cursor = db.connection().connection.driver_connection.cursor()
+    with cursor.copy(f"COPY key_import_staging ({', '.join(STAGING_COLUMNS)}) FROM STDIN") as copy:
+        for row, (ciphertext, nonce) in zip(rows, encrypted):
+            copy.write_row((
+                row.line, row.id, row.name, row.provider, row.prefix, row.last4,
+                ciphertext, nonce, row.hash, row.expires_at,
+            ))
+
+    merged = db.execute(MERGE, {"user_id": str(user_id), "now": now}).all()
+    if merged and max_active_keys is not None and merged[0].active_key_count > max_active_keys:
+        raise KeyQuotaExceeded(
+            f"Importing would exceed your plan's limit of {max_active_keys} active API keys"
+        )
+
+    names = {row.line: row.name for row in rows}
+    results = []
+    for line, key_id, position, inserted in ((m.line, m.id, m.position, m.inserted) for m in merged):
+        if inserted:
+            results.append(ImportResult(line, names[line], IMPORTED, id=str(key_id)))
+        else:
+            reason = "Same key earlier in the file" if position > 1 else "Duplicate key"
+            results.append(ImportResult(line, names[line], DUPLICATE, error=reason))
+    return results
+
+
+def import_keys(
+    db: Session,
+    user_id,
+    rows: Iterable[ImportRow],
+    executor: Optional[Executor] = None,
+    max_active_keys: Optional[int] = None,
+) -> ImportReport:
+    """Validate, encrypt and merge the rows in one transaction; rolls back on quota excess"""
+    started = time.perf_counter()
+    prepared, invalid = prepare(rows)
+    encrypted = encrypt_rows(prepared, executor)
+    try:
+        merged = merge_rows(db, user_id, prepared, encrypted, max_active_keys) if prepared else []
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    report = ImportReport(invalid + merged)
+    report.elapsed_seconds = time.perf_counter() - started
+    logger.info("Key import finished", extra={"counts": report.counts(), "elapsed_seconds": report.elapsed_seconds})
+    return report
@@ -0,0 +1,270 @@
+"""
+Service de provisionnement en masse - Création de comptes Supabase
+
+Entrée CSV (en-tête obligatoire : email, et optionnellement password, name, plan)
+ou NDJSON (un objet JSON par ligne, mêmes champs).
+
+1. les lignes sont validées (email, plan, doublons dans le fichier) ;
+2. l'API Admin Supabase est appelée en parallèle (au plus `concurrency` appels
+   simultanés), avec reprises et backoff sur les erreurs réseau, 429 et 5xx ;
+3. au fil des réponses, les profils `user_profiles` sont écrits par lots de
+   `batch_size` (`INSERT ... ON CONFLICT`, un aller-retour par lot) : un arrêt en
+   cours de fichier ne laisse qu'un lot de comptes sans profil ;
+4. un résultat est renvoyé pour chaque ligne : created, exists, invalid ou error.
+
+Un compte déjà présent côté Supabase est signalé "exists" sans être modifié ; s'il
+n'a pas de profil (exécution précédente interrompue), celui-ci est créé avec le plan
+du fichier. Relancer le même fichier complète donc les profils manquants.
+Sans mot de passe, un mot de passe aléatoire est utilisé : l'utilisateur passe
+par la récupération de mot de passe.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Callable, Iterable, Optional
+import csv
+import io
+import json
+import logging
+import random
+import secrets
+import time
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logging_config import mask_email
+from app.models.user import PlanType
+
+logger = logging.getLogger(__name__)
+
+CREATED = "created"
+EXISTS = "exists"
+INVALID = "invalid"
+ERROR = "error"
+
+UPSERT_PROFILE = text("""
+    INSERT INTO public.user_profiles (id, plan, created_at, updated_at)
+    VALUES (:id, :plan, :now, :now)
+    ON CONFLICT (id) DO UPDATE SET plan = excluded.plan, updated_at = excluded.updated_at
+""")
+
+# Compte existant : profil créé seulement s'il manque, jamais modifié
+INSERT_MISSING_PROFILE = text("""
+    INSERT INTO public.user_profiles (id, plan, created_at, updated_at)
+    VALUES (:id, :plan, :now, :now)
+    ON CONFLICT (id) DO NOTHING
+""")
+
+EXISTING_USERS = text("SELECT id, email FROM auth.users WHERE email IN :emails").bindparams(
+    bindparam("emails", expanding=True)
+)
+
+
+@dataclass
+class ProvisionRow:
+    line: int
+    email: str
+    password: Optional[str] = None
+    name: Optional[str] = None
+    plan: str = PlanType.FREE.value
+
+
+@dataclass
+class RowResult:
+    line: int
+    email: str
+    status: str
+    user_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class ProvisioningReport:
+    results: list[RowResult] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+
+    def counts(self) -> dict[str, int]:
+        counts = {CREATED: 0, EXISTS: 0, INVALID: 0, ERROR: 0}
+        for result in self.results:
+            counts[result.status] += 1
+        return counts
+
+    def to_dict(self) -> dict:
+        return {
+            "total": len(self.results),
+            **self.counts(),
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "results": [asdict(result) for result in sorted(self.results, key=lambda r: r.line)],
+        }
+
+
+class ProvisioningError(ValueError):
+    """Raised when the input cannot be parsed at all"""
+
+
+def parse_users(data: str, fmt: str = "csv") -> list[ProvisionRow]:
+    """Parse a CSV or NDJSON document; line numbers are those of the input"""
+    fmt = fmt.lower()
+    rows = []
+    if fmt == "csv":
+        reader = csv.DictReader(io.StringIO(data))
+        fields = {name.strip().lower() for name in reader.fieldnames or []}
+        if "email" not in fields:
+            raise ProvisioningError("CSV header must contain an 'email' column")
+        for record in reader:
+            record = {(k or "").strip().lower(): (v or "").strip() for k, v in record.items()}
+            rows.append(_row(reader.line_num, record))
+    elif fmt in ("ndjson", "jsonl"):
+        for number, line in enumerate(data.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ProvisioningError(f"Line {number}: invalid JSON ({e.msg})")
+            if not isinstance(record, dict):
+                raise ProvisioningError(f"Line {number}: expected a JSON object")
+            rows.append(_row(number, {k.lower(): v for k, v in record.items()}))
+    else:
+        raise ProvisioningError(f"Unknown format {fmt!r} (expected csv or ndjson)")
+    return rows
+
+
+def _row(line: int, record: dict) -> ProvisionRow:
+    return ProvisionRow(
+        line=line,
+        email=str(record.get("email") or "").strip().lower(),
+        password=record.get("password") or None,
+        name=record.get("name") or None,
+        plan=str(record.get("plan") or PlanType.FREE.value).strip().upper(),
+    )
+
+
+def validate(rows: Iterable[ProvisionRow]) -> tuple[list[ProvisionRow], list[RowResult]]:
+    """Split rows into valid ones and `invalid` results"""
+    valid, invalid, seen = [], [], set()
+    plans = {plan.value for plan in PlanType}
+    for row in rows:
+        error = None
+        if "@" not in row.email or row.email.startswith("@") or row.email.endswith("@"):
+            error = "Invalid email"
+        elif row.plan not in plans:
+            error = f"Invalid plan {row.plan!r}"
+        elif row.password is not None and len(row.password) < 8:
+            error = "Password must be at least 8 characters"
+        elif row.email in seen:
+            error = "Duplicate email in input"
+        if error:
+            invalid.append(RowResult(row.line, row.email, INVALID, error=error))
+        else:
+            seen.add(row.email)
+            valid.append(row)
+    return valid, invalid
+
+
+def _is_retryable(status_code: int) -> bool:
+    return status_code == 429 or status_code >= 500
+
+
+def _already_registered(resp) -> bool:
+    if resp.status_code not in (400, 409, 422):
+        return False
+    try:
+        body = resp.json()
+    except ValueError:
+        return False
+    message = f"{body.get('error_code', '')} {body.get('msg', '')} {body.get('message', '')}".lower()
+    return "email_exists" in message or "already" in message
+
+
+def create_remote_user(row: ProvisionRow, retries: int = 3, base_delay: float = 0.2) -> RowResult:
+    """Create one user through the Supabase Admin API, retrying transient failures"""
+    from app.core.supabase import admin_create_user_response
+
+    metadata = {"name": row.name} if row.name else None
+    password = row.password or secrets.token_urlsafe(24)
+    error = None
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(base_delay * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+        try:
+            resp = admin_create_user_response(row.email, password, metadata, email_confirm=True)
+        except Exception as e:
+            # Y compris CircuitOpenError : la ligne est en erreur, relancer le fichier plus tard
+            # (les comptes déjà créés ressortent en "exists")
+            error = f"{type(e).__name__}: {e}"
+            continue
+        if resp.status_code in (200, 201):
+            return RowResult(row.line, row.email, CREATED, user_id=str(resp.json()["id"]))
+        if _already_registered(resp):
+            return RowResult(row.line, row.email, EXISTS)
+        error = f"Supabase returned {resp.status_code}: {resp.text[:200]}"
+        if not _is_retryable(resp.status_code):
+            break
+    logger.warning("Provisioning failed", extra={"email": mask_email(row.email), "error": error})
+    return RowResult(row.line, row.email, ERROR, error=error)
+
+
+def write_profiles(db: Session, results: list[RowResult], plans: dict[int, str]) -> None:
+    """Write the profiles of one batch of remote results (created and exists) in one transaction"""
+    created = [r for r in results if r.status == CREATED]
+    existing = [r for r in results if r.status == EXISTS]
+    now = datetime.utcnow()
+    try:
+        if existing:
+            # Identifiants des comptes déjà existants, une requête par lot
+            found = db.execute(EXISTING_USERS, {"emails": [r.email for r in existing]}).all()
+            ids = {email.lower(): str(user_id) for user_id, email in found}
+            for result in existing:
+                result.user_id = ids.get(result.email)
+        if created:
+            db.execute(UPSERT_PROFILE, [{"id": r.user_id, "plan": plans[r.line], "now": now} for r in created])
+        missing = [r for r in existing if r.user_id]
+        if missing:
+            db.execute(INSERT_MISSING_PROFILE, [{"id": r.user_id, "plan": plans[r.line], "now": now} for r in missing])
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.exception("Profile batch insert failed", extra={"count": len(results)})
+        for result in created + existing:
+            result.status, result.error = ERROR, f"Account exists but profile insert failed: {e}"[:300]
+
+
+def provision_users(
+    rows: list[ProvisionRow],
+    session_factory: Callable[[], Session],
+    concurrency: int = 8,
+    retries: int = 3,
+    batch_size: int = 500,
+) -> ProvisioningReport:
+    """Create the users remotely with bounded concurrency, writing profiles in batches as results arrive"""
+    if not settings.SUPABASE_URL or not settings.SUPABASE_SERVICE_ROLE_KEY:
+        raise ProvisioningError("Supabase admin API is not configured (SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)")
+
+    started = time.perf_counter()
+    valid, report_rows = validate(rows)
+    plans = {row.line: row.plan for row in valid}
+    remote: list[RowResult] = []
+    pending: list[RowResult] = []
+
+    with session_factory() as db:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="provision") as pool:
+            futures = [pool.submit(create_remote_user, row, retries) for row in valid]
+            for future in as_completed(futures):
+                result = future.result()
+                remote.append(result)
+                if result.status in (CREATED, EXISTS):
+                    pending.append(result)
+                if len(pending) >= batch_size:
+                    write_profiles(db, pending, plans)
+                    pending = []
+        if pending:
+            write_profiles(db, pending, plans)
+
+    report = ProvisioningReport(report_rows + remote)
+    report.elapsed_seconds = time.perf_counter() - started
+    logger.info("Provisioning finished", extra={"counts": report.counts(), "elapsed_seconds": report.elapsed_seconds})
+    return report
@@ -0,0 +1,285 @@
+"""
+Faux serveur Supabase Auth pour les tests de charge
+
+Implémente les endpoints appelés par app/core/supabase.py, avec un stockage en
+mémoire et une latence configurable, pour qu'aucun benchmark n'atteigne le vrai
+projet Supabase :
+
+    POST   /auth/v1/admin/users          admin_create_user
+    PUT    /auth/v1/admin/users/{id}     admin_update_user_password
+    DELETE /auth/v1/admin/users/{id}     admin_delete_user
+    POST   /auth/v1/token                sign_in_with_password (grant_type=password)
+    GET    /auth/v1/user                 get_user_from_token
+    POST   /auth/v1/recover              send_recovery_email
+    GET    /__stats                      nombre d'appels par endpoint (hors API Supabase)
+
+Usage autonome:
+    python -m benchmarks.fake_supabase --port 54321 --latency-ms 40
+"""
+
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+import argparse
+import json
+import random
+import secrets
+import threading
+import time
+import uuid
+
+SERVICE_ROLE_KEY = "fake-service-role-key"
+
+
+class FakeSupabaseState:
+    def __init__(self, service_role_key: str = SERVICE_ROLE_KEY, latency_ms: float = 0, jitter_ms: float = 0):
+        self.service_role_key = service_role_key
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.users: dict[str, dict] = {}
+        self.users_by_email: dict[str, str] = {}
+        self.passwords: dict[str, str] = {}
+        self.tokens: dict[str, str] = {}
+        self.calls: dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def count(self, endpoint: str) -> None:
+        with self.lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+
+    def delay(self) -> None:
+        latency = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if latency > 0:
+            time.sleep(latency / 1000)
+
+
+class FakeSupabaseHandler(BaseHTTPRequestHandler):
+    server_version = "FakeSupabase/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self) -> FakeSupabaseState:
+        return self.server.state
+
+    def log_message(self, format, *args):
+        # Silencieux : des milliers de requêtes par seconde pendant un benchmark
+        pass
+
+    # -- helpers --------------------------------------------------------------
+
+    def _send(self, status: int, body: Optional[dict] = None) -> None:
+        payload = json.dumps(body if body is not None else {}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        if not raw:
+            return {}
+        if self.headers.get("Content-Type", "").startswith("application/x-www-form-urlencoded"):
+            return {key: values[0] for key, values in parse_qs(raw.decode("utf-8")).items()}
+        return json.loads(raw)
+
+    def _bearer(self) -> Optional[str]:
+        header = self.headers.get("Authorization", "")
+        return header[7:] if header.startswith("Bearer ") else None
+
+    def _is_service_role(self) -> bool:
+        return self.headers.get("apikey") == self.state.service_role_key
+
+    def _dispatch(self, method: str) -> None:
+        path = urlparse(self.path).path.rstrip("/")
+        body = self._body() if method in ("POST", "PUT") else {}
+
+        if path == "/__stats":
+            with self.state.lock:
+                calls = dict(self.state.calls)
+            self._send(200, {"calls": calls, "users": len(self.state.users)})
+            return
+
+        self.state.delay()
+
+        if path == "/auth/v1/admin/users" and method == "POST":
+            self.state.count("admin_create_user")
+            self._admin_create_user(body)
+        elif path.startswith("/auth/v1/admin/users/") and method == "PUT":
+            self.state.count("admin_update_user_password")
+            self._admin_update_user(path.rsplit("/", 1)[1], body)
+        elif path.startswith("/auth/v1/admin/users/") and method == "DELETE":
+            self.state.count("admin_delete_user")
+            self._admin_delete_user(path.rsplit("/", 1)[1])
+        elif path == "/auth/v1/token" and method == "POST":
+            self.state.count("sign_in_with_password")
+            self._token(body)
+        elif path == "/auth/v1/user" and method == "GET":
+            self.state.count("get_user_from_token")
+            self._user()
+        elif path == "/auth/v1/recover" and method == "POST":
+            self.state.count("send_recovery_email")
+            self._send(200, {})
+        else:
+            self._send(404, {"msg": f"Unknown route {method} {path}"})
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    # -- endpoints ------------------------------------------------------------
+
+    def _admin_create_user(self, body: dict) -> None:
+        if not self._is_service_role():
+            self._send(401, {"msg": "Invalid API key"})
+            return
+        email = (body.get("email") or "").lower()
+        with self.state.lock:
+            if not email or email in self.state.users_by_email:
+                self._send(422, {"msg": "A user with this email address has already been registered"})
+                return
+            now = datetime.now(timezone.utc).isoformat()
+            user = {
+                "id": str(uuid.uuid4()),
+                "aud": "authenticated",
+                "role": "authenticated",
+                "email": email,
+                "user_metadata": body.get("user_metadata") or {},
+                "created_at": now,
+                "updated_at": now,
+            }
+            self.state.users[user["id"]] = user
+            self.state.users_by_email[email] = user["id"]
+            self.state.passwords[user["id"]] = body.get("password") or ""
+        self._send(200, user)
+
+    def _admin_update_user(self, user_id: str, body: dict) -> None:
+        if not self._is_service_role():
+            self._send(401, {"msg": "Invalid API key"})
+            return
+        with self.state.lock:
+            user = self.state.users.get(user_id)
+            if user is None:
+                self._send(404, {"msg": "User not found"})
+                return
+            if "password" in body:
+                self.state.passwords[user_id] = body["password"]
+        self._send(200, user)
+
+    def _admin_delete_user(self, user_id: str) -> None:
+        if not self._is_service_role():
+            self._send(401, {"msg": "Invalid API key"})
+            return
+        with self.state.lock:
+            user = self.state.users.pop(user_id, None)
+            if user is None:
+                self._send(404, {"msg": "User not found"})
+                return
+            self.state.users_by_email.pop(user["email"], None)
+            self.state.passwords.pop(user_id, None)
+        self._send(200, {})
+
+    def _token(self, body: dict) -> None:
+        query = parse_qs(urlparse(self.path).query)
+        grant_type = body.get("grant_type") or (query.get("grant_type") or [None])[0]
+        if grant_type != "password":
+            self._send(400, {"error": "unsupported_grant_type"})
+            return
+        email = (body.get("email") or "").lower()
+        with self.state.lock:
+            user_id = self.state.users_by_email.get(email)
+            if user_id is None or self.state.passwords.get(user_id) != body.get("password"):
+                self._send(400, {"error": "invalid_grant", "error_description": "Invalid login credentials"})
+                return
+            token = secrets.token_urlsafe(32)
+            self.state.tokens[token] = user_id
+            user = self.state.users[user_id]
+        self._send(200, {
+            "access_token": token,
+            "token_type": "bearer",
+            "expires_in": 3600,
+            "refresh_token": secrets.token_urlsafe(16),
+            "user": user,
+        })
+
+    def _user(self) -> None:
+        token = self._bearer()
+        with self.state.lock:
+            user_id = self.state.tokens.get(token) if token else None
+            user = self.state.users.get(user_id) if user_id else None
+        if user is None:
+            self._send(401, {"msg": "Invalid token"})
+            return
+        self._send(200, user)
+
+
+class FakeSupabase:
+    """Fake Supabase Auth server running in a background thread"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, **state_options):
+        self.state = FakeSupabaseState(**state_options)
+        self._server = ThreadingHTTPServer((host, port), FakeSupabaseHandler)
+        self._server.daemon_threads = True
+        self._server.state = self.state
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def service_role_key(self) -> str:
+        return self.state.service_role_key
+
+    def start(self) -> "FakeSupabase":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-supabase", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeSupabase":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.fake_supabase")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Fixed latency added to each call")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Random extra latency (uniform)")
+    parser.add_argument("--service-role-key", default=SERVICE_ROLE_KEY)
+    args = parser.parse_args(argv)
+
+    server = FakeSupabase(
+        args.host, args.port,
+        service_role_key=args.service_role_key, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+    )
+    print(f"Fake Supabase listening on {server.url} (SUPABASE_SERVICE_ROLE_KEY={server.service_role_key})")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -30,7 +30,7 @@ def create_api_keys_table():
                     user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
                     name VARCHAR(255) NOT NULL,
                     provider VARCHAR(50) NOT NULL DEFAULT 'CUSTOM',
-                    provider_config TEXT,
+                    provider_config JSONB,
                     prefix VARCHAR(10) NOT NULL,
                     last4 VARCHAR(4) NOT NULL,
                     enc_ciphertext BYTEA NOT NULL,
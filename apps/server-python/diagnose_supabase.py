@@ -154,7 +154,7 @@ def diagnose_supabase_creation():
                     revoked, created_at, updated_at
                 )
                 VALUES (
-                    :id, :user_id, :name, :provider, :provider_config,
+                    :id, :user_id, :name, :provider, CAST(:provider_config AS jsonb),
                     :prefix, :last4, :ciphertext, :nonce, :hash,
                     false, NOW(), NOW()
                 )
@@ -182,7 +182,7 @@ def diagnose_supabase_creation():
 
         with engine.begin() as conn:
             result = conn.execute(text("""
-                SELECT id, name, provider, prefix, last4, provider_config
+                SELECT id, name, provider, prefix, last4, provider_config::text
                 FROM api_keys
                 WHERE id = :id
             """), {"id": inserted_id})
@@ -0,0 +1,109 @@
+"""
+Configuration gunicorn pour la production
+
+    gunicorn app.main:app -c gunicorn.conf.py
+
+Le nombre de workers est calculé à partir des CPU réellement disponibles
+(affinité + quota cgroup v1/v2), et peut être forcé avec WEB_CONCURRENCY.
+Voir DEPLOYMENT.md (section "Workers gunicorn") pour la procédure de mesure.
+"""
+
+import math
+import os
+from pathlib import Path
+
+
+def _read(path: str) -> str | None:
+    try:
+        return Path(path).read_text().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_quota() -> float | None:
+    """CPU quota of the container (e.g. 1.5), None when unlimited"""
+    # cgroup v2: "max 100000" ou "150000 100000"
+    cpu_max = _read("/sys/fs/cgroup/cpu.max")
+    if cpu_max:
+        quota, _, period = cpu_max.partition(" ")
+        if quota != "max" and period:
+            return int(quota) / int(period)
+        return None
+
+    # cgroup v1
+    quota = _read("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")
+    period = _read("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+
+def available_cpus() -> int:
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    quota = cgroup_cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+    return max(1, cpus)
+
+
+def default_workers() -> int:
+    per_core = float(os.getenv("GUNICORN_WORKERS_PER_CORE", "1"))
+    workers = max(1, int(available_cpus() * per_core))
+    max_workers = int(os.getenv("GUNICORN_MAX_WORKERS", "0"))
+    if max_workers > 0:
+        workers = min(workers, max_workers)
+    return workers
+
+
+# Server socket
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+backlog = 2048
+
+# Workers
+# Un worker uvicorn par CPU : les routes sync tournent dans le threadpool du worker,
+# et Argon2/AES-GCM sont liés au CPU, donc plus de workers que de cœurs n'aide pas.
+# Chaque worker ouvre jusqu'à pool_size + max_overflow (5 + 10) connexions Postgres :
+# vérifier que workers * 15 reste sous la limite de connexions de la base.
+workers = int(os.getenv("WEB_CONCURRENCY", "0")) or default_workers()
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Recycler les workers périodiquement (fuites mémoire), avec jitter pour
+# éviter qu'ils redémarrent tous en même temps
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "200"))
+
+# Timeouts
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+# Doit rester supérieur au timeout idle du load balancer devant l'application
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "75"))
+
+# L'application est importée une seule fois dans le master puis forkée :
+# démarrage plus rapide et mémoire partagée entre workers
+preload_app = True
+
+# Logging
+accesslog = os.getenv("GUNICORN_ACCESSLOG", "-")
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOGLEVEL", "info")
+
+
+def post_fork(server, worker):
+    """Drop the connection pool inherited from the master.
+
+    With preload_app the engine is created before fork; sharing its sockets
+    between processes corrupts the protocol state, so each worker starts
+    with an empty pool (close=False leaves the parent's connections alone).
+    """
+    from app.core.database import engine
+
+    engine.dispose(close=False)
+    server.log.info("Worker %s: database pool reset", worker.pid)
+
+
+def when_ready(server):
+    server.log.info("gunicorn ready with %s workers (%s CPUs available)", workers, available_cpus())
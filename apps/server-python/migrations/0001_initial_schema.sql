@@ -0,0 +1,61 @@
+-- Schéma initial (équivalent de l'ancien Base.metadata.create_all au démarrage)
+-- Idempotent : sans effet sur une base déjà créée par create_all ou supabase_tables.sql
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_type WHERE typname = 'plantype') THEN
+        CREATE TYPE plantype AS ENUM ('FREE', 'PRO');
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_type WHERE typname = 'providertype') THEN
+        CREATE TYPE providertype AS ENUM ('CUSTOM', 'SUPABASE', 'IA');
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_type WHERE typname = 'invoicestatus') THEN
+        CREATE TYPE invoicestatus AS ENUM ('PAID', 'OPEN', 'VOID', 'DRAFT', 'UNCOLLECTIBLE');
+    END IF;
+END
+$$;
+
+CREATE TABLE IF NOT EXISTS public.user_profiles (
+    id UUID PRIMARY KEY,
+    plan plantype NOT NULL,
+    stripe_id VARCHAR UNIQUE,
+    created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS public.api_keys (
+    id UUID PRIMARY KEY,
+    user_id UUID NOT NULL REFERENCES public.user_profiles (id) ON DELETE CASCADE,
+    name VARCHAR NOT NULL,
+    provider providertype NOT NULL,
+    provider_config TEXT,
+    prefix VARCHAR NOT NULL,
+    last4 VARCHAR NOT NULL,
+    enc_ciphertext BYTEA NOT NULL,
+    enc_nonce BYTEA NOT NULL,
+    hash VARCHAR NOT NULL,
+    revoked BOOLEAN NOT NULL,
+    created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ix_api_keys_hash ON public.api_keys (hash);
+CREATE INDEX IF NOT EXISTS idx_api_keys_user_id ON public.api_keys (user_id);
+
+CREATE TABLE IF NOT EXISTS public.invoices (
+    id UUID PRIMARY KEY,
+    user_id UUID NOT NULL REFERENCES public.user_profiles (id) ON DELETE CASCADE,
+    stripe_invoice_id VARCHAR NOT NULL,
+    amount INTEGER NOT NULL,
+    currency VARCHAR NOT NULL,
+    status invoicestatus NOT NULL,
+    invoice_pdf VARCHAR,
+    hosted_invoice_url VARCHAR,
+    description TEXT,
+    period_start TIMESTAMP WITHOUT TIME ZONE,
+    period_end TIMESTAMP WITHOUT TIME ZONE,
+    created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ix_invoices_stripe_invoice_id ON public.invoices (stripe_invoice_id);
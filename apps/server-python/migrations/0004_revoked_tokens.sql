@@ -0,0 +1,16 @@
+-- Liste de révocation des JWT (logout réel)
+-- Chaque jeton porte un claim `jti` ; une ligne par jeton révoqué, conservée
+-- jusqu'à l'expiration du jeton (au-delà, le jeton est refusé de toute façon).
+
+CREATE TABLE IF NOT EXISTS public.revoked_tokens (
+    jti VARCHAR(64) PRIMARY KEY,
+    user_id UUID,
+    revoked_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    expires_at TIMESTAMPTZ NOT NULL
+);
+
+-- Rafraîchissement incrémental des workers (WHERE revoked_at > dernier passage)
+CREATE INDEX IF NOT EXISTS idx_revoked_tokens_revoked_at ON public.revoked_tokens (revoked_at);
+
+-- Purge des lignes expirées
+CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires_at ON public.revoked_tokens (expires_at);
@@ -0,0 +1,23 @@
+-- Compteur de clés actives par utilisateur (quota par plan)
+-- Maintenu par l'API dans la transaction qui crée / révoque une clé, pour ne pas
+-- faire de COUNT(*) sur api_keys à chaque création.
+
+ALTER TABLE public.user_profiles
+ADD COLUMN IF NOT EXISTS active_key_count INTEGER NOT NULL DEFAULT 0;
+
+-- Initialisation à partir des clés existantes
+UPDATE public.user_profiles p
+SET active_key_count = c.total
+FROM (
+    SELECT user_id, COUNT(*) AS total
+    FROM public.api_keys
+    WHERE NOT revoked
+    GROUP BY user_id
+) c
+WHERE c.user_id = p.id;
+
+ALTER TABLE public.user_profiles
+DROP CONSTRAINT IF EXISTS user_profiles_active_key_count_check;
+
+ALTER TABLE public.user_profiles
+ADD CONSTRAINT user_profiles_active_key_count_check CHECK (active_key_count >= 0);
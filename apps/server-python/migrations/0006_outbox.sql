@@ -0,0 +1,33 @@
+-- Outbox transactionnelle : effets de bord distants (appels Supabase) différés
+-- La ligne est insérée dans la transaction de la requête ; un worker asyncio la
+-- traite après le commit, avec reprises et backoff (app/core/outbox.py).
+
+CREATE TABLE IF NOT EXISTS public.outbox (
+    id BIGSERIAL PRIMARY KEY,
+    kind VARCHAR(64) NOT NULL,
+    payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+    -- Un même effet (ex: email de récupération pour une adresse) n'est en file qu'une fois
+    dedup_key VARCHAR(255),
+    status VARCHAR(16) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    last_error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    processed_at TIMESTAMPTZ,
+    CONSTRAINT outbox_status_check CHECK (status IN ('pending', 'done', 'failed'))
+);
+
+-- Messages à traiter, par échéance (petit index : les messages traités en sortent)
+CREATE INDEX IF NOT EXISTS idx_outbox_pending
+ON public.outbox (next_attempt_at)
+WHERE status = 'pending';
+
+-- Déduplication des messages en attente
+CREATE UNIQUE INDEX IF NOT EXISTS idx_outbox_pending_dedup_key
+ON public.outbox (dedup_key)
+WHERE status = 'pending' AND dedup_key IS NOT NULL;
+
+-- Purge des messages traités
+CREATE INDEX IF NOT EXISTS idx_outbox_processed_at
+ON public.outbox (processed_at)
+WHERE status <> 'pending';
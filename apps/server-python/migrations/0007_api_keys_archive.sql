@@ -0,0 +1,26 @@
+-- Archive des clés API révoquées
+-- Les clés révoquées depuis plus de API_KEY_ARCHIVE_DAYS jours sont déplacées ici par lots
+-- (tâche archive-revoked-keys, app/maintenance/jobs.py) : api_keys et ses index ne
+-- contiennent plus que les clés actives et les révocations récentes.
+-- Toute colonne ajoutée à api_keys doit aussi l'être ici (voir ARCHIVED_COLUMNS).
+
+CREATE TABLE IF NOT EXISTS public.api_keys_archive (
+    id UUID PRIMARY KEY,
+    -- Supprimer un profil supprime aussi ses clés archivées
+    user_id UUID NOT NULL REFERENCES public.user_profiles (id) ON DELETE CASCADE,
+    name VARCHAR NOT NULL,
+    provider providertype NOT NULL,
+    provider_config TEXT,
+    prefix VARCHAR NOT NULL,
+    last4 VARCHAR NOT NULL,
+    enc_ciphertext BYTEA NOT NULL,
+    enc_nonce BYTEA NOT NULL,
+    hash VARCHAR NOT NULL,
+    revoked BOOLEAN NOT NULL,
+    created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_api_keys_archive_user_id ON public.api_keys_archive (user_id);
+CREATE INDEX IF NOT EXISTS idx_api_keys_archive_archived_at ON public.api_keys_archive (archived_at);
@@ -0,0 +1,19 @@
+-- migrate:no-transaction
+-- Index partiels sur api_keys
+--
+-- Les requêtes chaudes (list_api_keys, quotas, recomptage) filtrent toujours
+-- `NOT revoked` : un index limité aux clés actives reste petit quand les révocations
+-- s'accumulent. L'index booléen idx_api_keys_revoked (créé par supabase_tables.sql
+-- sur les anciennes bases) est trop peu sélectif pour servir : il est supprimé.
+-- idx_api_keys_user_id reste nécessaire pour la cascade depuis user_profiles.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_api_keys_user_active
+ON public.api_keys (user_id)
+WHERE NOT revoked;
+
+-- Clés révoquées par date de révocation : lots de l'archivage
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_api_keys_revoked_updated_at
+ON public.api_keys (updated_at)
+WHERE revoked;
+
+DROP INDEX CONCURRENTLY IF EXISTS public.idx_api_keys_revoked;
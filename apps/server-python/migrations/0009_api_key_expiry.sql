@@ -0,0 +1,16 @@
+-- migrate:no-transaction
+-- Expiration optionnelle des clés API
+--
+-- expires_at NULL = pas d'expiration. La révélation refuse une clé expirée ; le balayeur
+-- (tâche expire-keys, app/maintenance/jobs.py) révoque les clés expirées par lots, en
+-- lisant l'index partiel ci-dessous dans l'ordre des échéances. Ajouter une colonne
+-- nullable sans défaut ne réécrit pas la table.
+
+ALTER TABLE public.api_keys ADD COLUMN IF NOT EXISTS expires_at TIMESTAMP WITHOUT TIME ZONE;
+
+ALTER TABLE public.api_keys_archive ADD COLUMN IF NOT EXISTS expires_at TIMESTAMP WITHOUT TIME ZONE;
+
+-- Clés actives ayant une échéance : petit index, prochaine échéance = première entrée
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_api_keys_expires_at
+ON public.api_keys (expires_at)
+WHERE NOT revoked AND expires_at IS NOT NULL;
@@ -0,0 +1,9 @@
+-- Suivi d'utilisation des clés API
+-- Écrit par lots par app/core/usage.py (UPDATE ... FROM VALUES), jamais ligne par requête.
+-- Une colonne avec un DEFAULT constant ne réécrit pas la table (PostgreSQL 11+).
+
+ALTER TABLE public.api_keys ADD COLUMN IF NOT EXISTS last_used_at TIMESTAMP WITHOUT TIME ZONE;
+ALTER TABLE public.api_keys ADD COLUMN IF NOT EXISTS usage_count BIGINT NOT NULL DEFAULT 0;
+
+ALTER TABLE public.api_keys_archive ADD COLUMN IF NOT EXISTS last_used_at TIMESTAMP WITHOUT TIME ZONE;
+ALTER TABLE public.api_keys_archive ADD COLUMN IF NOT EXISTS usage_count BIGINT NOT NULL DEFAULT 0;
@@ -0,0 +1,56 @@
+-- Journal d'audit des clés API (ajout seul)
+--
+-- Alimenté par app/core/audit.py : les événements sont mis en file en mémoire puis
+-- écrits par COPY, par lots. Table partitionnée par mois sur occurred_at : les
+-- requêtes par période ne lisent que les partitions concernées, et une purge
+-- éventuelle se fait par DROP d'une partition entière.
+-- Pas de clé étrangère vers user_profiles : la trace survit à la suppression du compte.
+
+CREATE TABLE IF NOT EXISTS public.audit_log (
+    id BIGSERIAL,
+    occurred_at TIMESTAMPTZ NOT NULL,
+    user_id UUID NOT NULL,
+    action VARCHAR(32) NOT NULL,
+    api_key_id UUID,
+    request_id VARCHAR(64),
+    ip VARCHAR(64),
+    details JSONB,
+    PRIMARY KEY (occurred_at, id)
+) PARTITION BY RANGE (occurred_at);
+
+-- Filet de sécurité si une partition mensuelle manque (ne doit pas se remplir)
+CREATE TABLE IF NOT EXISTS public.audit_log_default PARTITION OF public.audit_log DEFAULT;
+
+-- Consultation par utilisateur et période, du plus récent au plus ancien (pagination par clé)
+CREATE INDEX IF NOT EXISTS idx_audit_log_user_time
+ON public.audit_log (user_id, occurred_at DESC, id DESC);
+
+-- Crée les partitions mensuelles du mois courant et des `months_ahead` mois suivants.
+-- Appelée par la tâche de fond "audit_partitions" (quotidienne) et ci-dessous.
+CREATE OR REPLACE FUNCTION public.ensure_audit_log_partitions(months_ahead INTEGER DEFAULT 2)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    month_start DATE;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    FOR i IN 0..months_ahead LOOP
+        month_start := (date_trunc('month', NOW() AT TIME ZONE 'UTC') + make_interval(months => i))::date;
+        partition_name := 'audit_log_' || to_char(month_start, 'YYYY_MM');
+        IF to_regclass('public.' || partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE public.%I PARTITION OF public.audit_log FOR VALUES FROM (%L) TO (%L)',
+                partition_name,
+                month_start::timestamp AT TIME ZONE 'UTC',
+                (month_start + INTERVAL '1 month')::timestamp AT TIME ZONE 'UTC'
+            );
+            created := created + 1;
+        END IF;
+    END LOOP;
+    RETURN created;
+END;
+$$;
+
+SELECT public.ensure_audit_log_partitions(2);
@@ -0,0 +1,43 @@
+-- provider_config en JSONB (api_keys et api_keys_archive)
+--
+-- La configuration était un TEXT contenant du JSON, relu et revalidé par les routes :
+-- impossible de filtrer dessus sans charger chaque ligne. En JSONB, elle est validée à
+-- l'écriture et interrogeable côté serveur (`provider_config @> '{"url": ...}'`).
+-- Une ancienne valeur qui n'est pas du JSON valide est conservée comme chaîne JSON
+-- plutôt que de faire échouer la migration.
+-- Le changement de type réécrit la table (verrou exclusif le temps de la réécriture).
+
+CREATE FUNCTION pg_temp.provider_config_to_jsonb(value TEXT)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF value IS NULL OR btrim(value) = '' THEN
+        RETURN NULL;
+    END IF;
+    RETURN value::jsonb;
+EXCEPTION WHEN invalid_text_representation THEN
+    RETURN to_jsonb(value);
+END;
+$$;
+
+DO $$
+DECLARE
+    target TEXT;
+BEGIN
+    FOREACH target IN ARRAY ARRAY['api_keys', 'api_keys_archive'] LOOP
+        -- Idempotent : ne convertit que les colonnes encore en TEXT
+        IF EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = 'public' AND table_name = target
+              AND column_name = 'provider_config' AND data_type = 'text'
+        ) THEN
+            EXECUTE format(
+                'ALTER TABLE public.%I ALTER COLUMN provider_config TYPE JSONB '
+                'USING pg_temp.provider_config_to_jsonb(provider_config)',
+                target
+            );
+        END IF;
+    END LOOP;
+END;
+$$;
@@ -0,0 +1,11 @@
+-- migrate:no-transaction
+-- Index GIN sur la configuration des clés actives
+--
+-- Sert le filtre `provider_config` de GET /api/keys (containment `@>`, par exemple
+-- toutes les clés d'un projet Supabase). jsonb_path_ops ne gère que `@>` mais donne
+-- un index plus petit et plus rapide que l'opérateur par défaut. Limité aux clés
+-- actives, comme idx_api_keys_user_active.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_api_keys_provider_config
+ON public.api_keys USING GIN (provider_config jsonb_path_ops)
+WHERE NOT revoked;
@@ -0,0 +1,64 @@
+-- Partitions mensuelles du journal d'audit : reprise des lignes tombées dans la partition DEFAULT
+--
+-- Si la partition d'un mois manquait (tâche "audit_partitions" arrêtée), ses événements sont
+-- écrits dans audit_log_default, et `CREATE TABLE ... PARTITION OF` pour ce mois échoue
+-- ensuite : la version de 0011 s'arrêtait alors au mois courant et ne créait plus aucune
+-- partition. Désormais les lignes du mois sont déplacées de DEFAULT vers une table créée
+-- à part, attachée ensuite comme partition ; chaque mois a son propre bloc d'exception
+-- (un échec est signalé par un WARNING et n'empêche pas les mois suivants).
+
+CREATE OR REPLACE FUNCTION public.ensure_audit_log_partitions(months_ahead INTEGER DEFAULT 2)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    month_start DATE;
+    range_start TIMESTAMPTZ;
+    range_end TIMESTAMPTZ;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    FOR i IN 0..months_ahead LOOP
+        month_start := (date_trunc('month', NOW() AT TIME ZONE 'UTC') + make_interval(months => i))::date;
+        range_start := month_start::timestamp AT TIME ZONE 'UTC';
+        range_end := (month_start + INTERVAL '1 month')::timestamp AT TIME ZONE 'UTC';
+        partition_name := 'audit_log_' || to_char(month_start, 'YYYY_MM');
+        CONTINUE WHEN to_regclass('public.' || partition_name) IS NOT NULL;
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM public.audit_log_default
+                WHERE occurred_at >= range_start AND occurred_at < range_end
+            ) THEN
+                EXECUTE format(
+                    'CREATE TABLE public.%I (LIKE public.audit_log INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                    partition_name
+                );
+                EXECUTE format(
+                    'WITH moved AS (
+                        DELETE FROM public.audit_log_default
+                        WHERE occurred_at >= %L AND occurred_at < %L
+                        RETURNING *
+                    )
+                    INSERT INTO public.%I SELECT * FROM moved',
+                    range_start, range_end, partition_name
+                );
+                EXECUTE format(
+                    'ALTER TABLE public.audit_log ATTACH PARTITION public.%I FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, range_start, range_end
+                );
+            ELSE
+                EXECUTE format(
+                    'CREATE TABLE public.%I PARTITION OF public.audit_log FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, range_start, range_end
+                );
+            END IF;
+            created := created + 1;
+        EXCEPTION WHEN OTHERS THEN
+            RAISE WARNING 'audit_log partition % not created: %', partition_name, SQLERRM;
+        END;
+    END LOOP;
+    RETURN created;
+END;
+$$;
+
+SELECT public.ensure_audit_log_partitions(2);
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Générateur de jeu de données synthétique pour les environnements de charge
+
+Remplit auth.users, user_profiles, api_keys (vrais chiffrés AES-GCM via
+CryptoManager) et invoices avec COPY, puis initialise le compteur
+user_profiles.active_key_count. Le chiffrement est fait en parallèle
+dans des processus séparés, par lots, pendant que le process principal écrit.
+
+Les données sont déterministes pour une même graine (--seed) : mêmes ids,
+emails, clés en clair et hash. Seuls les nonces AES-GCM (et donc les
+chiffrés) sont aléatoires, comme en production.
+
+Tous les utilisateurs partagent le mot de passe --password (un seul hash
+Argon2 calculé), ce qui permet de se connecter avec n'importe quel compte.
+
+Exemples:
+    python scripts/generate_dataset.py --users 100000 --keys 1000000
+    python scripts/generate_dataset.py --users 10000 --keys 500000 --heavy-users 5 --heavy-keys 50000
+    python scripts/generate_dataset.py --users 100000 --keys 1000000 --skew 1.1 --truncate
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator, Optional
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import random
+import string
+import sys
+import time
+import uuid
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+INSTANCE_ID = "00000000-0000-0000-0000-000000000000"
+EMAIL_DOMAIN = "bench.example.com"
+PROVIDERS = ("CUSTOM", "IA", "SUPABASE")
+PROVIDER_WEIGHTS = (0.6, 0.3, 0.1)
+KEY_PREFIXES = ("sk_", "sk-proj_", "vk_", "AIza", "mistral_", "ds_")
+INVOICE_STATUSES = ("PAID", "PAID", "PAID", "OPEN", "VOID")
+
+USER_COLUMNS = (
+    "instance_id", "id", "aud", "role", "email", "encrypted_password",
+    "email_confirmed_at", "created_at", "updated_at",
+)
+PROFILE_COLUMNS = ("id", "plan", "created_at", "updated_at")
+KEY_COLUMNS = (
+    "id", "user_id", "name", "provider", "provider_config", "prefix", "last4",
+    "enc_ciphertext", "enc_nonce", "hash", "revoked", "created_at", "updated_at",
+)
+INVOICE_COLUMNS = (
+    "id", "user_id", "stripe_invoice_id", "amount", "currency", "status",
+    "description", "period_start", "period_end", "created_at", "updated_at",
+)
+
+
+# ---------------------------------------------------------------------------
+# Chiffrement parallèle
+# ---------------------------------------------------------------------------
+
+_crypto = None
+
+
+def _init_worker() -> None:
+    global _crypto
+    from app.core.security import CryptoManager
+    _crypto = CryptoManager()
+
+
+def _encrypt_batch(plaintexts: list[str]) -> list[tuple[bytes, bytes]]:
+    return [_crypto.encrypt(p) for p in plaintexts]
+
+
+# ---------------------------------------------------------------------------
+# Génération déterministe
+# ---------------------------------------------------------------------------
+
+def _uuid(rng: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def generate_users(rng: random.Random, count: int, start: datetime) -> list[tuple[uuid.UUID, str, datetime]]:
+    users = []
+    for i in range(count):
+        created_at = start + timedelta(seconds=rng.randrange(0, 365 * 24 * 3600))
+        users.append((_uuid(rng), f"user{i}@{EMAIL_DOMAIN}", created_at))
+    return users
+
+
+def assign_key_owners(
+    rng: random.Random,
+    user_ids: list[uuid.UUID],
+    keys: int,
+    skew: float,
+    heavy_users: int,
+    heavy_keys: int,
+) -> Iterator[uuid.UUID]:
+    """Yield the owner of each key.
+
+    The first `heavy_users` users get `heavy_keys` keys each; the rest is spread
+    over all users, uniformly (skew=0) or following a Zipf law of exponent `skew`.
+    """
+    heavy = user_ids[:heavy_users]
+    heavy_total = min(keys, heavy_keys * len(heavy))
+    for index in range(heavy_total):
+        yield heavy[index // heavy_keys]
+
+    remaining = keys - heavy_total
+    if remaining <= 0:
+        return
+    if skew <= 0:
+        for _ in range(remaining):
+            yield user_ids[rng.randrange(len(user_ids))]
+        return
+
+    cum_weights = list(itertools.accumulate(1 / (rank ** skew) for rank in range(1, len(user_ids) + 1)))
+    # Tirage par paquets pour limiter la mémoire
+    while remaining > 0:
+        n = min(remaining, 100_000)
+        yield from rng.choices(user_ids, cum_weights=cum_weights, k=n)
+        remaining -= n
+
+
+def random_secret(rng: random.Random) -> str:
+    alphabet = string.ascii_letters + string.digits
+    body = "".join(rng.choice(alphabet) for _ in range(40))
+    return rng.choice(KEY_PREFIXES) + body
+
+
+def key_batches(
+    rng: random.Random,
+    owners: Iterator[uuid.UUID],
+    batch_size: int,
+    start: datetime,
+) -> Iterator[tuple[list[tuple], list[str]]]:
+    """Yield (rows without ciphertext, plaintexts) batches"""
+    from app.routes.apikeys import get_api_key_parts
+
+    counter = itertools.count()
+    while True:
+        chunk = list(itertools.islice(owners, batch_size))
+        if not chunk:
+            return
+        rows, plaintexts = [], []
+        for user_id in chunk:
+            i = next(counter)
+            provider = rng.choices(PROVIDERS, weights=PROVIDER_WEIGHTS)[0]
+            plaintext = random_secret(rng)
+            prefix, last4 = get_api_key_parts(plaintext)
+            config = None
+            if provider == "SUPABASE":
+                ref = "".join(rng.choice(string.ascii_lowercase) for _ in range(20))
+                config = json.dumps({
+                    "url": f"https://{ref}.supabase.co",
+                    "anonKey": random_secret(rng),
+                    "serviceRoleKey": random_secret(rng),
+                })
+            created_at = start + timedelta(seconds=rng.randrange(0, 365 * 24 * 3600))
+            rows.append((
+                _uuid(rng), user_id, f"key {i}", provider, config, prefix, last4,
+                hashlib.sha256(plaintext.encode()).hexdigest(), rng.random() < 0.1, created_at,
+            ))
+            plaintexts.append(plaintext)
+        yield rows, plaintexts
+
+
+# ---------------------------------------------------------------------------
+# Écriture
+# ---------------------------------------------------------------------------
+
+def copy_rows(cursor, table: str, columns: tuple[str, ...], rows) -> int:
+    count = 0
+    with cursor.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as copy:
+        for row in rows:
+            copy.write_row(row)
+            count += 1
+    return count
+
+
+def _split(items: list, parts: int) -> list[list]:
+    size = max(1, -(-len(items) // parts))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate a synthetic vault-api dataset with COPY")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--keys", type=int, default=100_000, help="Total number of API keys")
+    parser.add_argument("--invoices-per-user", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skew", type=float, default=0.0, help="Zipf exponent for keys per user (0 = uniform)")
+    parser.add_argument("--heavy-users", type=int, default=0, help="Users receiving --heavy-keys keys each")
+    parser.add_argument("--heavy-keys", type=int, default=0)
+    parser.add_argument("--pro-ratio", type=float, default=0.1, help="Share of PRO profiles")
+    parser.add_argument("--password", default="Bench123456!", help="Password shared by all generated users")
+    parser.add_argument("--batch-size", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Encryption processes")
+    parser.add_argument("--database-url", default=None, help="Defaults to DATABASE_URL")
+    parser.add_argument("--truncate", action="store_true", help="Delete previously generated users first")
+    args = parser.parse_args(argv)
+
+    from sqlalchemy import create_engine
+    from app.core.config import settings
+    from app.core.security import get_password_hash
+
+    engine = create_engine(args.database_url or settings.DATABASE_URL)
+    rng = random.Random(args.seed)
+    start = datetime(2025, 1, 1)
+    now = datetime.utcnow()
+    started = time.perf_counter()
+
+    password_hash = get_password_hash(args.password)
+    users = generate_users(rng, args.users, start)
+    user_ids = [user_id for user_id, _, _ in users]
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+
+        if args.truncate:
+            # Les profils, clés et factures suivent par ON DELETE CASCADE
+            cursor.execute(
+                "DELETE FROM public.user_profiles WHERE id IN "
+                "(SELECT id FROM auth.users WHERE email LIKE %s)",
+                (f"%@{EMAIL_DOMAIN}",),
+            )
+            cursor.execute("DELETE FROM auth.users WHERE email LIKE %s", (f"%@{EMAIL_DOMAIN}",))
+
+        n = copy_rows(cursor, "auth.users", USER_COLUMNS, (
+            (INSTANCE_ID, user_id, "authenticated", "authenticated", email, password_hash, created_at, created_at, now)
+            for user_id, email, created_at in users
+        ))
+        print(f"auth.users      {n:>10} rows")
+
+        n = copy_rows(cursor, "public.user_profiles", PROFILE_COLUMNS, (
+            (user_id, "PRO" if rng.random() < args.pro_ratio else "FREE", created_at, now)
+            for user_id, _, created_at in users
+        ))
+        print(f"user_profiles   {n:>10} rows")
+
+        owners = assign_key_owners(rng, user_ids, args.keys, args.skew, args.heavy_users, args.heavy_keys)
+        batches = key_batches(rng, owners, args.batch_size, start)
+
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as pool:
+            def encrypted_rows():
+                # Le lot suivant est chiffré par le pool pendant que le lot courant est écrit
+                pending = None
+                for rows, plaintexts in itertools.chain(batches, [(None, None)]):
+                    submitted = None
+                    if rows is not None:
+                        parts = _split(plaintexts, args.workers)
+                        submitted = (rows, [pool.submit(_encrypt_batch, part) for part in parts])
+                    if pending is not None:
+                        done_rows, futures = pending
+                        encrypted = [item for future in futures for item in future.result()]
+                        for row, (ciphertext, nonce) in zip(done_rows, encrypted):
+                            key_id, user_id, name, provider, config, prefix, last4, key_hash, revoked, created_at = row
+                            yield (
+                                key_id, user_id, name, provider, config, prefix, last4,
+                                ciphertext, nonce, key_hash, revoked, created_at, now,
+                            )
+                    pending = submitted
+
+            n = copy_rows(cursor, "public.api_keys", KEY_COLUMNS, encrypted_rows())
+        print(f"api_keys        {n:>10} rows")
+
+        # Compteur de quota (user_profiles.active_key_count), en une seule requête ensembliste
+        cursor.execute(
+            """
+            UPDATE public.user_profiles p SET active_key_count = c.total
+            FROM (
+                SELECT k.user_id, COUNT(*) AS total
+                FROM public.api_keys k JOIN auth.users u ON u.id = k.user_id
+                WHERE NOT k.revoked AND u.email LIKE %s
+                GROUP BY k.user_id
+            ) c
+            WHERE c.user_id = p.id
+            """,
+            (f"%@{EMAIL_DOMAIN}",),
+        )
+
+        def invoices():
+            for user_id, _, created_at in users:
+                for month in range(args.invoices_per_user):
+                    period_start = created_at + timedelta(days=30 * month)
+                    yield (
+                        _uuid(rng), user_id, f"in_{rng.getrandbits(96):024x}", rng.choice((900, 1900, 4900)),
+                        "usd", rng.choice(INVOICE_STATUSES), "Vault API Pro", period_start,
+                        period_start + timedelta(days=30), period_start, now,
+                    )
+
+        n = copy_rows(cursor, "public.invoices", INVOICE_COLUMNS, invoices())
+        print(f"invoices        {n:>10} rows")
+
+        raw.commit()
+        cursor.execute("ANALYZE auth.users, public.user_profiles, public.api_keys, public.invoices")
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+    print(f"Done in {time.perf_counter() - started:.1f}s (seed={args.seed})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
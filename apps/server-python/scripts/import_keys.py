@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Import en masse de clés API existantes dans le vault d'un utilisateur
+
+Même traitement que POST /api/keys/import, sans limite de lignes : chiffrement
+réparti sur plusieurs processus (--workers), COPY dans une table temporaire puis
+fusion ensembliste, un résultat par ligne (imported, duplicate, invalid).
+
+Exemples:
+    python scripts/import_keys.py keys.csv --email alice@example.com
+    python scripts/import_keys.py keys.csv --user-id 3f0c... --workers 8 --report report.json
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Import existing API keys from a CSV file (name,value[,provider,expires_at])")
+    parser.add_argument("input", type=Path, help="CSV file")
+    owner = parser.add_mutually_exclusive_group(required=True)
+    owner.add_argument("--user-id", help="Owner of the imported keys")
+    owner.add_argument("--email", help="Owner of the imported keys, looked up in auth.users")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Encryption processes")
+    parser.add_argument("--ignore-quota", action="store_true", help="Do not enforce the plan's active key cap")
+    parser.add_argument("--report", type=Path, default=None, help="Write per-row results as JSON")
+    args = parser.parse_args(argv)
+
+    from sqlalchemy import text
+    from app.core.database import SessionLocal
+    from app.core.plans import limits_for
+    from app.models.user import UserProfile
+    from app.services import key_import
+
+    with SessionLocal() as db:
+        user_id = args.user_id
+        if args.email:
+            user_id = db.execute(
+                text("SELECT id FROM auth.users WHERE email = :email"), {"email": args.email.lower()}
+            ).scalar()
+        profile = db.get(UserProfile, user_id) if user_id else None
+        if profile is None:
+            print("Error: user not found", file=sys.stderr)
+            return 2
+
+        max_active_keys = None if args.ignore_quota else limits_for(profile.plan).max_api_keys
+        try:
+            with args.input.open(encoding="utf-8-sig", newline="") as lines, \
+                    ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+                report = key_import.import_keys(
+                    db, profile.id, key_import.read_rows(lines), executor=pool, max_active_keys=max_active_keys
+                )
+        except (key_import.KeyImportError, key_import.KeyQuotaExceeded) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+
+    summary = report.to_dict()
+    if args.report:
+        args.report.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    print(f"{summary['total']} rows in {summary['elapsed_seconds']}s: "
+          f"imported={summary['imported']} duplicate={summary['duplicate']} invalid={summary['invalid']}")
+    for result in summary["results"]:
+        if result["status"] != "imported":
+            print(f"  line {result['line']}: {result['name']} {result['status']}: {result['error']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Provisionnement en masse de comptes (API Admin Supabase + user_profiles)
+
+Même traitement que POST /api/admin/users/bulk, sans limite de lignes :
+appels Supabase parallèles (--concurrency) avec reprises, profils insérés
+par lots, un résultat par ligne.
+
+Exemples:
+    python scripts/provision_users.py users.csv
+    python scripts/provision_users.py users.ndjson --concurrency 16 --report report.json
+"""
+
+from pathlib import Path
+from typing import Optional
+import argparse
+import json
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    from app.core.config import settings
+
+    parser = argparse.ArgumentParser(description="Create users in bulk through the Supabase Admin API")
+    parser.add_argument("input", type=Path, help="CSV (email[,password,name,plan]) or NDJSON file")
+    parser.add_argument("--format", choices=("csv", "ndjson"), default=None, help="Defaults to the file extension")
+    parser.add_argument("--concurrency", type=int, default=settings.PROVISIONING_CONCURRENCY)
+    parser.add_argument("--retries", type=int, default=settings.PROVISIONING_RETRIES)
+    parser.add_argument("--batch-size", type=int, default=500, help="Profiles inserted per statement")
+    parser.add_argument("--report", type=Path, default=None, help="Write per-row results as JSON")
+    args = parser.parse_args(argv)
+
+    from app.core.database import SessionLocal
+    from app.services.provisioning import ProvisioningError, parse_users, provision_users
+
+    fmt = args.format or ("ndjson" if args.input.suffix.lower() in (".ndjson", ".jsonl") else "csv")
+    try:
+        rows = parse_users(args.input.read_text(encoding="utf-8-sig"), fmt)
+        report = provision_users(
+            rows, SessionLocal, concurrency=args.concurrency, retries=args.retries, batch_size=args.batch_size
+        )
+    except ProvisioningError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    summary = report.to_dict()
+    if args.report:
+        args.report.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    print(f"{summary['total']} rows in {summary['elapsed_seconds']}s: "
+          f"created={summary['created']} exists={summary['exists']} "
+          f"invalid={summary['invalid']} error={summary['error']}")
+    for result in summary["results"]:
+        if result["status"] in ("invalid", "error"):
+            print(f"  line {result['line']}: {result['email']} {result['status']}: {result['error']}")
+    return 1 if summary["error"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -18,7 +18,7 @@ CREATE TABLE IF NOT EXISTS public.api_keys (
     user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
     name VARCHAR(255) NOT NULL,
     provider provider_type NOT NULL DEFAULT 'CUSTOM',
-    provider_config TEXT, -- JSON string pour configuration Supabase
+    provider_config JSONB, -- Configuration Supabase (url, anonKey, serviceRoleKey)
     prefix VARCHAR(10) NOT NULL, -- Préfixe de la clé (ex: "vk_")
     last4 VARCHAR(4) NOT NULL, -- 4 derniers caractères
     enc_ciphertext BYTEA NOT NULL, -- Clé API chiffrée
@@ -32,7 +32,8 @@ CREATE TABLE IF NOT EXISTS public.api_keys (
 -- Index pour les performances
 CREATE INDEX IF NOT EXISTS idx_api_keys_user_id ON public.api_keys(user_id);
 CREATE INDEX IF NOT EXISTS idx_api_keys_hash ON public.api_keys(hash);
-CREATE INDEX IF NOT EXISTS idx_api_keys_revoked ON public.api_keys(revoked);
+CREATE INDEX IF NOT EXISTS idx_api_keys_user_active ON public.api_keys(user_id) WHERE NOT revoked;
+CREATE INDEX IF NOT EXISTS idx_api_keys_provider_config ON public.api_keys USING GIN (provider_config jsonb_path_ops) WHERE NOT revoked;
 
 -- Trigger pour mettre à jour updated_at automatiquement
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -0,0 +1,25 @@
+"""Appel direct d'une application ASGI, sans client HTTP (httpx n'est pas une dépendance)"""
+
+import asyncio
+
+
+def call(app, path: str, method: str = "GET", headers: list[tuple[bytes, bytes]] = ()) -> tuple[int, dict, bytes]:
+    """Run one request through `app`; return (status, response headers, body)"""
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": list(headers), "client": ("127.0.0.1", 1), "server": ("test", 80),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start = next(m for m in messages if m["type"] == "http.response.start")
+    body = b"".join(m.get("body", b"") for m in messages if m["type"] == "http.response.body")
+    return start["status"], {k.decode(): v.decode() for k, v in start.get("headers", [])}, body
@@ -0,0 +1,8 @@
+class Clock:
+    """Manual clock for code that takes a `clock` callable (advance with `clock.now += ...`)"""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
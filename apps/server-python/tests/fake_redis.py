@@ -0,0 +1,79 @@
+"""
+Faux client Redis en mémoire pour les tests
+
+Implémente uniquement ce qu'utilise app.core.rate_limit.RedisBackend :
+MGET, SET (nx, ex), INCR et les pipelines. L'horloge est injectable pour
+simuler l'expiration des clés.
+"""
+
+import time
+
+
+class FakeRedis:
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.data: dict[str, tuple[bytes, float | None]] = {}
+        self.commands = 0
+        self.fail = False
+
+    def _get(self, key: str):
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and expires <= self.clock():
+            del self.data[key]
+            return None
+        return value
+
+    def _call(self):
+        self.commands += 1
+        if self.fail:
+            raise ConnectionError("fake redis is down")
+
+    def mget(self, keys):
+        self._call()
+        return [self._get(key) for key in keys]
+
+    def set(self, key, value, ex=None, nx=False):
+        self._call()
+        if nx and self._get(key) is not None:
+            return None
+        self.data[key] = (str(value).encode(), self.clock() + ex if ex is not None else None)
+        return True
+
+    def incr(self, key):
+        self._call()
+        current = self._get(key)
+        value = int(current or 0) + 1
+        expires = self.data[key][1] if current is not None else None
+        self.data[key] = (str(value).encode(), expires)
+        return value
+
+    def ttl(self, key):
+        entry = self.data.get(key)
+        if entry is None or self._get(key) is None:
+            return -2
+        return -1 if entry[1] is None else entry[1] - self.clock()
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client: FakeRedis):
+        self.client = client
+        self.queued = []
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+
+        def queue(*args, **kwargs):
+            self.queued.append((method, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        results = [method(*args, **kwargs) for method, args, kwargs in self.queued]
+        self.queued = []
+        return results
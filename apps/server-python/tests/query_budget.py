@@ -0,0 +1,24 @@
+"""
+Helper de test : échoue si un bloc exécute plus de requêtes SQL que prévu
+
+    with assert_max_queries(1):
+        apikeys.list_api_keys(user, db)
+
+Sert à détecter les régressions N+1 dans app/routes.
+"""
+
+from contextlib import contextmanager
+from typing import Iterator
+
+from app.core.profiling import RequestProfile, profile_scope
+
+
+@contextmanager
+def assert_max_queries(max_queries: int) -> Iterator[RequestProfile]:
+    with profile_scope() as profile:
+        yield profile
+    if profile.query_count > max_queries:
+        statements = "\n".join(f"  {i + 1}. {q.strip()}" for i, q in enumerate(profile.queries))
+        raise AssertionError(
+            f"Expected at most {max_queries} queries, got {profile.query_count}:\n{statements}"
+        )
@@ -0,0 +1,259 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from starlette.requests import Request
+
+from app.core.audit import (
+    KEY_CREATED, KEY_IMPORTED, KEY_REVEALED, AuditBufferFull, AuditEvent, AuditLog, InvalidCursor, fetch_events,
+)
+from app.core.config import settings
+from app.core.database import get_db
+from app.models.audit import AuditLogEntry
+from app.routes import admin, apikeys
+from app.schemas.apikey import ApiKeyCreate
+from app.services import key_import
+from tests.asgi import call
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    AuditLogEntry.__table__.create(engine)
+    yield engine
+    engine.dispose()
+
+
+def event(user_id, minutes: int) -> AuditEvent:
+    return AuditEvent(
+        KEY_REVEALED, user_id, uuid.uuid4(), ip="10.0.0.1",
+        occurred_at=datetime(2024, 5, 1, tzinfo=timezone.utc) + timedelta(minutes=minutes),
+    )
+
+
+def test_queue_is_bounded_and_written_in_batches(engine):
+    log = AuditLog(engine, max_pending=3, batch_size=2)
+    user_id = uuid.uuid4()
+    for minute in range(3):
+        log.record(event(user_id, minute))
+    with pytest.raises(AuditBufferFull):
+        log.record(event(user_id, 3))
+
+    assert log.flush() == 3
+    assert len(log) == 0
+    with sessionmaker(bind=engine)() as db:
+        assert db.query(AuditLogEntry).count() == 3
+
+
+def test_failed_batch_goes_back_to_the_front(engine):
+    log = AuditLog(engine, max_pending=10, batch_size=5)
+    user_id = uuid.uuid4()
+    first, second = event(user_id, 0), event(user_id, 1)
+    log.record(first)
+    log.record(second)
+
+    def database_down(events):
+        raise RuntimeError("database down")
+
+    log._write = database_down
+    assert log.flush() == 0
+    assert list(log._queue) == [first, second]
+
+
+def test_client_supplied_values_are_cut_to_the_column_size():
+    oversized = AuditEvent(KEY_REVEALED, uuid.uuid4(), request_id="r" * 128, ip="1" * 100)
+    assert len(oversized.request_id) == 64 and len(oversized.ip) == 64
+
+
+def test_rejected_batch_dead_letters_only_the_bad_events(engine):
+    log = AuditLog(engine, max_pending=10, batch_size=5)
+    user_id = uuid.uuid4()
+    good, bad, later = event(user_id, 0), event(user_id, 1), event(user_id, 2)
+    for queued_event in (good, bad, later):
+        log.record(queued_event)
+    real_write = log._write
+
+    def write(events):
+        if bad in events:
+            raise DataError("COPY", None, Exception("value too long for type character varying(64)"))
+        real_write(events)
+
+    log._write = write
+    assert log.flush() == 2
+    assert len(log) == 0
+    with sessionmaker(bind=engine)() as db:
+        assert db.query(AuditLogEntry).count() == 2
+
+
+def test_pages_follow_the_cursor_newest_first(engine):
+    log = AuditLog(engine, batch_size=100)
+    user_id, other = uuid.uuid4(), uuid.uuid4()
+    for minute in range(5):
+        log.record(event(user_id, minute))
+    log.record(event(other, 2))
+    log.flush()
+
+    with sessionmaker(bind=engine)() as db:
+        page, cursor = fetch_events(db, user_id, limit=2)
+        assert [e["occurred_at"].minute for e in page] == [4, 3]
+        page, cursor = fetch_events(db, user_id, limit=2, cursor=cursor)
+        assert [e["occurred_at"].minute for e in page] == [2, 1]
+        page, cursor = fetch_events(db, user_id, limit=2, cursor=cursor)
+        assert [e["occurred_at"].minute for e in page] == [0] and cursor is None
+
+        since = datetime(2024, 5, 1, 0, 1)
+        until = datetime(2024, 5, 1, 0, 3)
+        page, _ = fetch_events(db, user_id, since=since, until=until)
+        assert [e["occurred_at"].minute for e in page] == [2, 1]
+
+        with pytest.raises(InvalidCursor):
+            fetch_events(db, user_id, cursor="not-a-cursor")
+
+
+@pytest.fixture
+def queued(monkeypatch):
+    """Audit queue of the routes, inspected by the test"""
+    log = AuditLog(max_pending=10)
+    monkeypatch.setattr(apikeys, "audit_log", log)
+    return log._queue
+
+
+def test_admin_audit_pages_and_streams_through_the_session_dependency(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    AuditLogEntry.__table__.create(engine)
+    log = AuditLog(engine, batch_size=100)
+    user_id = uuid.uuid4()
+    for minute in range(3):
+        log.record(event(user_id, minute))
+    log.flush()
+
+    sessions = []
+
+    def test_db():
+        db = sessionmaker(bind=engine)()
+        sessions.append(db)
+        yield db
+
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "admin-secret")
+    app = FastAPI()
+    app.include_router(admin.router)
+    app.dependency_overrides[get_db] = test_db
+    headers = [(b"x-admin-token", b"admin-secret")]
+
+    status, _, body = call(app, f"/admin/audit?user_id={user_id}&limit=2", headers=headers)
+    assert status == 200
+    page = json.loads(body)
+    assert len(page["events"]) == 2 and page["next_cursor"]
+
+    status, _, body = call(app, f"/admin/audit?user_id={user_id}&limit=2&stream=true", headers=headers)
+    assert status == 200
+    assert len(body.decode().splitlines()) == 3
+    assert len(sessions) == 2
+    engine.dispose()
+
+
+def test_full_audit_queue_rejects_the_operation(monkeypatch, db, user):
+    monkeypatch.setattr(apikeys, "audit_log", AuditLog(max_pending=0))
+
+    with pytest.raises(HTTPException) as exc:
+        apikeys.create_api_key(ApiKeyCreate(name="k", provider="CUSTOM", value="sk-full-queue"), user, db)
+    assert exc.value.status_code == 503
+    assert exc.value.headers["Retry-After"] == "1"
+    assert db.query(apikeys.ApiKey).count() == 0
+
+
+def test_event_is_queued_only_once_the_operation_is_committed(queued, db, user):
+    created = apikeys.create_api_key(ApiKeyCreate(name="k", provider="CUSTOM", value="sk-same-value"), user, db)
+    assert [(e.action, str(e.api_key_id)) for e in queued] == [(KEY_CREATED, created["id"])]
+
+    # Même hash : le commit échoue, aucune trace de la création
+    with pytest.raises(IntegrityError):
+        apikeys.create_api_key(ApiKeyCreate(name="k2", provider="CUSTOM", value="sk-same-value"), user, db)
+    assert len(queued) == 1
+
+
+def upload(body: bytes) -> Request:
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return Request({"type": "http", "method": "POST", "path": "/api/keys/import", "headers": []}, receive)
+
+
+def test_import_records_the_imported_count_after_success(queued, monkeypatch, db, user):
+    report = key_import.ImportReport(results=[
+        key_import.ImportResult(2, "a", key_import.IMPORTED, id=str(uuid.uuid4())),
+        key_import.ImportResult(3, "b", key_import.DUPLICATE, error="Duplicate key"),
+    ])
+    monkeypatch.setattr(key_import, "import_keys", lambda *args, **kwargs: report)
+
+    asyncio.run(apikeys.import_api_keys(upload(b"name,value\na,sk-a\nb,sk-b\n"), user, db))
+
+    assert [(e.action, e.details) for e in queued] == [(KEY_IMPORTED, {"rows": 2, "imported": 1})]
+
+
+def test_import_rejected_by_the_quota_leaves_no_event(queued, monkeypatch, db, user):
+    def over_quota(*args, **kwargs):
+        raise key_import.KeyQuotaExceeded("Plan limit reached")
+
+    monkeypatch.setattr(key_import, "import_keys", over_quota)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(apikeys.import_api_keys(upload(b"name,value\na,sk-a\n"), user, db))
+    assert exc.value.status_code == 403
+    assert len(queued) == 0
+
+
+def test_missing_partition_is_rebuilt_from_the_default_partition(pg_engine):
+    with pg_engine.connect() as conn:
+        transaction = conn.begin()
+        try:
+            # Six mois plus loin que les partitions créées par la migration : la ligne tombe dans DEFAULT
+            month = conn.execute(text(
+                "SELECT date_trunc('month', NOW() AT TIME ZONE 'UTC') + INTERVAL '6 months'"
+            )).scalar()
+            partition = f"audit_log_{month:%Y_%m}"
+            conn.execute(text(f"DROP TABLE IF EXISTS public.{partition}"))
+            conn.execute(text("""
+                INSERT INTO public.audit_log (occurred_at, user_id, action)
+                VALUES (CAST(:month AS timestamp) AT TIME ZONE 'UTC' + INTERVAL '1 day', :user_id, 'key.revealed')
+            """), {"month": month, "user_id": uuid.uuid4()})
+
+            assert conn.execute(text("SELECT public.ensure_audit_log_partitions(6)")).scalar() >= 1
+
+            locations = conn.execute(text("""
+                SELECT tableoid::regclass::text FROM public.audit_log
+                WHERE occurred_at >= CAST(:month AS timestamp) AT TIME ZONE 'UTC'
+            """), {"month": month}).scalars().all()
+            assert [location.split(".")[-1] for location in locations] == [partition]
+        finally:
+            transaction.rollback()
+
+
+
+def test_oversized_request_id_does_not_block_the_queue_on_postgres(pg_engine):
+    log = AuditLog(pg_engine, max_pending=10, batch_size=10)
+    user_id = uuid.uuid4()
+    truncated = AuditEvent(KEY_REVEALED, user_id, request_id="t" * 128)
+    # Contourne la troncature : la valeur arrive telle quelle jusqu'au COPY
+    too_long = AuditEvent(KEY_REVEALED, user_id)
+    too_long.request_id = "x" * 100
+    log.record(truncated)
+    log.record(too_long)
+    try:
+        assert log.flush() == 1
+        assert len(log) == 0
+        with pg_engine.connect() as conn:
+            stored = conn.execute(
+                text("SELECT request_id FROM public.audit_log WHERE user_id = :id"), {"id": user_id}
+            ).scalars().all()
+        assert stored == ["t" * 64]
+    finally:
+        with pg_engine.begin() as conn:
+            conn.execute(text("DELETE FROM public.audit_log WHERE user_id = :id"), {"id": user_id})
@@ -0,0 +1,89 @@
+import pytest
+
+from app.core import supabase
+from app.core.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, build_breakers
+from tests.clock import Clock
+
+
+def breaker(clock: Clock, **options) -> CircuitBreaker:
+    defaults = dict(failure_rate=0.5, min_calls=4, window_seconds=10, open_seconds=5, half_open_probes=2)
+    defaults.update(options)
+    return CircuitBreaker("test", clock=clock, **defaults)
+
+
+def test_opens_on_failure_rate_once_min_calls_reached():
+    b = breaker(Clock(1000.0))
+    for success in (False, False, True):
+        assert b.allow()
+        b.record(success)
+    # 2 échecs sur 3 appels : sous le minimum d'appels, le circuit reste fermé
+    assert b.state == CLOSED
+
+    assert b.allow()
+    b.record(True)
+    # 2 échecs sur 4 appels : taux de 0.5 atteint
+    assert b.state == OPEN
+    assert not b.allow()
+
+
+def test_old_failures_leave_the_window():
+    clock = Clock(1000.0)
+    b = breaker(clock)
+    for _ in range(3):
+        b.allow()
+        b.record(False)
+    clock.now += 11
+    assert b.counts() == (0, 0)
+    for _ in range(3):
+        b.allow()
+        b.record(True)
+    b.allow()
+    b.record(False)
+    assert b.state == CLOSED
+
+
+def test_half_open_probes_close_or_reopen_the_circuit():
+    clock = Clock(1000.0)
+    b = breaker(clock, min_calls=1, failure_rate=1.0)
+    b.allow()
+    b.record(False)
+    assert b.state == OPEN
+
+    clock.now += 5
+    assert b.allow() and b.state == HALF_OPEN
+    assert b.allow()
+    # Les appels de test sont tous en cours : les autres échouent immédiatement
+    assert not b.allow()
+    b.record(True)
+    b.record(False)
+    assert b.state == OPEN and not b.allow()
+
+    clock.now += 5
+    for _ in range(2):
+        assert b.allow()
+        b.record(True)
+    assert b.state == CLOSED
+    assert b.counts() == (0, 0)
+
+
+def test_supabase_request_fails_fast_per_endpoint(monkeypatch):
+    breakers = build_breakers(clock=Clock(1000.0))
+    monkeypatch.setattr(supabase, "supabase_breakers", breakers)
+    calls = []
+
+    def slow_timeout(method, url, **kwargs):
+        calls.append(url)
+        raise supabase.requests.Timeout("timed out")
+
+    monkeypatch.setattr(supabase.requests, "request", slow_timeout)
+
+    for _ in range(breakers.options["min_calls"]):
+        with pytest.raises(supabase.requests.Timeout):
+            supabase._request("sign_in_with_password", "POST", "http://supabase.invalid/auth/v1/token")
+    with pytest.raises(CircuitOpenError):
+        supabase._request("sign_in_with_password", "POST", "http://supabase.invalid/auth/v1/token")
+
+    assert len(calls) == breakers.options["min_calls"]
+    assert breakers.states() == {("sign_in_with_password",): 1}
+    # Les autres endpoints ont leur propre état
+    assert breakers.get("send_recovery_email").allow()
@@ -0,0 +1,35 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.models.apikey import ApiKey
+from app.routes import apikeys
+from app.schemas.apikey import ApiKeyCreate
+
+
+def test_expires_at_is_stored_as_naive_utc():
+    data = ApiKeyCreate(name="k", expires_at="2030-01-01T12:00:00+02:00")
+    assert data.expires_at == datetime(2030, 1, 1, 10, 0)
+
+
+def test_past_expiry_is_rejected(db, user):
+    with pytest.raises(HTTPException) as exc:
+        apikeys.create_api_key(ApiKeyCreate(name="k", expires_at=datetime.utcnow() - timedelta(minutes=1)), user, db)
+    assert exc.value.status_code == 400
+
+
+def test_reveal_refuses_expired_key_without_sweeper(db, user):
+    expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+    created = apikeys.create_api_key(ApiKeyCreate(name="k", expires_at=expires_at), user, db)
+    key_id = uuid.UUID(created["id"])
+    assert apikeys.reveal_api_key(key_id, user, db)["api_key"] == created["api_key"]
+
+    key = db.get(ApiKey, key_id)
+    key.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+
+    with pytest.raises(HTTPException) as exc:
+        apikeys.reveal_api_key(key_id, user, db)
+    assert exc.value.status_code == 410
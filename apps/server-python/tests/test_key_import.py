@@ -0,0 +1,148 @@
+import asyncio
+import hashlib
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.security import crypto_manager
+from app.services import key_import
+
+CSV = (
+    "name,value,provider,expires_at\n"
+    "openai,sk-proj_abcdef123456,CUSTOM,\n"
+    "mistral,mistral_0123456789,ia,2999-01-01T00:00:00Z\n"
+    "missing,,CUSTOM,\n"
+    "supabase,sb_123456789,SUPABASE,\n"
+    "old,sk_abcdef987654,CUSTOM,2000-01-01\n"
+)
+
+
+async def _chunks(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def test_upload_is_split_into_lines_across_chunks():
+    lines = asyncio.run(key_import.read_upload_lines(_chunks(CSV.encode(), 7), max_lines=10))
+    assert "".join(lines) == CSV
+    assert len(lines) == 6
+
+    with pytest.raises(key_import.UploadTooLarge):
+        asyncio.run(key_import.read_upload_lines(_chunks(CSV.encode(), 7), max_lines=3))
+
+
+def test_rows_are_validated_and_described_like_created_keys():
+    prepared, invalid = key_import.prepare(key_import.read_rows(CSV.splitlines(keepends=True)), now=datetime(2025, 1, 1))
+
+    assert [row.name for row in prepared] == ["openai", "mistral"]
+    assert prepared[0].hash == hashlib.sha256(b"sk-proj_abcdef123456").hexdigest()
+    assert prepared[1].provider == "IA"
+    assert prepared[1].expires_at == datetime(2999, 1, 1)
+    assert {result.line: result.error for result in invalid} == {
+        4: "Missing value",
+        5: "Invalid provider 'SUPABASE' (expected CUSTOM or IA)",
+        6: "expires_at must be in the future",
+    }
+
+
+def test_header_must_name_the_required_columns():
+    with pytest.raises(key_import.KeyImportError):
+        list(key_import.read_rows(["label,secret\n", "a,b\n"]))
+
+
+def test_parallel_encryption_keeps_row_order():
+    rows, _ = key_import.prepare(key_import.read_rows(
+        ["name,value\n"] + [f"k{i},secret-value-{i:04d}\n" for i in range(50)]
+    ))
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        encrypted = key_import.encrypt_rows(rows, pool, chunk_size=7)
+
+    assert [crypto_manager.decrypt(c, n) for c, n in encrypted] == [row.value for row in rows]
+
+
+# Fusion réelle (COPY + requête ensembliste) sur Postgres, dans une transaction annulée à la fin ;
+# les commit / rollback de import_keys portent sur des points de sauvegarde
+
+
+@pytest.fixture
+def pg_session(pg_engine):
+    with pg_engine.connect() as conn:
+        transaction = conn.begin()
+        session = Session(bind=conn, join_transaction_mode="create_savepoint")
+        yield session
+        session.close()
+        transaction.rollback()
+
+
+def add_profile(db, active_key_count=0) -> uuid.UUID:
+    user_id = uuid.uuid4()
+    db.execute(text("""
+        INSERT INTO public.user_profiles (id, plan, active_key_count, created_at, updated_at)
+        VALUES (:id, 'FREE', :count, NOW(), NOW())
+    """), {"id": user_id, "count": active_key_count})
+    return user_id
+
+
+def stored_keys(db, user_id) -> list:
+    return db.execute(text("""
+        SELECT name, hash, enc_ciphertext, enc_nonce FROM public.api_keys WHERE user_id = :id ORDER BY name
+    """), {"id": user_id}).all()
+
+
+def active_key_count(db, user_id) -> int:
+    return db.execute(text("SELECT active_key_count FROM public.user_profiles WHERE id = :id"), {"id": user_id}).scalar()
+
+
+def import_csv(db, user_id, lines, max_active_keys=None):
+    return key_import.import_keys(db, user_id, key_import.read_rows(lines), max_active_keys=max_active_keys)
+
+
+def test_merge_imports_new_keys_and_reports_duplicates(pg_session):
+    owner = add_profile(pg_session, active_key_count=1)
+    other = add_profile(pg_session, active_key_count=1)
+    # Clé d'un autre compte : doublon, sans révéler qui la détient
+    # (insérée directement : la table de travail de l'import ne disparaît qu'au vrai commit)
+    pg_session.execute(text("""
+        INSERT INTO public.api_keys (
+            id, user_id, name, provider, prefix, last4, enc_ciphertext, enc_nonce, hash, revoked, created_at, updated_at
+        ) VALUES (:id, :user_id, 'theirs', 'CUSTOM', 'sk-', 'alue', '\\x00'::bytea, '\\x00'::bytea, :hash, false,
+                  NOW(), NOW())
+    """), {"id": uuid.uuid4(), "user_id": other, "hash": hashlib.sha256(b"sk-shared-value").hexdigest()})
+
+    report = import_csv(pg_session, owner, [
+        "name,value\n",
+        "first,sk-new-value-1\n",
+        "again,sk-new-value-1\n",
+        "shared,sk-shared-value\n",
+        "empty,\n",
+    ])
+
+    assert {(r.line, r.status, r.error) for r in report.results} == {
+        (2, key_import.IMPORTED, None),
+        (3, key_import.DUPLICATE, "Same key earlier in the file"),
+        (4, key_import.DUPLICATE, "Duplicate key"),
+        (5, key_import.INVALID, "Missing value"),
+    }
+    [stored] = stored_keys(pg_session, owner)
+    assert stored.name == "first"
+    assert stored.hash == hashlib.sha256(b"sk-new-value-1").hexdigest()
+    assert crypto_manager.decrypt(stored.enc_ciphertext, stored.enc_nonce) == "sk-new-value-1"
+    # Une seule place prise, en plus de la clé déjà comptée
+    assert active_key_count(pg_session, owner) == 2
+    assert [key.name for key in stored_keys(pg_session, other)] == ["theirs"]
+    assert active_key_count(pg_session, other) == 1
+
+
+def test_import_over_the_quota_changes_nothing(pg_session):
+    owner = add_profile(pg_session, active_key_count=1)
+    pg_session.commit()  # Hors du point de sauvegarde annulé par import_keys
+
+    with pytest.raises(key_import.KeyQuotaExceeded):
+        import_csv(pg_session, owner, ["name,value\n", "a,sk-quota-value-a\n", "b,sk-quota-value-b\n"], max_active_keys=2)
+
+    assert stored_keys(pg_session, owner) == []
+    assert active_key_count(pg_session, owner) == 1
@@ -0,0 +1,105 @@
+import json
+import logging
+import queue
+import sys
+
+from fastapi import FastAPI
+
+from app.core.logging_config import (
+    LOGS_DROPPED, DroppingQueueHandler, JsonFormatter, RequestContextFilter, RequestIdMiddleware,
+    SamplingFilter, mask_email, request_id_var,
+)
+from tests.asgi import call
+
+
+def _record(msg="hello %s", args=("world",), **extra) -> logging.LogRecord:
+    record = logging.LogRecord("app.test", logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_keeps_extra_fields_and_request_id():
+    record = _record(user="u1", count=3)
+    token = request_id_var.set("req-1")
+    try:
+        RequestContextFilter().filter(record)
+    finally:
+        request_id_var.reset(token)
+
+    payload = json.loads(JsonFormatter().format(record))
+
+    assert payload["message"] == "hello world"
+    assert payload["request_id"] == "req-1"
+    assert payload["user"] == "u1" and payload["count"] == 3
+    assert "args" not in payload and "levelno" not in payload
+
+
+def test_json_formatter_includes_traceback():
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        record = logging.LogRecord("app.test", logging.ERROR, __file__, 1, "boom", (), sys.exc_info())
+    assert "ZeroDivisionError" in json.loads(JsonFormatter().format(record))["exc_info"]
+
+
+def test_full_queue_drops_records_instead_of_blocking():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    dropped = LOGS_DROPPED.value()
+
+    handler.emit(_record())
+    handler.emit(_record())
+
+    assert handler.queue.qsize() == 1
+    assert LOGS_DROPPED.value() == dropped + 1
+
+
+def test_queued_record_is_frozen_in_the_caller_thread():
+    handler = DroppingQueueHandler(queue.Queue())
+    args = ["before"]
+    handler.emit(_record("value=%s", (args,)))
+    args[0] = "after"
+
+    record = handler.queue.get_nowait()
+    assert record.getMessage() == "value=['before']"
+    assert record.args is None
+
+
+def test_sampling_only_applies_to_flagged_records():
+    never = SamplingFilter(0.0)
+    assert never.filter(_record()) is True
+    assert never.filter(_record(sample=True)) is False
+    assert SamplingFilter(1.0).filter(_record(sample=True)) is True
+
+
+def test_mask_email():
+    assert mask_email("john.doe@example.com") == "j***@example.com"
+    assert mask_email(None) == "***"
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/whoami")
+    def whoami():
+        return {"request_id": request_id_var.get()}
+
+    app.add_middleware(RequestIdMiddleware)
+    return app
+
+
+def test_request_id_is_reused_or_generated_and_echoed():
+    app = _app()
+
+    status, headers, body = call(app, "/whoami", headers=[(b"x-request-id", b"abc-123")])
+    assert status == 200
+    assert headers["x-request-id"] == "abc-123"
+    assert json.loads(body) == {"request_id": "abc-123"}
+
+    _, headers, body = call(app, "/whoami", headers=[(b"x-request-id", b"bad id\r\n")])
+    assert headers["x-request-id"] != "bad id\r\n"
+    assert json.loads(body)["request_id"] == headers["x-request-id"]
+
+    # Plus long que audit_log.request_id : remplacé
+    _, headers, _ = call(app, "/whoami", headers=[(b"x-request-id", b"a" * 65)])
+    assert headers["x-request-id"] != "a" * 65
+    assert request_id_var.get() == "-"
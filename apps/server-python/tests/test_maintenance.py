@@ -0,0 +1,271 @@
+from datetime import datetime, timedelta
+from typing import Optional
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.core import database
+from app.maintenance import JobReport, MaintenanceJob, jobs, run_job
+from app.maintenance.__main__ import build_parser
+from app.maintenance.jobs import (
+    DuplicateKeysJob, ExpireKeysJob, OrphanProfilesJob, PurgeArchivedKeysJob, RecountActiveKeysJob, sweep_expired_keys,
+)
+
+
+class DeleteEvenRows(MaintenanceJob):
+    name = "delete-even"
+
+    def estimate(self, conn):
+        return conn.execute(text("SELECT COUNT(*) FROM items WHERE n % 2 = 0")).scalar()
+
+    def sample(self, conn, limit):
+        return [dict(r._mapping) for r in conn.execute(text("SELECT n FROM items WHERE n % 2 = 0 ORDER BY n LIMIT :l"), {"l": limit})]
+
+    def run_batch(self, conn, batch_size, cursor: Optional[str]):
+        after = int(cursor) if cursor else 0
+        ids = [r[0] for r in conn.execute(
+            text("SELECT n FROM items WHERE n > :after ORDER BY n LIMIT :size"), {"after": after, "size": batch_size}
+        )]
+        deleted = conn.execute(
+            text("DELETE FROM items WHERE n % 2 = 0 AND n > :after AND n <= :last"),
+            {"after": after, "last": ids[-1] if ids else after},
+        ).rowcount
+        return deleted, str(ids[-1]) if ids else cursor, len(ids) < batch_size
+
+
+def make_engine(rows: int):
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE items (n INTEGER PRIMARY KEY)"))
+        conn.execute(text("INSERT INTO items (n) VALUES (:n)"), [{"n": n} for n in range(1, rows + 1)])
+    return engine
+
+
+def remaining(engine):
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT COUNT(*) FROM items")).scalar()
+
+
+def test_dry_run_reports_without_writing():
+    engine = make_engine(10)
+    report = run_job(DeleteEvenRows(), engine, dry_run=True, sample_size=3)
+    assert report.estimated == 5
+    assert report.sample == [{"n": 2}, {"n": 4}, {"n": 6}]
+    assert remaining(engine) == 10
+
+
+def test_batches_stop_and_resume_from_cursor():
+    engine = make_engine(25)
+    job = DeleteEvenRows()
+
+    first = run_job(job, engine, batch_size=10, max_batches=1)
+    assert (first.processed, first.batches, first.cursor, first.finished) == (5, 1, "10", False)
+    assert remaining(engine) == 20
+
+    rest = run_job(job, engine, batch_size=10, start_after=first.cursor)
+    assert rest.finished
+    assert rest.processed == 7
+    assert remaining(engine) == 13
+
+
+def test_cli_registers_the_jobs():
+    args = build_parser().parse_args(["purge-archived-keys", "--dry-run", "--older-than-days", "30"])
+    assert args.dry_run and args.older_than_days == 30 and args.batch_size == 1000
+
+
+# Tâches réelles, sur Postgres : chaque test travaille dans une transaction annulée à la fin
+
+
+@pytest.fixture
+def pg(pg_engine):
+    with pg_engine.connect() as conn:
+        transaction = conn.begin()
+        yield conn
+        transaction.rollback()
+
+
+def add_profile(conn, active_key_count=0, account=True) -> uuid.UUID:
+    user_id = uuid.uuid4()
+    if account:
+        conn.execute(text("INSERT INTO auth.users (id, email) VALUES (:id, :email)"),
+                     {"id": user_id, "email": f"{user_id}@example.com"})
+    conn.execute(text("""
+        INSERT INTO public.user_profiles (id, plan, active_key_count, created_at, updated_at)
+        VALUES (:id, 'FREE', :count, NOW(), NOW())
+    """), {"id": user_id, "count": active_key_count})
+    return user_id
+
+
+def add_key(conn, user_id, hash=None, revoked=False, age_days=0, expires_in=None) -> uuid.UUID:
+    key_id = uuid.uuid4()
+    created_at = datetime.utcnow() - timedelta(days=age_days)
+    expires_at = None if expires_in is None else datetime.utcnow() + expires_in
+    conn.execute(text("""
+        INSERT INTO public.api_keys (
+            id, user_id, name, provider, prefix, last4, enc_ciphertext, enc_nonce, hash, revoked, expires_at,
+            created_at, updated_at
+        ) VALUES (:id, :user_id, 'key', 'CUSTOM', 'vk_', 'abcd', '\\x00'::bytea, '\\x00'::bytea, :hash, :revoked,
+                  :expires_at, :created_at, :created_at)
+    """), {
+        "id": key_id, "user_id": user_id, "hash": hash or key_id.hex, "revoked": revoked, "expires_at": expires_at,
+        "created_at": created_at,
+    })
+    return key_id
+
+
+def active_key_count(conn, user_id) -> int:
+    return conn.execute(text("SELECT active_key_count FROM public.user_profiles WHERE id = :id"), {"id": user_id}).scalar()
+
+
+def key_ids(conn, user_id) -> set:
+    return set(conn.execute(text("SELECT id FROM public.api_keys WHERE user_id = :id"), {"id": user_id}).scalars())
+
+
+def test_duplicate_keys_keeps_the_oldest_active_key_and_releases_slots(pg):
+    # Doublons impossibles sous l'index unique : on le retire le temps de la transaction
+    pg.execute(text("DROP INDEX public.ix_api_keys_hash"))
+    owner = add_profile(pg, active_key_count=2)
+    other = add_profile(pg, active_key_count=1)
+    revoked = add_key(pg, owner, hash="dup", revoked=True, age_days=3)
+    kept = add_key(pg, owner, hash="dup", age_days=2)
+    newer = add_key(pg, owner, hash="dup", age_days=1)
+    untouched = add_key(pg, other)
+    job = DuplicateKeysJob()
+
+    assert job.estimate(pg) == 2
+    assert {row["id"]: row["delete"] for row in job.sample(pg, 10)} == {kept: False, newer: True, revoked: True}
+
+    assert job.run_batch(pg, 1, None) == (1, None, False)
+    assert job.run_batch(pg, 10, None) == (1, None, True)
+
+    assert key_ids(pg, owner) == {kept}
+    assert key_ids(pg, other) == {untouched}
+    # Seule la clé active supprimée libère une place
+    assert active_key_count(pg, owner) == 1
+    assert active_key_count(pg, other) == 1
+    assert job.estimate(pg) == 0
+
+
+def test_orphan_profiles_are_deleted_with_their_keys(pg):
+    orphan = add_profile(pg, account=False)
+    add_key(pg, orphan)
+    kept = add_profile(pg)
+    kept_key = add_key(pg, kept)
+    job = OrphanProfilesJob()
+
+    assert orphan in {row["id"] for row in job.sample(pg, 1000)}
+    processed, _, done = job.run_batch(pg, 1000, None)
+
+    assert processed >= 1 and done
+    assert pg.execute(text("SELECT COUNT(*) FROM public.user_profiles WHERE id = :id"), {"id": orphan}).scalar() == 0
+    assert key_ids(pg, orphan) == set()
+    assert key_ids(pg, kept) == {kept_key}
+    assert job.estimate(pg) == 0
+
+
+def test_recount_active_keys_walks_profiles_and_fixes_counters(pg):
+    drifted_up = add_profile(pg, active_key_count=5)
+    add_key(pg, drifted_up)
+    add_key(pg, drifted_up)
+    add_key(pg, drifted_up, revoked=True)
+    drifted_down = add_profile(pg, active_key_count=0)
+    add_key(pg, drifted_down)
+    correct = add_profile(pg, active_key_count=1)
+    add_key(pg, correct)
+    job = RecountActiveKeysJob()
+
+    assert {drifted_up, drifted_down} <= {row["id"] for row in job.sample(pg, 100000)}
+
+    # Le premier lot s'arrête au plus petit id ; les suivants reprennent après le curseur
+    fixed, cursor, done = job.run_batch(pg, 1, None)
+    assert cursor == str(pg.execute(text("SELECT MIN(id) FROM public.user_profiles")).scalar())
+    while not done:
+        processed, next_cursor, done = job.run_batch(pg, 500, cursor)
+        assert next_cursor >= cursor
+        fixed, cursor = fixed + processed, next_cursor
+
+    assert fixed >= 2
+    assert (active_key_count(pg, drifted_up), active_key_count(pg, drifted_down), active_key_count(pg, correct)) == (2, 1, 1)
+    assert job.estimate(pg) == 0
+
+
+def add_archived_key(conn, user_id, archived_days_ago) -> uuid.UUID:
+    key_id = uuid.uuid4()
+    conn.execute(text("""
+        INSERT INTO public.api_keys_archive (
+            id, user_id, name, provider, prefix, last4, enc_ciphertext, enc_nonce, hash, revoked,
+            created_at, updated_at, archived_at
+        ) VALUES (:id, :user_id, 'key', 'CUSTOM', 'vk_', 'abcd', '\\x00'::bytea, '\\x00'::bytea, :hash, true,
+                  NOW(), NOW(), NOW() - make_interval(days => :days))
+    """), {"id": key_id, "user_id": user_id, "hash": key_id.hex, "days": archived_days_ago})
+    return key_id
+
+
+def test_purge_archived_keys_only_touches_the_archive(pg):
+    owner = add_profile(pg)
+    old = add_archived_key(pg, owner, archived_days_ago=400)
+    recent = add_archived_key(pg, owner, archived_days_ago=10)
+    revoked_long_ago = add_key(pg, owner, revoked=True, age_days=400)
+    job = PurgeArchivedKeysJob()
+
+    assert old in {row["id"] for row in job.sample(pg, 100000)}
+    processed, _, done = job.run_batch(pg, 100000, None)
+
+    assert processed >= 1 and done
+    archived = set(pg.execute(text("SELECT id FROM public.api_keys_archive WHERE user_id = :id"), {"id": owner}).scalars())
+    assert archived == {recent}
+    # Les clés révoquées non archivées restent à l'archiveur
+    assert key_ids(pg, owner) == {revoked_long_ago}
+
+
+def revoked(conn, key_id) -> bool:
+    return conn.execute(text("SELECT revoked FROM public.api_keys WHERE id = :id"), {"id": key_id}).scalar()
+
+
+def test_expire_keys_revokes_due_keys_and_releases_their_slot(pg):
+    owner = add_profile(pg, active_key_count=3)
+    due = add_key(pg, owner, expires_in=timedelta(hours=-1))
+    already_revoked = add_key(pg, owner, revoked=True, expires_in=timedelta(hours=-2))
+    pending = add_key(pg, owner, expires_in=timedelta(hours=1))
+    forever = add_key(pg, owner)
+    job = ExpireKeysJob()
+
+    assert due in {row["id"] for row in job.sample(pg, 100000)}
+    assert job.seconds_until_next_expiry(pg) < 0
+
+    processed, _, done = job.run_batch(pg, 100000, None)
+
+    assert processed >= 1 and done
+    assert (revoked(pg, due), revoked(pg, already_revoked), revoked(pg, pending), revoked(pg, forever)) == (
+        True, True, False, False,
+    )
+    assert active_key_count(pg, owner) == 2
+    assert job.estimate(pg) == 0
+    events = pg.execute(text("SELECT user_id, action, details FROM public.audit_log WHERE api_key_id = :id"), {"id": due}).all()
+    assert [tuple(event) for event in events] == [(owner, "key.revoked", {"reason": "expired"})]
+    # Prochaine échéance : la clé encore active, dans une heure
+    assert 3500 < job.seconds_until_next_expiry(pg) <= 3600
+
+
+@pytest.mark.parametrize("processed, remaining, expected", [
+    (0, -5.0, jobs.EXPIRY_LOCKED_RETRY_SECONDS),  # clés verrouillées par un autre worker : pas de boucle serrée
+    (3, -5.0, 0.0),
+    (0, 30.0, 30.0),
+    (0, None, None),
+])
+def test_sweeper_sleeps_until_next_expiry(monkeypatch, processed, remaining, expected):
+    monkeypatch.setattr(database, "engine", create_engine("sqlite://"))
+    monkeypatch.setattr(jobs, "run_job", lambda job, engine, **kwargs: JobReport(
+        job=job.name, dry_run=False, processed=processed, finished=True,
+    ))
+    monkeypatch.setattr(ExpireKeysJob, "seconds_until_next_expiry", lambda self, conn: remaining)
+
+    assert sweep_expired_keys() == expected
+
+
+def test_sweeper_runs_again_after_a_full_batch(monkeypatch):
+    monkeypatch.setattr(jobs, "run_job", lambda job, engine, **kwargs: JobReport(
+        job=job.name, dry_run=False, processed=1000, finished=False,
+    ))
+    assert sweep_expired_keys() == 0.0
@@ -0,0 +1,80 @@
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+from app.core import metrics
+from app.core.metrics import HTTP_LATENCY, HTTP_REQUESTS, MetricsMiddleware, Registry
+from tests.asgi import call
+
+
+def test_text_exposition_of_counters_histograms_and_gauges():
+    registry = Registry()
+    counter = registry.counter("jobs_total", "Jobs by status", ("status",))
+    counter.inc(("ok",))
+    counter.inc(("ok",), amount=2)
+    counter.inc(('say "hi"\n',))
+    histogram = registry.histogram("job_seconds", "Job duration", buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(3.0)
+    registry.gauge_callback("queue_depth", "Queued jobs", lambda: {(): 7})
+
+    lines = registry.render().splitlines()
+
+    assert lines[:2] == ["# HELP jobs_total Jobs by status", "# TYPE jobs_total counter"]
+    assert 'jobs_total{status="ok"} 3.0' in lines
+    assert 'jobs_total{status="say \\"hi\\"\\n"} 1.0' in lines
+    assert "# TYPE job_seconds histogram" in lines
+    assert [line for line in lines if line.startswith("job_seconds_")] == [
+        'job_seconds_bucket{le="0.1"} 1',
+        'job_seconds_bucket{le="1.0"} 2',
+        'job_seconds_bucket{le="+Inf"} 3',
+        "job_seconds_sum 3.55",
+        "job_seconds_count 3",
+    ]
+    assert "queue_depth 7" in lines
+
+
+def test_registering_a_name_twice_returns_the_same_metric():
+    registry = Registry()
+    assert registry.counter("c", "doc") is registry.counter("c", "doc")
+
+
+def test_failing_gauge_callback_is_left_out_of_the_scrape():
+    registry = Registry()
+    registry.gauge_callback("broken", "Broken gauge", lambda: 1 / 0)
+    assert registry.render().splitlines() == ["# HELP broken Broken gauge", "# TYPE broken gauge"]
+
+
+def test_pool_gauges(monkeypatch):
+    registry = Registry()
+    monkeypatch.setattr(metrics, "registry", registry)
+    engine = create_engine("sqlite://", poolclass=QueuePool, pool_size=3)
+    metrics.register_pool_stats(engine)
+
+    with engine.connect():
+        lines = registry.render().splitlines()
+    engine.dispose()
+
+    assert 'db_pool_connections{state="size"} 3' in lines
+    assert 'db_pool_connections{state="checked_out"} 1' in lines
+
+
+def test_middleware_labels_requests_by_route_template():
+    app = FastAPI()
+
+    @app.get("/things/{thing_id}")
+    def get_thing(thing_id: str):
+        return {"id": thing_id}
+
+    app.add_middleware(MetricsMiddleware)
+    before = HTTP_REQUESTS.value(("GET", "/things/{thing_id}", "200"))
+    unmatched = HTTP_REQUESTS.value(("GET", "unmatched", "404"))
+
+    assert call(app, "/things/a")[0] == 200
+    assert call(app, "/things/b")[0] == 200
+    assert call(app, "/nowhere")[0] == 404
+
+    assert HTTP_REQUESTS.value(("GET", "/things/{thing_id}", "200")) == before + 2
+    assert HTTP_REQUESTS.value(("GET", "unmatched", "404")) == unmatched + 1
+    assert not any("/things/a" in line for line in HTTP_LATENCY.samples())
@@ -0,0 +1,63 @@
+import pytest
+from sqlalchemy import text
+
+from app.core import migrations
+from app.core.migrations import _split_statements, discover_migrations, expected_schema_version, stamp
+
+
+def _write(directory, name, sql):
+    (directory / name).write_text(sql, encoding="utf-8")
+
+
+def test_migrations_are_discovered_in_version_order(tmp_path):
+    _write(tmp_path, "0002_second.sql", "-- migrate:no-transaction\nCREATE INDEX CONCURRENTLY i ON t (c);")
+    _write(tmp_path, "0001_first.sql", "CREATE TABLE t (c INT);")
+    _write(tmp_path, "notes.sql", "SELECT 1;")
+
+    found = discover_migrations(tmp_path)
+
+    assert [(m.version, m.name, m.transactional) for m in found] == [(1, "first", True), (2, "second", False)]
+    assert len(found[0].checksum) == 64
+
+
+def test_duplicate_versions_are_rejected(tmp_path):
+    _write(tmp_path, "0001_a.sql", "SELECT 1;")
+    _write(tmp_path, "0001_b.sql", "SELECT 2;")
+    with pytest.raises(ValueError):
+        discover_migrations(tmp_path)
+
+
+def test_shipped_migrations_are_contiguous():
+    versions = [m.version for m in discover_migrations()]
+    assert versions == list(range(1, len(versions) + 1))
+    assert expected_schema_version() == versions[-1]
+
+
+def test_no_transaction_migrations_are_split_per_statement():
+    sql = "-- migrate:no-transaction\n-- commentaire\nCREATE INDEX a ON t (c);\n\nDROP INDEX b;\n"
+    assert _split_statements(sql) == ["CREATE INDEX a ON t (c)", "DROP INDEX b"]
+
+
+def test_no_transaction_migrations_have_no_dollar_quoted_bodies():
+    for migration in discover_migrations():
+        if not migration.transactional:
+            assert "$$" not in migration.read_sql(), migration.path.name
+
+
+def test_stamp_rejects_an_unknown_version(tmp_path):
+    _write(tmp_path, "0001_first.sql", "SELECT 1;")
+    with pytest.raises(ValueError):
+        stamp(None, 5, directory=tmp_path)
+
+
+def test_stamp_records_versions_without_running_them(pg_engine, tmp_path):
+    # Numéro hors de la série livrée, retiré à la fin
+    _write(tmp_path, "9001_never_run.sql", "SELECT * FROM table_that_does_not_exist;")
+    try:
+        assert [m.version for m in stamp(pg_engine, 9001, directory=tmp_path)] == [9001]
+        assert stamp(pg_engine, 9001, directory=tmp_path) == []
+        assert migrations.upgrade(pg_engine, directory=tmp_path) == []
+    finally:
+        with pg_engine.begin() as conn:
+            conn.execute(text("DELETE FROM public.schema_migrations WHERE version = 9001"))
+        migrations.check_schema_version(pg_engine, refresh=True)
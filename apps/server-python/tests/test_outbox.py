@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+import asyncio
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.outbox import DONE, FAILED, PENDING, OutboxWorker, enqueue
+from app.models.outbox import OutboxMessage
+
+KIND = "supabase.send_recovery_email"
+
+
+@pytest.fixture
+def session_factory():
+    # Une seule connexion partagée : le worker l'utilise depuis des threads
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    OutboxMessage.__table__.create(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def queue(session_factory, count: int, dedup: bool = False) -> None:
+    with session_factory() as db:
+        for i in range(count):
+            enqueue(db, KIND, {"email": f"user{i}@example.com"}, dedup_key=f"recovery:{i}" if dedup else None)
+        db.commit()
+
+
+def messages(session_factory) -> list[OutboxMessage]:
+    with session_factory() as db:
+        return list(db.scalars(select(OutboxMessage).order_by(OutboxMessage.id)))
+
+
+def test_dedup_key_only_applies_while_pending(session_factory):
+    with session_factory() as db:
+        assert enqueue(db, KIND, {"email": "a@example.com"}, dedup_key="recovery:a")
+        assert not enqueue(db, KIND, {"email": "a@example.com"}, dedup_key="recovery:a")
+        db.commit()
+    assert len(messages(session_factory)) == 1
+
+    worker = OutboxWorker(session_factory, handlers={KIND: lambda payload: None})
+    asyncio.run(worker.drain_once())
+    with session_factory() as db:
+        assert enqueue(db, KIND, {"email": "a@example.com"}, dedup_key="recovery:a")
+        db.commit()
+    assert [m.status for m in messages(session_factory)] == [DONE, PENDING]
+
+
+def test_failures_are_retried_with_backoff_then_abandoned(session_factory):
+    queue(session_factory, 1)
+
+    def failing(payload):
+        raise RuntimeError("supabase down")
+
+    worker = OutboxWorker(session_factory, handlers={KIND: failing}, max_attempts=2)
+    assert asyncio.run(worker.drain_once()) == 1
+    [message] = messages(session_factory)
+    assert message.status == PENDING and message.attempts == 1
+    assert "supabase down" in message.last_error
+    # Pas encore échu : le lot suivant est vide
+    assert asyncio.run(worker.drain_once()) == 0
+
+    with session_factory() as db:
+        db.get(OutboxMessage, message.id).next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        db.commit()
+    asyncio.run(worker.drain_once())
+    [message] = messages(session_factory)
+    assert message.status == FAILED and message.attempts == 2
+
+
+def test_handlers_run_with_bounded_concurrency(session_factory):
+    queue(session_factory, 8)
+    lock = threading.Lock()
+    running, peak, seen = [0], [0], []
+
+    def handler(payload):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+            seen.append(payload["email"])
+
+    worker = OutboxWorker(session_factory, handlers={KIND: handler}, batch_size=5, concurrency=2)
+    # Lot plein : la tâche demande à être relancée immédiatement
+    assert asyncio.run(worker()) == 0.0
+    assert asyncio.run(worker()) is None
+
+    assert len(seen) == 8
+    assert peak[0] == 2
+    assert {m.status for m in messages(session_factory)} == {DONE}
+    assert worker.stats() == {DONE: 8}
+
+
+def test_purge_keeps_pending_messages(session_factory):
+    queue(session_factory, 2)
+    worker = OutboxWorker(session_factory, handlers={KIND: lambda payload: None}, batch_size=1)
+    asyncio.run(worker.drain_once())
+
+    assert worker.purge(timedelta(seconds=-1)) == 1
+    assert [m.status for m in messages(session_factory)] == [PENDING]
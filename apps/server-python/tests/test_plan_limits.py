@@ -0,0 +1,64 @@
+import uuid
+
+import pytest
+from fastapi import HTTPException, Response
+
+from app.core import plans
+from app.core.plans import PlanLimits
+from app.core.rate_limit import InMemoryBackend, SlidingWindowLimiter
+from app.models.user import PlanType, UserProfile
+from app.routes import apikeys
+from app.schemas.apikey import ApiKeyCreate
+
+
+@pytest.fixture
+def user_plan():
+    return PlanType.FREE
+
+
+def active_key_count(db, user) -> int:
+    db.expire_all()
+    return db.get(UserProfile, user.id).active_key_count
+
+
+def test_key_count_is_capped_per_plan_and_released_on_revoke(db, user, monkeypatch):
+    monkeypatch.setitem(plans.PLAN_LIMITS, PlanType.FREE, PlanLimits(max_api_keys=2, key_requests=100))
+
+    created = [apikeys.create_api_key(ApiKeyCreate(name=f"k{i}"), user, db) for i in range(2)]
+    assert active_key_count(db, user) == 2
+
+    with pytest.raises(HTTPException) as exc:
+        apikeys.create_api_key(ApiKeyCreate(name="k3"), user, db)
+    assert exc.value.status_code == 403
+    db.rollback()
+
+    # Une double révocation ne libère qu'une place
+    apikeys.revoke_api_key(uuid.UUID(created[0]["id"]), user, db)
+    apikeys.revoke_api_key(uuid.UUID(created[0]["id"]), user, db)
+    assert active_key_count(db, user) == 1
+
+    apikeys.create_api_key(ApiKeyCreate(name="k3"), user, db)
+    assert active_key_count(db, user) == 2
+
+
+def test_request_rate_is_limited_per_plan_with_headers(user, monkeypatch):
+    backend = InMemoryBackend()
+    monkeypatch.setitem(plans.KEY_LIMITERS, PlanType.FREE, SlidingWindowLimiter("keys_free", backend, 2, 60))
+    monkeypatch.setitem(plans.KEY_LIMITERS, PlanType.PRO, SlidingWindowLimiter("keys_pro", backend, 100, 60))
+
+    response = Response()
+    apikeys.rate_limited_user(response, user)
+    assert response.headers["RateLimit-Limit"] == "2"
+    assert response.headers["RateLimit-Remaining"] == "1"
+    assert 1 <= int(response.headers["RateLimit-Reset"]) <= 60
+
+    apikeys.rate_limited_user(Response(), user)
+    with pytest.raises(HTTPException) as exc:
+        apikeys.rate_limited_user(Response(), user)
+    assert exc.value.status_code == 429
+    assert exc.value.headers["RateLimit-Remaining"] == "0"
+    assert "Retry-After" in exc.value.headers
+
+    # Passage en PRO : le quota du nouveau plan s'applique immédiatement
+    user.plan = PlanType.PRO
+    apikeys.rate_limited_user(Response(), user)
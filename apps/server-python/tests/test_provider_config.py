@@ -0,0 +1,51 @@
+import json
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy.dialects import postgresql
+
+from app.models.apikey import ApiKey, ProviderType
+from app.routes import apikeys
+from app.schemas.apikey import ApiKeyCreate, ApiKeyResponse
+
+CONFIG = {"url": "https://xyz.supabase.co", "anonKey": "anon", "serviceRoleKey": "service"}
+
+
+@pytest.mark.parametrize("value", [CONFIG, json.dumps(CONFIG)])
+def test_config_is_parsed_once_into_an_object(value):
+    data = ApiKeyCreate(name="k", provider=ProviderType.SUPABASE, provider_config=value)
+    assert data.provider_config == CONFIG
+
+
+@pytest.mark.parametrize("value", ["{not json", "[1, 2]", 42])
+def test_invalid_config_is_rejected_by_the_schema(value):
+    with pytest.raises(ValidationError):
+        ApiKeyCreate(name="k", provider=ProviderType.SUPABASE, provider_config=value)
+
+
+def test_config_is_stored_as_an_object_and_returned_as_a_json_string(db, user):
+    data = ApiKeyCreate(name="k", provider=ProviderType.SUPABASE, provider_config=json.dumps(CONFIG))
+    created = apikeys.create_api_key(data, user, db)
+
+    assert db.get(ApiKey, uuid.UUID(created["id"])).provider_config == CONFIG
+    assert json.loads(created["provider_config"]) == CONFIG
+
+    listed = apikeys.list_api_keys(user, db)["apiKeys"]
+    assert json.loads(ApiKeyResponse.model_validate(listed[0]).provider_config) == CONFIG
+
+    updated = apikeys.update_api_key(uuid.UUID(created["id"]), ApiKeyCreate(name="k", provider=ProviderType.CUSTOM), user, db)
+    assert updated["provider_config"] is None
+
+
+def test_list_filter_is_a_jsonb_containment():
+    clause = apikeys.provider_config_contains({"url": CONFIG["url"]})
+    sql = str(clause.compile(dialect=postgresql.dialect()))
+    assert sql == "api_keys.provider_config @> %(param_1)s::JSONB"
+
+
+def test_list_filter_must_be_a_json_object(db, user):
+    with pytest.raises(HTTPException) as exc:
+        apikeys.list_api_keys(user, db, provider_config="[1]")
+    assert exc.value.status_code == 400
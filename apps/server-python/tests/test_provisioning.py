@@ -0,0 +1,134 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core import circuit_breaker, supabase
+from app.services import provisioning
+from app.services.provisioning import CREATED, ERROR, EXISTS, INVALID, parse_users, provision_users
+from benchmarks.fake_supabase import FakeSupabase
+
+CSV = """email,password,name,plan
+alice@example.com,Password123!,Alice,PRO
+bob@example.com,,Bob,
+not-an-email,Password123!,,
+carol@example.com,Password123!,,GOLD
+ALICE@example.com,Password123!,,
+existing@example.com,Password123!,,
+"""
+
+
+@pytest.fixture
+def fake_supabase(monkeypatch):
+    server = FakeSupabase()
+    server.start()
+    monkeypatch.setattr(supabase.settings, "SUPABASE_URL", server.url)
+    monkeypatch.setattr(supabase.settings, "SUPABASE_SERVICE_ROLE_KEY", server.service_role_key)
+    monkeypatch.setattr(supabase, "supabase_breakers", circuit_breaker.build_breakers())
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ATTACH DATABASE ':memory:' AS public")
+        conn.exec_driver_sql("ATTACH DATABASE ':memory:' AS auth")
+        conn.exec_driver_sql(
+            "CREATE TABLE public.user_profiles (id TEXT PRIMARY KEY, plan TEXT NOT NULL, "
+            "created_at TIMESTAMP NOT NULL, updated_at TIMESTAMP NOT NULL)"
+        )
+        conn.exec_driver_sql("CREATE TABLE auth.users (id TEXT PRIMARY KEY, email TEXT)")
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def test_parse_ndjson_and_reject_bad_lines():
+    rows = parse_users('{"email": "A@Example.com", "plan": "pro"}\n\n{"email": "b@example.com"}\n', "ndjson")
+    assert [(r.line, r.email, r.plan) for r in rows] == [(1, "a@example.com", "PRO"), (3, "b@example.com", "FREE")]
+    with pytest.raises(provisioning.ProvisioningError, match="Line 2"):
+        parse_users('{"email": "a@example.com"}\n[1, 2]\n', "ndjson")
+    with pytest.raises(provisioning.ProvisioningError, match="email"):
+        parse_users("name\nalice\n", "csv")
+
+
+def test_provision_users_reports_each_row(fake_supabase, session_factory):
+    # Compte déjà présent chez Supabase et dans auth.users
+    supabase.admin_create_user("existing@example.com", "Password123!")
+    existing_id = fake_supabase.state.users_by_email["existing@example.com"]
+    with session_factory() as db:
+        db.execute(text("INSERT INTO auth.users (id, email) VALUES (:id, :email)"),
+                   {"id": existing_id, "email": "existing@example.com"})
+        db.commit()
+
+    report = provision_users(parse_users(CSV), session_factory, concurrency=4, batch_size=1)
+    results = {r.line: r for r in report.results}
+
+    assert [results[line].status for line in sorted(results)] == [CREATED, CREATED, INVALID, INVALID, INVALID, EXISTS]
+    assert results[7].user_id == existing_id
+    assert report.counts() == {CREATED: 2, EXISTS: 1, INVALID: 3, ERROR: 0}
+
+    with session_factory() as db:
+        profiles = dict(db.execute(text("SELECT id, plan FROM public.user_profiles")).all())
+    # Le compte existant sans profil en reçoit un
+    assert profiles == {results[2].user_id: "PRO", results[3].user_id: "FREE", existing_id: "FREE"}
+    assert fake_supabase.state.calls["admin_create_user"] == 4
+
+
+def test_rerun_completes_profiles_lost_by_a_failed_batch(fake_supabase, session_factory, monkeypatch):
+    rows = parse_users("email,plan\nerin@example.com,PRO\nfrank@example.com,\n")
+    real_write = provisioning.write_profiles
+    monkeypatch.setattr(provisioning, "write_profiles", lambda db, results, plans: real_write(_Broken(db), results, plans))
+    first = provision_users(rows, session_factory, batch_size=1)
+    assert {r.status for r in first.results} == {ERROR}
+
+    # Les comptes existent chez Supabase ; auth.users les contient (comme en production)
+    with session_factory() as db:
+        for email, user_id in fake_supabase.state.users_by_email.items():
+            db.execute(text("INSERT INTO auth.users (id, email) VALUES (:id, :email)"), {"id": user_id, "email": email})
+        db.execute(text("INSERT INTO public.user_profiles (id, plan, created_at, updated_at) "
+                        "VALUES (:id, 'PRO', '2024-01-01', '2024-01-01')"),
+                   {"id": fake_supabase.state.users_by_email["frank@example.com"]})
+        db.commit()
+
+    monkeypatch.setattr(provisioning, "write_profiles", real_write)
+    second = provision_users(rows, session_factory, batch_size=1)
+    assert {r.status for r in second.results} == {EXISTS}
+
+    with session_factory() as db:
+        profiles = dict(db.execute(text("SELECT id, plan FROM public.user_profiles")).all())
+    ids = fake_supabase.state.users_by_email
+    # Profil manquant créé avec le plan du fichier, profil existant inchangé
+    assert profiles == {ids["erin@example.com"]: "PRO", ids["frank@example.com"]: "PRO"}
+
+
+class _Broken:
+    """Session whose writes fail, as when the database drops mid-import"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def execute(self, statement, params=None):
+        raise RuntimeError("connection lost")
+
+    def rollback(self):
+        self.db.rollback()
+
+
+def test_transient_errors_are_retried(fake_supabase, session_factory, monkeypatch):
+    real = supabase.admin_create_user_response
+    failures = iter([RuntimeError("connection reset")])
+
+    def flaky(*args, **kwargs):
+        error = next(failures, None)
+        if error is not None:
+            raise error
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(supabase, "admin_create_user_response", flaky)
+    rows = parse_users("email\ndave@example.com\n")
+    monkeypatch.setattr(provisioning.time, "sleep", lambda seconds: None)
+
+    report = provision_users(rows, session_factory, retries=1)
+    assert report.results[0].status == CREATED
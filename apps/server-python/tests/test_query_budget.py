@@ -0,0 +1,94 @@
+import uuid
+
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import create_engine, text
+
+from app.core import profiling
+from app.core.config import settings
+from app.core.profiling import ServerTimingMiddleware, span
+from app.routes import apikeys
+from app.schemas.apikey import ApiKeyCreate, ApiKeysList
+from tests.asgi import call
+from tests.query_budget import assert_max_queries
+
+
+@pytest.fixture()
+def engine():
+    engine = create_engine("sqlite://")
+    yield engine
+    engine.dispose()
+
+
+def test_queries_within_budget_are_recorded(engine):
+    with assert_max_queries(2) as profile:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+
+    assert profile.query_count == 2
+    assert profile.spans["db"][1] == 2
+
+
+def test_exceeding_budget_fails_with_statements(engine):
+    with pytest.raises(AssertionError, match="at most 1 queries, got 3"):
+        with assert_max_queries(1):
+            with engine.connect() as conn:
+                for i in range(3):
+                    conn.execute(text(f"SELECT {i}"))
+
+
+def test_spans_are_noop_outside_a_profile(engine):
+    with span("argon2"):
+        pass
+    with assert_max_queries(0) as profile:
+        with span("argon2"):
+            pass
+    assert profile.spans["argon2"][1] == 1
+    assert "total;dur=" in profile.server_timing()
+
+
+def test_list_api_keys_is_one_query_whatever_the_key_count(db, user):
+    for i in range(5):
+        apikeys.create_api_key(ApiKeyCreate(name=f"k{i}"), user, db)
+    db.refresh(user)  # Utilisateur chargé comme par get_current_user : seules les requêtes de la route comptent
+
+    with assert_max_queries(1):
+        listed = ApiKeysList.model_validate(apikeys.list_api_keys(user, db))
+    assert len(listed.apiKeys) == 5
+
+
+def test_reveal_api_key_is_one_query(db, user):
+    created = apikeys.create_api_key(ApiKeyCreate(name="k"), user, db)
+    key_id = uuid.UUID(created["id"])
+    db.refresh(user)
+
+    with assert_max_queries(1):
+        revealed = apikeys.reveal_api_key(key_id, user, db)
+    assert revealed["api_key"] == created["api_key"]
+
+
+def _timed_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/api/auth/login")
+    def login():
+        with span("argon2"):
+            return {}
+
+    @app.get("/api/keys")
+    def keys():
+        return []
+
+    app.add_middleware(ServerTimingMiddleware)
+    return app
+
+
+def test_server_timing_is_off_by_default_and_never_on_auth_routes(monkeypatch):
+    assert settings.SERVER_TIMING_ENABLED is False
+    app = _timed_app()
+    assert "server-timing" not in call(app, "/api/keys")[1]
+
+    monkeypatch.setattr(profiling.settings, "SERVER_TIMING_ENABLED", True)
+    assert "server-timing" in call(app, "/api/keys")[1]
+    assert "server-timing" not in call(app, "/api/auth/login", method="POST")[1]
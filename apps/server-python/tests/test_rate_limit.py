@@ -0,0 +1,98 @@
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.core import rate_limit
+from app.core.rate_limit import InMemoryBackend, RedisBackend, SlidingWindowLimiter, client_ip, email_key
+from app.routes import auth
+from tests.clock import Clock
+from tests.fake_redis import FakeRedis
+
+
+def _request(client: str = "203.0.113.7", forwarded: str | None = None) -> Request:
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "method": "POST", "path": "/api/auth/login", "headers": headers, "client": (client, 4321)})
+
+
+def test_rejects_over_limit_without_counting_rejections():
+    limiter = SlidingWindowLimiter("t", InMemoryBackend(), limit=3, window=60)
+    results = [limiter.hit("a", now=1000.0) for _ in range(5)]
+
+    assert [r.allowed for r in results] == [True, True, True, False, False]
+    assert [r.remaining for r in results[:3]] == [2, 1, 0]
+    assert results[3].retry_after == 60 - (1000 % 60)
+    # Une autre clé n'est pas affectée
+    assert limiter.hit("b", now=1000.0).allowed
+
+
+def test_previous_window_is_weighted_by_overlap():
+    limiter = SlidingWindowLimiter("t", InMemoryBackend(), limit=4, window=60)
+    for _ in range(4):
+        assert limiter.hit("a", now=60.0).allowed
+
+    # 15 s dans la fenêtre suivante : 4 * 0.75 = 3 requêtes encore comptées
+    assert limiter.hit("a", now=135.0).allowed
+    blocked = limiter.hit("a", now=135.0)
+    assert not blocked.allowed
+    # 4 * (1 - (15 + t) / 60) + 1 < 4  =>  t > 0
+    assert blocked.retry_after == 1
+    assert limiter.hit("a", now=136.0).allowed
+    assert not limiter.hit("a", now=136.0).allowed
+
+
+def test_redis_backend_shares_counters_between_workers():
+    clock = Clock(100.0)
+    client = FakeRedis(clock=clock)
+    worker_a = SlidingWindowLimiter("t", RedisBackend(client), limit=2, window=60)
+    worker_b = SlidingWindowLimiter("t", RedisBackend(client), limit=2, window=60)
+
+    assert worker_a.hit("ip", now=130.0).allowed
+    assert worker_b.hit("ip", now=130.0).allowed
+    assert not worker_a.hit("ip", now=130.0).allowed
+
+    key = "rl:t:ip:2"
+    assert 0 < client.ttl(key) <= 120
+    clock.now += 121
+    assert client.mget([key]) == [None]
+
+
+def test_backend_failure_allows_request():
+    client = FakeRedis()
+    client.fail = True
+    limiter = SlidingWindowLimiter("t", RedisBackend(client), limit=1, window=60)
+    assert limiter.hit("ip").allowed
+
+
+def test_in_memory_backend_is_bounded():
+    backend = InMemoryBackend(max_keys=10)
+    for i in range(100):
+        backend.incr(f"k{i}", ttl=60)
+    assert len(backend) <= 10
+
+
+def test_email_key_is_normalized_and_opaque():
+    assert email_key(" Alice@Example.com") == email_key("alice@example.com")
+    assert "alice" not in email_key("alice@example.com")
+
+
+def test_client_ip_uses_forwarded_for_only_when_trusted(monkeypatch):
+    request = _request(forwarded="198.51.100.1, 192.0.2.10")
+    monkeypatch.setattr(rate_limit.settings, "TRUST_FORWARDED_FOR", False)
+    assert client_ip(request) == "203.0.113.7"
+    monkeypatch.setattr(rate_limit.settings, "TRUST_FORWARDED_FOR", True)
+    assert client_ip(request) == "192.0.2.10"
+
+
+def test_login_is_throttled_per_email_across_ips(monkeypatch):
+    backend = InMemoryBackend()
+    monkeypatch.setattr(auth, "login_ip_limiter", SlidingWindowLimiter("login_ip", backend, 100, 300))
+    monkeypatch.setattr(auth, "login_email_limiter", SlidingWindowLimiter("login_email", backend, 2, 300))
+
+    auth.check_login_rate_limit(_request("203.0.113.1"), "victim@example.com")
+    auth.check_login_rate_limit(_request("203.0.113.2"), "victim@example.com")
+    with pytest.raises(HTTPException) as exc:
+        auth.check_login_rate_limit(_request("203.0.113.3"), "Victim@example.com")
+
+    assert exc.value.status_code == 429
+    assert int(exc.value.headers["Retry-After"]) >= 1
+    auth.check_login_rate_limit(_request("203.0.113.3"), "other@example.com")
@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta, timezone
+import time
+import uuid
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.revocation import RevocationList
+from app.core.security import create_access_token, decode_access_token
+from app.models.revoked_token import RevokedToken
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://")
+    RevokedToken.__table__.create(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def in_minutes(minutes: float) -> datetime:
+    return datetime.now(timezone.utc) + timedelta(minutes=minutes)
+
+
+def test_tokens_carry_unique_jti():
+    first = decode_access_token(create_access_token({"sub": "user"}))
+    second = decode_access_token(create_access_token({"sub": "user"}))
+    assert first["jti"] != second["jti"]
+
+
+def test_expired_entries_are_evicted_in_expiry_order():
+    revocations = RevocationList(refresh_interval=5)
+    now = time.time()
+    revocations.add("late", now + 300)
+    revocations.add("soon", now + 10)
+    revocations.add("already-expired", now - 1)
+
+    assert revocations.is_revoked("soon") and revocations.is_revoked("late")
+    assert not revocations.is_revoked("already-expired")
+
+    assert revocations.evict_expired(now + 60) == 1
+    assert not revocations.is_revoked("soon")
+    assert revocations.is_revoked("late")
+    assert len(revocations) == 1
+
+
+def test_revoke_is_seen_by_other_workers_after_refresh(session_factory):
+    worker_a, worker_b = RevocationList(refresh_interval=5), RevocationList(refresh_interval=5)
+    with session_factory() as db:
+        worker_b.refresh(db)
+        worker_a.revoke(db, "jti-1", str(uuid.uuid4()), in_minutes(30))
+        worker_a.revoke(db, "jti-1", None, in_minutes(30))  # double logout
+
+        assert worker_a.is_revoked("jti-1")
+        assert not worker_b.is_revoked("jti-1")
+        assert worker_b.refresh(db) == 1
+        assert worker_b.is_revoked("jti-1")
+
+
+def test_refresh_is_incremental(session_factory):
+    revocations = RevocationList(refresh_interval=5, overlap_seconds=0)
+    with session_factory() as db:
+        old = datetime.now(timezone.utc) - timedelta(minutes=10)
+        db.add(RevokedToken(jti="old", revoked_at=old, expires_at=in_minutes(30)))
+        db.add(RevokedToken(jti="expired", revoked_at=old, expires_at=in_minutes(-1)))
+        db.commit()
+
+        assert revocations.refresh(db) == 1
+        assert revocations.refresh(db) == 0
+
+        db.add(RevokedToken(jti="new", revoked_at=datetime.now(timezone.utc), expires_at=in_minutes(30)))
+        db.commit()
+        assert revocations.refresh(db) == 1
+        assert revocations.is_revoked("old") and revocations.is_revoked("new")
+        assert not revocations.is_revoked("expired")
+
+
+def test_ensure_fresh_only_queries_when_stale(session_factory):
+    revocations = RevocationList(refresh_interval=60)
+    with session_factory() as db:
+        revocations.ensure_fresh(db)
+        db.add(RevokedToken(jti="later", revoked_at=datetime.now(timezone.utc), expires_at=in_minutes(30)))
+        db.commit()
+
+        revocations.ensure_fresh(db)
+        assert not revocations.is_revoked("later")
+
+
+def test_purge_removes_expired_rows(session_factory):
+    revocations = RevocationList(refresh_interval=5)
+    with session_factory() as db:
+        now = datetime.now(timezone.utc)
+        db.add(RevokedToken(jti="expired", revoked_at=now, expires_at=in_minutes(-1)))
+        db.add(RevokedToken(jti="valid", revoked_at=now, expires_at=in_minutes(30)))
+        db.commit()
+
+        assert revocations.purge(db) == 1
+        assert [row.jti for row in db.query(RevokedToken).all()] == ["valid"]
+
+
+def test_late_commit_within_overlap_is_not_missed(session_factory):
+    revocations = RevocationList(refresh_interval=5)
+    with session_factory() as db:
+        assert revocations.refresh(db) == 0
+        # Transaction commencée avant le passage précédent, validée après
+        started = datetime.now(timezone.utc) - timedelta(seconds=30)
+        db.add(RevokedToken(jti="late", revoked_at=started, expires_at=in_minutes(30)))
+        db.commit()
+
+        assert revocations.refresh(db) == 1
+        assert revocations.is_revoked("late")
+
+
+def test_revoked_at_comes_from_the_database_clock(session_factory):
+    revocations = RevocationList(refresh_interval=5)
+    with session_factory() as db:
+        revocations.revoke(db, "jti-db-clock", None, in_minutes(30))
+        row = db.get(RevokedToken, "jti-db-clock")
+        db.refresh(row)
+        assert row.revoked_at is not None
@@ -0,0 +1,115 @@
+from sqlalchemy import create_engine, event, text
+
+from app.core import migrations
+from app.core.slow_queries import SKIP_OPTION, SlowQueryLog, normalize_sql, parameter_shape, safe_to_analyze
+
+
+def test_normalize_sql_groups_queries_that_differ_only_by_literals():
+    a = normalize_sql("SELECT * FROM t1 WHERE name = 'O''Brien'  AND n = 42\n AND id IN (1, 2, 3)")
+    b = normalize_sql("SELECT * FROM t1 WHERE name = 'x' AND n = 7 AND id IN (9)")
+    assert a == b == "SELECT * FROM t1 WHERE name = ? AND n = ? AND id IN (...)"
+
+
+def test_parameter_shape_never_keeps_values():
+    assert parameter_shape({"email": "a@b.c", "n": 1}) == {"email": "str", "n": "int"}
+    assert parameter_shape(("secret", 2.5)) == ["str", "float"]
+    assert parameter_shape([{"v": "x"}, {"v": "y"}], executemany=True) == {"executemany": 2, "row": {"v": "str"}}
+    assert parameter_shape(None) is None
+
+
+def test_ring_buffer_keeps_the_newest_entries_and_summarizes_them():
+    log = SlowQueryLog(threshold_ms=0, buffer_size=3, explain_sample_rate=0)
+    log.record("SELECT 1", None, 0.010)
+    log.record("SELECT 2", None, 0.030)
+    log.record("UPDATE t SET a = 1", None, 0.005)
+    log.record("SELECT 3", None, 0.020)
+
+    entries = log.entries()
+    assert [e["duration_ms"] for e in entries] == [20.0, 5.0, 30.0]
+    assert log.entries(limit=1)[0]["duration_ms"] == 20.0
+    assert log.summary() == [
+        {"sql": "SELECT ?", "count": 2, "total_ms": 50.0, "max_ms": 30.0},
+        {"sql": "UPDATE t SET a = ?", "count": 1, "total_ms": 5.0, "max_ms": 5.0},
+    ]
+    log.clear()
+    assert log.entries() == []
+
+
+def test_hooks_record_slow_statements_except_skipped_ones():
+    engine = create_engine("sqlite://")
+    log = SlowQueryLog(threshold_ms=0, buffer_size=10, explain_sample_rate=1.0)
+    log.install(engine)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT :v"), {"v": "secret"})
+        conn.execution_options(**{SKIP_OPTION: True}).execute(text("SELECT 2"))
+    engine.dispose()
+
+    entries = log.entries()
+    assert len(entries) == 1
+    assert entries[0]["params"] in ({"v": "str"}, ["str"])
+    # EXPLAIN ANALYZE réservé à Postgres
+    assert entries[0]["explain"] is None
+
+
+def test_only_side_effect_free_selects_are_analyzed():
+    assert safe_to_analyze("SELECT * FROM public.api_keys WHERE user_id = %(id)s AND NOT revoked")
+    assert not safe_to_analyze("SELECT pg_advisory_lock(%(key)s)")
+    assert not safe_to_analyze("SELECT id FROM public.api_keys WHERE id = %(id)s FOR UPDATE SKIP LOCKED")
+    assert not safe_to_analyze("select * from t for no key update")
+    assert not safe_to_analyze("SELECT * FROM t FOR SHARE")
+    assert not safe_to_analyze("SELECT nextval('audit_log_id_seq')")
+    assert not safe_to_analyze("SELECT public.ensure_audit_log_partitions(%(months)s)")
+    assert not safe_to_analyze("UPDATE t SET a = 1")
+
+
+def test_migration_lock_is_never_recorded():
+    engine = create_engine("sqlite://")
+
+    @event.listens_for(engine, "connect")
+    def fake_advisory_lock(dbapi_connection, record):
+        dbapi_connection.create_function("pg_advisory_lock", 1, lambda key: None)
+
+    log = SlowQueryLog(threshold_ms=0, buffer_size=10, explain_sample_rate=1.0)
+    log.install(engine)
+    with engine.connect() as conn:
+        migrations._advisory(conn, "pg_advisory_lock")
+    engine.dispose()
+    assert log.entries() == []
+
+
+def test_explain_failure_is_stored_on_the_entry():
+    engine = create_engine("sqlite://")
+    log = SlowQueryLog(threshold_ms=0, buffer_size=10, explain_sample_rate=1.0)
+    log._engine = engine
+    entry = {"explain": "pending"}
+    log._explain(entry, "SELECT 1", ())
+    engine.dispose()
+    assert entry["explain"].startswith("error:")
+
+
+def test_sampled_select_gets_its_plan_in_the_background(pg_engine):
+    log = SlowQueryLog(threshold_ms=0, buffer_size=10, explain_sample_rate=1.0)
+    log._engine = pg_engine
+
+    entry = log.record("SELECT generate_series(1, %(n)s)", {"n": 3}, 1.0)
+    assert entry["explain"] == "pending"
+    log._explain_executor.shutdown(wait=True)
+
+    # EXPLAIN seul par défaut : la requête n'est pas exécutée
+    assert "cost=" in entry["explain"] and "actual time" not in entry["explain"]
+    assert log.record("UPDATE t SET a = 1", None, 1.0)["explain"] is None
+
+
+def test_analyze_never_replays_a_lock(pg_engine):
+    log = SlowQueryLog(threshold_ms=0, buffer_size=10, explain_sample_rate=1.0, explain_analyze=True)
+    log._engine = pg_engine
+
+    analyzed = log.record("SELECT generate_series(1, %(n)s)", {"n": 3}, 1.0)
+    locking = log.record("SELECT pg_advisory_lock(%(key)s)", {"key": 4242}, 1.0)
+    log._explain_executor.shutdown(wait=True)
+
+    assert "actual time" in analyzed["explain"]
+    assert "actual time" not in locking["explain"]
+    with pg_engine.connect() as conn:
+        held = conn.execute(text("SELECT COUNT(*) FROM pg_locks WHERE locktype = 'advisory' AND objid = 4242")).scalar()
+    assert held == 0
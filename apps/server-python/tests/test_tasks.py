@@ -0,0 +1,43 @@
+import asyncio
+
+from app.core.tasks import PeriodicTask, TaskScheduler
+
+
+def test_periodic_task_runs_until_stopped_and_survives_errors():
+    calls = []
+
+    def job():
+        calls.append(len(calls))
+        if len(calls) == 2:
+            raise RuntimeError("boom")
+
+    async def scenario():
+        scheduler = TaskScheduler()
+        scheduler.add(PeriodicTask("job", job, interval=0.01, jitter=0))
+        scheduler.start()
+        await asyncio.sleep(0.2)
+        await scheduler.stop()
+        stopped_at = len(calls)
+        await asyncio.sleep(0.05)
+        return stopped_at
+
+    stopped_at = asyncio.run(scenario())
+    assert stopped_at >= 3
+    assert len(calls) == stopped_at
+
+
+def test_returned_delay_shortens_next_run():
+    async def scenario():
+        calls = []
+
+        async def job():
+            calls.append(1)
+            return 0.0
+
+        task = PeriodicTask("sweeper", job, interval=60, jitter=0)
+        task.start()
+        await asyncio.sleep(0.05)
+        await task.stop()
+        return len(calls)
+
+    assert asyncio.run(scenario()) > 1
@@ -0,0 +1,157 @@
+from datetime import datetime, timedelta
+import time
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+from jose import jwt as jose_jwt
+
+from app.core.security import (
+    AsymmetricTokenCodec,
+    HMACTokenCodec,
+    JoseTokenCodec,
+    SigningKey,
+    TokenError,
+    create_access_token,
+    create_password_reset_token,
+    verify_password_reset_token,
+)
+from app.routes.auth import get_current_user
+
+SECRET = "codec-secret-at-least-32-characters-long"
+
+
+@pytest.fixture(params=["hmac", "jose"])
+def codec(request):
+    return {"hmac": HMACTokenCodec, "jose": JoseTokenCodec}[request.param](SECRET)
+
+
+def claims(**extra):
+    return {"sub": "6f1c1a52-3f0e-4a8e-9d57-2b0c5e7c9a41", "exp": datetime.utcnow() + timedelta(minutes=5), **extra}
+
+
+def test_backends_produce_identical_tokens():
+    data = claims()
+    assert HMACTokenCodec(SECRET).encode(data) == JoseTokenCodec(SECRET).encode(data)
+
+
+@pytest.mark.parametrize("encoder", [HMACTokenCodec, JoseTokenCodec])
+def test_round_trip_across_backends(codec, encoder):
+    token = encoder(SECRET).encode(claims(type="password_reset"))
+    payload = codec.decode(token)
+    assert payload["sub"] == "6f1c1a52-3f0e-4a8e-9d57-2b0c5e7c9a41"
+    assert payload["type"] == "password_reset"
+    assert isinstance(payload["exp"], int)
+
+
+@pytest.mark.parametrize("bad_claims", [
+    {"exp": int(time.time()) - 1},
+    {"nbf": int(time.time()) + 60},
+    {"sub": 42},
+    {"jti": 1},
+    {"aud": "other-service"},
+    {"iat": "yesterday"},
+])
+def test_rejected_claims(codec, bad_claims):
+    token = JoseTokenCodec(SECRET).encode({**claims(), **bad_claims})
+    with pytest.raises(TokenError):
+        codec.decode(token)
+
+
+@pytest.mark.parametrize("mutate", [
+    lambda t: t[:-2] + ("AA" if not t.endswith("AA") else "BB"),
+    lambda t: t.rsplit(".", 1)[0],
+    lambda t: "not-a-token",
+    lambda t: "",
+])
+def test_rejected_tokens(codec, mutate):
+    with pytest.raises(TokenError):
+        codec.decode(mutate(HMACTokenCodec(SECRET).encode(claims())))
+
+
+def test_wrong_secret_and_algorithm(codec):
+    with pytest.raises(TokenError):
+        codec.decode(HMACTokenCodec("another-secret-of-at-least-32-chars!").encode(claims()))
+    with pytest.raises(TokenError):
+        codec.decode(HMACTokenCodec(SECRET, "HS512").encode(claims()))
+
+
+def test_password_reset_token():
+    token = create_password_reset_token("user@example.com")
+    assert verify_password_reset_token(token) == "user@example.com"
+    assert verify_password_reset_token(token + "x") is None
+
+
+# -- Signature asymétrique ------------------------------------------------------
+
+
+@pytest.fixture(params=["EdDSA", "ES256"])
+def signing_key(request):
+    if request.param == "EdDSA":
+        return SigningKey(ed25519.Ed25519PrivateKey.generate())
+    return SigningKey(ec.generate_private_key(ec.SECP256R1()))
+
+
+def test_asymmetric_round_trip(signing_key):
+    codec = AsymmetricTokenCodec([signing_key])
+    token = codec.encode(claims())
+    header = jose_jwt.get_unverified_header(token)
+    assert header["alg"] == signing_key.alg and header["kid"] == signing_key.kid
+    assert codec.decode(token)["sub"] == claims()["sub"]
+    with pytest.raises(TokenError):
+        codec.decode(token[:-4] + ("AAAA" if not token.endswith("AAAA") else "BBBB"))
+
+
+def test_es256_tokens_verify_with_published_jwk():
+    key = SigningKey(ec.generate_private_key(ec.SECP256R1()))
+    codec = AsymmetricTokenCodec([key])
+    [jwk] = codec.jwks()["keys"]
+    assert "d" not in jwk
+    payload = jose_jwt.decode(codec.encode(claims()), jwk, algorithms=["ES256"])
+    assert payload["sub"] == claims()["sub"]
+
+
+def test_kid_is_stable_jwk_thumbprint():
+    private_key = ed25519.Ed25519PrivateKey.generate()
+    assert SigningKey(private_key).kid == SigningKey(private_key).kid
+    assert SigningKey(private_key).kid != SigningKey(ed25519.Ed25519PrivateKey.generate()).kid
+
+
+def test_key_rollover():
+    old, new = SigningKey(ed25519.Ed25519PrivateKey.generate()), SigningKey(ed25519.Ed25519PrivateKey.generate())
+    old_token = AsymmetricTokenCodec([old]).encode(claims())
+
+    # Nouvelle clé active, ancienne encore publiée : les anciens jetons restent valides
+    rolled = AsymmetricTokenCodec([new, old])
+    assert rolled.decode(old_token)
+    assert jose_jwt.get_unverified_header(rolled.encode(claims()))["kid"] == new.kid
+    assert [k["kid"] for k in rolled.jwks()["keys"]] == [new.kid, old.kid]
+
+    # Ancienne clé retirée
+    with pytest.raises(TokenError):
+        AsymmetricTokenCodec([new]).decode(old_token)
+
+
+def test_hs256_fallback(signing_key):
+    shared_token = HMACTokenCodec(SECRET).encode(claims())
+    assert AsymmetricTokenCodec([signing_key], fallback=HMACTokenCodec(SECRET)).decode(shared_token)
+    with pytest.raises(TokenError):
+        AsymmetricTokenCodec([signing_key]).decode(shared_token)
+
+
+def _bearer(token: str) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+def test_only_access_tokens_authenticate(db, user):
+    assert get_current_user(_bearer(create_access_token({"sub": str(user.id)})), db).id == user.id
+
+    for token in (
+        create_password_reset_token("someone@example.com"),
+        create_access_token({"sub": str(user.id), "type": "password_reset"}),
+        create_access_token({"sub": "someone@example.com"}),
+    ):
+        with pytest.raises(HTTPException) as exc:
+            get_current_user(_bearer(token), db)
+        assert exc.value.status_code == 401
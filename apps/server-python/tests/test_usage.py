@@ -0,0 +1,82 @@
+import uuid
+from datetime import datetime
+
+from app.core.usage import UsageAggregator
+from app.routes import apikeys
+from app.schemas.apikey import ApiKeyCreate
+
+
+class FailingSession:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, *args, **kwargs):
+        raise RuntimeError("database down")
+
+    def rollback(self):
+        pass
+
+
+class RecordingSession(FailingSession):
+    def __init__(self, calls):
+        self.calls = calls
+
+    def execute(self, statement, params):
+        self.calls.append((str(statement), params))
+
+    def commit(self):
+        pass
+
+
+def test_uses_are_aggregated_per_key():
+    usage = UsageAggregator(max_keys=10)
+    usage.record("a", datetime(2024, 1, 1, 10))
+    usage.record("a", datetime(2024, 1, 1, 9))
+    usage.record("b", datetime(2024, 1, 1, 11))
+
+    assert usage.pending("a") == (2, datetime(2024, 1, 1, 10))
+    assert usage.take() == {"a": [2, datetime(2024, 1, 1, 10)], "b": [1, datetime(2024, 1, 1, 11)]}
+    assert len(usage) == 0
+
+
+def test_buffer_is_bounded_and_asks_for_an_early_flush():
+    usage = UsageAggregator(max_keys=2)
+    assert usage.record("a") and usage.record("b")
+    assert usage.record("a")
+    assert not usage.record("c")
+    assert len(usage) == 2
+    assert usage._flush_requested
+    usage.take()
+    assert not usage._flush_requested
+
+
+def test_flush_writes_batches_and_keeps_counters_on_failure():
+    calls = []
+    usage = UsageAggregator(session_factory=lambda: RecordingSession(calls), batch_size=2)
+    for key in ("k1", "k2", "k3", "k1"):
+        usage.record(key, datetime(2024, 1, 1))
+
+    assert usage.flush() == 3
+    assert len(calls) == 2
+    assert "FROM (VALUES" in calls[0][0]
+    assert calls[0][1]["id_0"] == "k1" and calls[0][1]["uses_0"] == 2
+
+    usage.session_factory = FailingSession
+    usage.record("k1", datetime(2024, 1, 2))
+    assert usage.flush() == 0
+    assert usage.pending("k1") == (1, datetime(2024, 1, 2))
+
+
+def test_usage_endpoint_adds_pending_uses(monkeypatch, db, user):
+    tracker = UsageAggregator()
+    monkeypatch.setattr(apikeys, "usage_tracker", tracker)
+    key_id = uuid.UUID(apikeys.create_api_key(ApiKeyCreate(name="k"), user, db)["id"])
+    apikeys.reveal_api_key(key_id, user, db)
+    apikeys.reveal_api_key(key_id, user, db)
+
+    usage = apikeys.get_api_key_usage(key_id, user, db)
+    assert usage["usage_count"] == 2
+    assert usage["last_used_at"] is not None